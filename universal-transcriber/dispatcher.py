@@ -1,71 +1,96 @@
 #!/usr/bin/env python3
 import json
-import importlib.util
 import traceback
-import time
 from pathlib import Path
 
+from pipeline import governor
+from pipeline.governor import is_transient
+from pipeline.logger import Logger
+from pipeline.registry import get_sender
+
 BASE_DIR = Path(__file__).parent
 
+_rules_cache = {}
+_http_session = None
+
+
+def http_session():
+    """进程内共享的 HTTP 会话，复用到 LLM 接口的连接"""
+    global _http_session
+    if _http_session is None:
+        import requests
+
+        _http_session = requests.Session()
+    return _http_session
+
+
+def llm_retryable(exc):
+    # 空内容或返回体无法解析时同样重试
+    return is_transient(exc) or isinstance(exc, (ValueError, KeyError))
+
 
 def generate_ai_title(transcript, api_key, api_url, max_retries=3):
     """用阿里百炼 Qwen 模型生成吸引人的一句话标题"""
-    import requests
-    for attempt in range(1, max_retries + 1):
-        try:
-            print(f"[INFO] 生成AI标题（第 {attempt}/{max_retries} 次）...")
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": api_url["model"],
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的标题生成助手。请为下面的文本生成一个吸引人、有吸引力的标题，适合社交媒体或内容平台使用。标题要简洁有力，不超过30字。直接输出标题内容，不要有任何前缀或引号。"
-                    },
-                    {
-                        "role": "user",
-                        "content": f"请为下面的文本生成标题：\n{transcript[:4000]}"
-                    }
-                ],
-                "max_tokens": 120,
-                "temperature": 0.8
+    session = http_session()
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": api_url["model"],
+        "messages": [
+            {
+                "role": "system",
+                "content": "你是一个专业的标题生成助手。请为下面的文本生成一个吸引人、有吸引力的标题，适合社交媒体或内容平台使用。标题要简洁有力，不超过30字。直接输出标题内容，不要有任何前缀或引号。"
+            },
+            {
+                "role": "user",
+                "content": f"请为下面的文本生成标题：\n{transcript[:4000]}"
             }
-            resp = requests.post(api_url["endpoint"], headers=headers, json=payload, timeout=45)
-            resp.raise_for_status()
-            msg = resp.json()["choices"][0]["message"]
-            content = msg.get("content", "")
-            if isinstance(content, list):
-                content = "".join(item.get("text", "") for item in content if isinstance(item, dict))
-            content = (content or "").strip()
-            
+        ],
+        "max_tokens": 120,
+        "temperature": 0.8
+    }
+
+    def attempt():
+        resp = session.post(api_url["endpoint"], headers=headers, json=payload, timeout=45)
+        resp.raise_for_status()
+        msg = resp.json()["choices"][0]["message"]
+        content = msg.get("content", "")
+        if isinstance(content, list):
+            content = "".join(item.get("text", "") for item in content if isinstance(item, dict))
+        content = (content or "").strip()
+        if not content:
+            reasoning = msg.get("reasoning_content", "")
+            content = reasoning[-500:].strip() if reasoning else ""
             if not content:
-                reasoning = msg.get("reasoning_content", "")
-                content = reasoning[-500:].strip() if reasoning else ""
-                if not content:
-                    raise ValueError("AI返回内容为空")
-            
-            print(f"[OK] AI标题生成完成: {content}")
-            return content
-        except Exception as e:
-            print(f"[WARN] 第 {attempt} 次失败: {str(e)[:80]}")
-            if attempt < max_retries:
-                print(f"[INFO] 等待 5 秒后重试...")
-                time.sleep(5)
-    
-    print("[WARN] AI标题生成全部失败，使用原标题")
-    return None
+                raise ValueError("AI返回内容为空")
+        return content
+
+    Logger.info("生成AI标题...")
+    try:
+        content = governor.get("llm").call(attempt, retryable=llm_retryable, max_retries=max_retries)
+    except Exception as e:
+        Logger.warning(f"AI标题生成失败，使用原标题: {str(e)[:80]}")
+        return None
+    Logger.success(f"AI标题生成完成: {content}")
+    return content
 
 def load_rules(rules_path=None):
     try:
         import yaml
     except ImportError:
         raise RuntimeError("pyyaml未安装")
-    path = rules_path or BASE_DIR / "config" / "send_rules.yaml"
+    path = str(rules_path or BASE_DIR / "config" / "send_rules.yaml")
+    mtime = Path(path).stat().st_mtime
+    cached = _rules_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
     with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        rules = yaml.safe_load(f)
+    _rules_cache[path] = (mtime, rules)
+    governor.configure(rules.get("governors"))
+    return rules
 
 def resolve_targets(rules, platform, cli_targets=None):
     if cli_targets:
@@ -75,8 +100,7 @@ def resolve_targets(rules, platform, cli_targets=None):
         return platform_rule["send"]
     return rules.get("ai_policy", {}).get("on_transcribe_success", [])
 
-def resolve_notion_options(rules, platform, cli_notion_target=None):
-    dbs = rules.get("notion_databases", {})
+def resolve_notion_alias(rules, platform, cli_notion_target=None):
     alias = cli_notion_target
     if not alias:
         platform_rule = rules.get("platform_rules", {}).get(platform, {})
@@ -85,28 +109,69 @@ def resolve_notion_options(rules, platform, cli_notion_target=None):
         alias = rules.get("default_notion_database")
     if not alias:
         raise RuntimeError("send_rules.yaml 没有 default_notion_database")
+    return alias
+
+def resolve_notion_options(rules, platform, cli_notion_target=None):
+    return notion_options(rules, resolve_notion_alias(rules, platform, cli_notion_target))
+
+def notion_options(rules, alias):
+    dbs = rules.get("notion_databases", {})
     target_id = dbs.get(alias)
     if not target_id:
         raise RuntimeError(f"notion_databases 找不到 {alias}，现有: {list(dbs.keys())}")
     return {"page_id": target_id} if alias.endswith("_page") else {"database_id": target_id}
 
-def get_sender(name):
-    path = BASE_DIR / "senders" / f"{name}.py"
-    spec = importlib.util.spec_from_file_location(name, path)
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
+def notion_router(rules):
+    """send_rules.yaml 开启 notion_routing 时返回共享的语义路由器，否则 None"""
+    routing = rules.get("notion_routing") or {}
+    if not routing.get("enabled"):
+        return None
+    from pipeline import router
 
-def dispatch(transcript, title, url, platform, config, cli_targets=None, dry_run=False, rules_path=None, notion_target=None):
-    rules = load_rules(rules_path)
-    targets = resolve_targets(rules, platform, cli_targets)
-    
-    # 先用AI生成吸引人的标题
+    return router.shared(routing, BASE_DIR)
+
+def route_notion(rules, transcript, platform, cli_notion_target=None):
+    """按内容选 Notion 目标；返回 (别名, 路由信息)，路由信息含供归档后学习用的向量。
+    learn 表示该目标可信（按内容路由成功或命令行指定），归档成功后才并入质心"""
+    try:
+        router = notion_router(rules)
+        if router is not None:
+            vectors = router.embed_one(transcript)
+            routed, score = router.route_vectors(vectors)[0]
+    except Exception as e:
+        Logger.warning(f"Notion 语义路由不可用，按平台规则: {e}")
+        router = None
+    if router is None:
+        return resolve_notion_alias(rules, platform, cli_notion_target), None
+    route = {"router": router, "vectors": vectors, "score": score, "routed": False, "learn": False}
+    if cli_notion_target:
+        route["learn"] = True
+        return cli_notion_target, route
+    if routed and routed in rules.get("notion_databases", {}):
+        Logger.info(f"Notion 语义路由: {routed}（相似度 {score}）")
+        route["routed"] = route["learn"] = True
+        return routed, route
+    Logger.info(f"Notion 语义路由未达阈值（最高 {score}），按平台规则")
+    return resolve_notion_alias(rules, platform), route
+
+def generate_title(transcript, config):
+    """按配置的标题模型生成 AI 标题，失败时返回 None"""
     title_client = {
         "model": getattr(config, "title_model", "qwen3.5-flash"),
         "endpoint": f"{getattr(config, 'title_api_base', 'https://dashscope.aliyuncs.com/compatible-mode/v1').rstrip('/')}/chat/completions",
     }
-    ai_title = generate_ai_title(transcript, config.dashscope_api_key, title_client)
+    return generate_ai_title(transcript, config.dashscope_api_key, title_client)
+
+
+def dispatch(transcript, title, url, platform, config, cli_targets=None, dry_run=False, rules_path=None, notion_target=None, ai_title=None, duplicate_of=None):
+    """ai_title 为 None 时在此生成；调用方已生成（空串表示生成失败）则直接使用。
+    duplicate_of 为近重复的原始转录（{"task_id", "url", "similarity"}）时只关联、不再分发"""
+    rules = load_rules(rules_path)
+    targets = resolve_targets(rules, platform, cli_targets)
+    
+    # 先用AI生成吸引人的标题
+    if ai_title is None:
+        ai_title = generate_title(transcript, config)
     final_title = ai_title if ai_title else title
     
     result = {
@@ -121,6 +186,11 @@ def dispatch(transcript, title, url, platform, config, cli_targets=None, dry_run
         "targets": targets,
         "send_results": {}
     }
+    if duplicate_of:
+        result["duplicate_of"] = duplicate_of
+        result["send_skipped"] = True
+        Logger.info(f"与任务 {duplicate_of['task_id']} 内容近似重复（相似度 {duplicate_of['similarity']}），跳过分发")
+        return result
     if dry_run:
         result["send_skipped"] = True
         return result
@@ -131,13 +201,25 @@ def dispatch(transcript, title, url, platform, config, cli_targets=None, dry_run
         try:
             sender = get_sender(target)
             options = {}
+            route = None
             if target == "notion":
-                options = resolve_notion_options(rules, platform, notion_target)
-                print(f"[INFO] Notion options: {options}")
-            sender.send(transcript, final_title, url, config, options)
+                alias, route = route_notion(rules, transcript, platform, notion_target)
+                options = notion_options(rules, alias)
+                Logger.info(f"Notion options: {options}")
+                if route is not None:
+                    result["notion_route"] = {"alias": alias, "score": route["score"], "routed": route["routed"]}
+            sent = sender.send(transcript, final_title, url, config, options)
             result["send_results"][target] = "success"
+            if route is not None and route["learn"]:
+                # 可信目标归档成功才并入质心（退回平台规则的不学，免得误路由自我强化）；学习失败不影响分发结果
+                try:
+                    route["router"].learn_many(route["vectors"], [alias])
+                except Exception as e:
+                    Logger.warning(f"Notion 路由质心更新失败: {e}")
+            if isinstance(sent, dict) and sent.get("summary"):
+                result["summary"] = sent["summary"]
         except Exception as e:
-            print(f"[ERROR] {target} 失败: {e}")
+            Logger.error(f"{target} 失败: {e}")
             traceback.print_exc()
             result["send_results"][target] = f"failed: {str(e)}"
     return result
@@ -2,7 +2,8 @@ import subprocess
 import time
 from pathlib import Path
 
-from downloaders.common import find_ffmpeg, run_yt_dlp_download, run_yt_dlp_get_title
+from downloaders.common import find_ffmpeg, run_yt_dlp_download, run_yt_dlp_get_title, run_yt_dlp_probe_duration
+from pipeline.logger import Logger
 
 
 def _try_youget_download(url, output_dir, cookies_path=None, timeout=300):
@@ -72,7 +73,7 @@ def download(url, output_dir, task_id, cookies_path=None, audio_only=True):
     try:
         result, new_files = _try_youget_download(url, output_dir, cookies_path)
     except Exception as e:
-        print(f"[WARN] you-get 失败，切换到 yt-dlp: {e}")
+        Logger.warning(f"you-get 失败，切换到 yt-dlp: {e}")
         out_path = output_dir / f"bilibili_{task_id}.mp4"
         if audio_only:
             out_path = output_dir / f"bilibili_audio_{task_id}.m4a"
@@ -106,3 +107,7 @@ def download(url, output_dir, task_id, cookies_path=None, audio_only=True):
         return str(other_parts[0])
 
     return str(new_files[-1])
+
+
+def probe_duration(url, cookies_path=None):
+    return run_yt_dlp_probe_duration(url, cookies_path=cookies_path)
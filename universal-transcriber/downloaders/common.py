@@ -1,9 +1,10 @@
 import json
 import shutil
 import subprocess
-import time
 from pathlib import Path
 
+from pipeline import governor
+
 
 def find_ffmpeg():
     """先查系统 PATH，再读 config.json，返回 ffmpeg 可执行路径或 None。"""
@@ -63,14 +64,17 @@ def run_yt_dlp_download(platform: str, url: str, output_path: Path, cookies_path
     cmd.append(url)  # URL must be last
 
     last_error = ""
+    gov = governor.get("yt_dlp")
     for attempt in range(1, max_retries + 1):
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        with gov.slot():
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
 
         # Check if file was created even if exit code is non-zero
         # (yt-dlp sometimes fails on metadata post-processing but the file is fine)
         existing = list(output_path.parent.glob(f"{output_path.stem}*"))
         if existing:
             # Return the largest file (or the only non-.meta file)
+            gov.success()
             data_files = [f for f in existing if f.suffix != ".meta"]
             if data_files:
                 return str(data_files[0])
@@ -83,8 +87,10 @@ def run_yt_dlp_download(platform: str, url: str, output_path: Path, cookies_path
         code, hint = classify_yt_dlp_error(last_error)
         retryable = code in {"RATE_LIMITED", "NETWORK"}
         if retryable and attempt < max_retries:
-            time.sleep(3 * attempt)
+            gov.backoff(attempt, reason=f"{platform} {code}")
             continue
+        if retryable:
+            gov.failure()
         raise RuntimeError(f"{platform}下载失败[{code}]: {hint}\n原始错误: {last_error}")
 
     raise RuntimeError(f"{platform}下载失败: {last_error}")
@@ -98,3 +104,19 @@ def run_yt_dlp_get_title(url: str, cookies_path=None) -> str | None:
     if result.returncode == 0:
         return result.stdout.strip()
     return None
+
+
+def run_yt_dlp_probe_duration(url: str, cookies_path=None) -> float | None:
+    """只取元数据中的时长（秒），不下载"""
+    cmd = ["yt-dlp", "--skip-download", "--no-warnings", "--print", "duration", url]
+    if cookies_path:
+        cmd += ["--cookies", str(cookies_path)]
+    with governor.get("yt_dlp").slot():
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    if result.returncode != 0:
+        return None
+    try:
+        return float(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+
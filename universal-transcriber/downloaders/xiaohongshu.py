@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from downloaders.common import run_yt_dlp_download, run_yt_dlp_get_title
+from downloaders.common import run_yt_dlp_download, run_yt_dlp_get_title, run_yt_dlp_probe_duration
 
 
 def download(url, output_dir, task_id, cookies_path=None, audio_only=True):
@@ -10,3 +10,7 @@ def download(url, output_dir, task_id, cookies_path=None, audio_only=True):
 
 def get_title(url, cookies_path=None):
     return run_yt_dlp_get_title(url, cookies_path=cookies_path)
+
+
+def probe_duration(url, cookies_path=None):
+    return run_yt_dlp_probe_duration(url, cookies_path=cookies_path)
@@ -12,12 +12,11 @@ OUTPUT_DIR = BASE_DIR / "output"
 
 sys.path.insert(0, str(BASE_DIR))
 
-from dispatcher import dispatch
-from pipeline.audio_extractor import AudioExtractor
+from pipeline import metrics
 from pipeline.config import Config
 from pipeline.logger import Logger
-from pipeline.oss_uploader import OSSUploader
-from pipeline.transcriber import CloudTranscriber
+from pipeline.registry import get_downloader
+from pipeline.services import Services
 
 PLATFORMS = ["douyin", "bilibili", "youtube", "xiaohongshu"]
 SENDERS = ["local", "notion", "github", "flomo"]
@@ -43,16 +42,6 @@ def configure_console():
                 pass
 
 
-def get_downloader(platform):
-    import importlib.util
-
-    path = BASE_DIR / "downloaders" / f"{platform}.py"
-    spec = importlib.util.spec_from_file_location(platform, path)
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
-
-
 def parse_send_targets(args):
     targets = []
     for i, arg in enumerate(args):
@@ -61,24 +50,202 @@ def parse_send_targets(args):
     return targets
 
 
-def cleanup_video(video_path, keep_video=False):
-    """Delete the downloaded video unless the user asked to keep it."""
+def _task_context(platform, url, services, cookies_path, send_targets, dry_run, save_video, task_id, checkpoint=None,
+                  partials=None):
+    """组装任务 ctx 并分配临时目录（调用方负责 ctx["scratch"].close()）"""
+    from pipeline.workspace import AUDIO_SCRATCH_BYTES
+
+    workspace = services.workspace()
+    scratch = workspace.task(task_id, None if save_video else AUDIO_SCRATCH_BYTES)
+    Logger.info(f"平台: {platform} | URL: {url} | dry-run: {dry_run} | save-video: {save_video}", task_id)
+    if send_targets:
+        Logger.info(f"分发目标: {', '.join(send_targets)}", task_id)
+    else:
+        Logger.info("仅保存本地，未指定分发目标", task_id)
+
+    ctx = {
+        "task_id": task_id,
+        "platform": platform,
+        "url": url,
+        "cookies_path": cookies_path,
+        "save_video": save_video,
+        "keep_source": save_video,
+        "keep_audio": True,
+        "dry_run": dry_run,
+        "send_targets": send_targets,
+        "config": services.config,
+        "services": services,
+        "downloader": get_downloader(platform),
+        "scratch": scratch,
+        "download_dir": workspace.kept("downloads") if save_video else scratch.path,
+        "audio_dir": workspace.kept("audio"),
+        "transcripts_dir": workspace.kept("transcripts"),
+        "partials": partials,
+        **(checkpoint or {}),
+    }
+    if checkpoint:
+        Logger.info(f"从检查点继续: {', '.join(sorted(checkpoint))}", task_id)
+    return ctx
+
+
+def _failed_result(e, ctx):
+    """阶段失败 → 错误结果字典（同时输出到 stderr）"""
+    task_id = ctx["task_id"]
+    source_path = e.ctx.get("source_path")
+    source_saved = bool(ctx["save_video"] and source_path)
+    error_result = {
+        "task_id": task_id,
+        "task_status": "failed",
+        "platform": ctx["platform"],
+        "url": ctx["url"],
+        "stage": e.stage.label or e.stage.name,
+        "error": str(e),
+        "source_file": str(source_path) if source_saved else None,
+        "source_saved": source_saved,
+    }
+    Logger.error(f"任务失败，阶段: {error_result['stage']} | 原因: {e}", task_id)
+    Logger.flush()
+    print(json.dumps(error_result, ensure_ascii=False, indent=2), file=sys.stderr)
+    traceback.print_exception(type(e.error), e.error, e.error.__traceback__)
+    return error_result
+
+
+def _task_result(ctx):
+    task_id = ctx["task_id"]
+    source_path = ctx.get("source_path") if ctx["save_video"] else None
+    dispatch_result = ctx["dispatch_result"]
+    dispatch_result["task_id"] = task_id
+    dispatch_result["transcript_file"] = ctx["transcript_path"]
+    dispatch_result["source_file"] = str(source_path) if source_path else None
+    dispatch_result["source_saved"] = bool(source_path)
+    if ctx.get("audio_match"):
+        dispatch_result["audio_match"] = ctx["audio_match"]
+
+    if not ctx["dry_run"]:
+        for target, res in dispatch_result["send_results"].items():
+            if res == "success":
+                Logger.info(f"{target} 分发成功", task_id)
+            else:
+                Logger.warning(f"{target} 分发失败（不影响其他目标）: {res}", task_id)
+
+    Logger.plain(f"\n完成！转录文件: {ctx['transcript_path']}")
+    if source_path:
+        Logger.plain(f"保留的视频文件: {source_path}\n")
+    else:
+        Logger.plain("")
+    return dispatch_result
+
+
+def run_task(platform, url, services, cookies_path=None, send_targets=None, dry_run=False, save_video=False, task_id=None,
+             checkpoint=None, on_checkpoint=None, partials=None, cancel=None):
+    """执行单个转录任务，返回结果字典（失败时 task_status 为 failed）。
+    checkpoint 为之前写回的阶段产出（从中断处继续），on_checkpoint(values) 在阶段完成后收到可持久化的产出；
+    partials（PartialPublisher）开启分段流式转录，逐段推送并在结束时推送 done 事件；
+    cancel（threading.Event）置位后不再开始新阶段，尚未分发的结果不会分发"""
+    from pipeline import flow
+    from pipeline.graph import StageFailed
+
+    task_id = task_id or str(uuid.uuid4())[:8]
+    ctx = _task_context(platform, url, services, cookies_path, send_targets or [], dry_run, save_video, task_id,
+                        checkpoint, partials)
+    ctx["cancel"] = cancel
+
+    def on_stage(stage, result):
+        values = {k: v for k, v in result.items() if k in flow.CHECKPOINT_KEYS}
+        if values:
+            on_checkpoint(values)
+
     try:
-        if not video_path or not os.path.exists(str(video_path)):
-            return
-        if keep_video:
-            Logger.info(f"保留视频文件: {os.path.basename(str(video_path))}")
-            return
-        os.remove(str(video_path))
-        Logger.info(f"已删除视频文件: {os.path.basename(str(video_path))}")
-    except Exception as e:
-        Logger.warning(f"删除视频文件失败: {e}")
+        ctx = flow.TASK_GRAPH.run(ctx, task_id, on_stage=on_stage if on_checkpoint else None)
+        result = _task_result(ctx)
+    except StageFailed as e:
+        result = _failed_result(e, ctx)
+    finally:
+        ctx["scratch"].close()
+    if partials is not None:
+        partials.done(task_id, result)
+    return result
+
+
+def run_batch(platform, urls, services, cookies_path=None, send_targets=None, dry_run=False, save_video=False,
+              pools=None, queue_size=4, partials=None):
+    """跨任务流水线批量执行：各工位独立线程池，工位之间有界队列反压，按输入顺序返回结果；
+    partials 同 run_task，每个任务结束时立即推送其 done 事件"""
+    from pipeline import flow
+    from pipeline.stream import StreamRunner
+
+    runner = StreamRunner(flow.TASK_GRAPH, flow.TASK_POOLS, {**flow.POOL_SIZES, **(pools or {})}, queue_size)
+    contexts = (
+        _task_context(platform, url, services, cookies_path, send_targets or [], dry_run, save_video,
+                      str(uuid.uuid4())[:8], partials=partials)
+        for url in urls
+    )
+
+    def on_result(ctx, failure):
+        ctx["scratch"].close()
+        ctx["result"] = _failed_result(failure, ctx) if failure else _task_result(ctx)
+        if partials is not None:
+            partials.done(ctx["task_id"], ctx["result"])
+
+    results = [
+        ctx.get("result") or (_failed_result(failure, ctx) if failure else _task_result(ctx))
+        for ctx, failure in runner.run(contexts, on_result=on_result)
+    ]
+    return results
+
+
+def make_partials(args, config):
+    """--stream：转录片段以 JSONL 逐行写到 stdout（日志改写到 stderr）；--webhook <url>：逐段 POST 到该地址"""
+    stream = "--stream" in args
+    webhook = args[args.index("--webhook") + 1] if "--webhook" in args else (config.stream_webhook if stream else "")
+    if not stream and not webhook:
+        return None
+    from pipeline.partials import PartialPublisher
+
+    return PartialPublisher(stdout=stream, webhook=webhook)
+
+
+def parse_pools(spec):
+    """'download=4,transcribe=16' → {"download": 4, "transcribe": 16}"""
+    pools = {}
+    for part in filter(None, (spec or "").split(",")):
+        name, _, size = part.partition("=")
+        pools[name.strip()] = int(size)
+    return pools
 
 
 def main():
     configure_console()
     args = sys.argv[1:]
 
+    log_json = args[args.index("--log-json") + 1] if "--log-json" in args else None
+    task_logs = args[args.index("--task-logs") + 1] if "--task-logs" in args else None
+
+    if args and args[0] in ("worker", "enqueue"):
+        import worker
+
+        if args[0] == "enqueue":
+            sys.exit(worker.enqueue(args[1:]))
+        Logger.configure(json_path=log_json, task_log_dir=task_logs or str(OUTPUT_DIR / "logs"))
+        config = Config.from_file(str(CONFIG_PATH))
+        worker.work(run_task, Services(config, str(OUTPUT_DIR)), args[1:])
+        return
+
+    if args and args[0] == "serve":
+        from server import serve
+
+        Logger.configure(json_path=log_json, task_log_dir=task_logs or str(OUTPUT_DIR / "logs"))
+
+        config = Config.from_file(str(CONFIG_PATH))
+        serve(run_task, Services(config, str(OUTPUT_DIR)), args[1:])
+        return
+
+    if args and args[0] == "batch":
+        return batch(args[1:], log_json, task_logs)
+
+    if args and args[0] in ("search", "reindex"):
+        return search(args[0], args[1:])
+
     if "--platform" not in args or "--url" not in args:
         print(
             json.dumps(
@@ -87,8 +254,23 @@ def main():
                     "usage": (
                         "python3 main.py --platform <平台> --url <链接> "
                         "[--cookies <路径>] [--send notion] [--send github] "
-                        "[--send flomo] [--dry-run] [--save-video]"
+                        "[--send flomo] [--dry-run] [--save-video] "
+                        "[--metrics <events.jsonl>] [--prometheus <metrics.prom>] "
+                        "[--log-json <log.jsonl>] [--task-logs <目录>] [--stream] [--webhook <url>]"
+                    ),
+                    "batch": (
+                        "python3 main.py batch --platform <平台> --file <链接列表.txt> [--send notion] "
+                        "[--pools download=3,extract=2,upload=3,transcribe=8,deliver=2] [--queue-size 4] "
+                        "[--stream] [--webhook <url>]"
+                    ),
+                    "serve": "python3 main.py serve [--host 127.0.0.1] [--port 8765] [--workers 2] [--warm-browser]",
+                    "worker": "python3 main.py worker --store sqlite:///output/jobs.db [--workers 1] [--lease 60]",
+                    "enqueue": (
+                        "python3 main.py enqueue --store sqlite:///output/jobs.db --platform <平台> --url <链接> "
+                        "[--send notion] [--priority normal]"
                     ),
+                    "search": "python3 main.py search <关键词> [--platform <平台>] [--limit 20]",
+                    "reindex": "python3 main.py reindex",
                     "platforms": PLATFORMS,
                 },
                 ensure_ascii=False,
@@ -108,119 +290,105 @@ def main():
         print(json.dumps({"error": f"不支持的平台: {platform}", "platforms": PLATFORMS}, ensure_ascii=False))
         sys.exit(1)
 
-    task_id = str(uuid.uuid4())[:8]
+    if log_json or task_logs or "--stream" in args:
+        Logger.configure(json_path=log_json, task_log_dir=task_logs, console_stderr="--stream" in args)
+    metrics_path = args[args.index("--metrics") + 1] if "--metrics" in args else None
+    prometheus_path = args[args.index("--prometheus") + 1] if "--prometheus" in args else None
+    recorder = metrics.configure(metrics_path)
+
     config = Config.from_file(str(CONFIG_PATH))
+    partials = make_partials(args, config)
+    result = run_task(
+        platform,
+        url,
+        Services(config, str(OUTPUT_DIR)),
+        cookies_path=cookies_path,
+        send_targets=send_targets,
+        dry_run=dry_run,
+        save_video=save_video,
+        partials=partials,
+    )
+    if partials is not None:
+        partials.close()
+    summary = recorder.format_summary()
+    if summary:
+        Logger.plain(summary)
+    Logger.flush()
+    if prometheus_path:
+        recorder.write_prometheus(prometheus_path)
+    if result.get("task_status") == "failed":
+        sys.exit(1)
 
-    download_dir = OUTPUT_DIR / "downloads"
-    audio_dir = OUTPUT_DIR / "audio"
-    transcripts_dir = OUTPUT_DIR / "transcripts"
-    for directory in [download_dir, audio_dir, transcripts_dir]:
-        directory.mkdir(parents=True, exist_ok=True)
 
-    Logger.info(f"[{task_id}] 平台: {platform} | URL: {url} | dry-run: {dry_run} | save-video: {save_video}")
-    if send_targets:
-        Logger.info(f"[{task_id}] 分发目标: {', '.join(send_targets)}")
-    else:
-        Logger.info(f"[{task_id}] 仅保存本地，未指定分发目标")
+def batch(args, log_json, task_logs):
+    platform = args[args.index("--platform") + 1] if "--platform" in args else None
+    list_path = args[args.index("--file") + 1] if "--file" in args else None
+    if platform not in PLATFORMS or not list_path:
+        print(json.dumps({"error": "batch 需要 --platform 与 --file", "platforms": PLATFORMS}, ensure_ascii=False))
+        sys.exit(1)
+    urls = [line.strip() for line in Path(list_path).read_text(encoding="utf-8").splitlines()
+            if line.strip() and not line.startswith("#")]
 
-    downloader = get_downloader(platform)
-    oss_object = None
-    uploader = None
-    source_path = None
-    stage = "初始化"
+    Logger.configure(json_path=log_json, task_log_dir=task_logs or str(OUTPUT_DIR / "logs"),
+                     console_stderr="--stream" in args)
+    metrics_path = args[args.index("--metrics") + 1] if "--metrics" in args else None
+    recorder = metrics.configure(metrics_path)
 
-    try:
-        stage = "下载视频/音频"
-        Logger.step(1, 5, "下载视频/音频", task_id)
-        source_path = downloader.download(url, str(download_dir), task_id, cookies_path, audio_only=not save_video)
-        Logger.info(f"下载完成: {source_path}")
-
-        stage = "提取音频"
-        Logger.step(2, 5, "提取音频", task_id)
-        extractor = AudioExtractor(str(audio_dir), config.ffmpeg_path)
-        audio_path = extractor.extract(source_path, f"audio_{task_id}")
-        Logger.info(f"音频提取完成: {audio_path}")
-
-        if save_video:
-            Logger.info(f"保留视频文件: {Path(source_path).name}")
-        else:
-            if source_path and os.path.exists(source_path):
-                os.remove(source_path)
-                Logger.info(f"已删除临时源文件: {Path(source_path).name}")
-            source_path = None
-
-        stage = "上传OSS"
-        Logger.step(3, 5, "上传到OSS", task_id)
-        uploader = OSSUploader(
-            config.oss_access_key_id,
-            config.oss_access_key_secret,
-            config.oss_bucket_name,
-            config.oss_endpoint,
-        )
-        oss_url, oss_object = uploader.upload_audio(audio_path)
-        Logger.info("OSS上传完成")
-
-        stage = "云端转录"
-        Logger.step(4, 5, "云端转录", task_id)
-        transcriber = CloudTranscriber(config.dashscope_api_key)
-        transcript = transcriber.transcribe(oss_url, task_id=task_id)
-        transcript_path = transcripts_dir / f"transcript_{task_id}.txt"
-        transcript_path.write_text(transcript, encoding="utf-8")
-        Logger.info(f"转录完成: {transcript_path}")
-        print(f"\n转录预览（前300字）:\n{transcript[:300]}\n")
-
-        stage = "分发内容"
-        Logger.step(5, 5, "分发内容", task_id)
-        title = downloader.get_title(url, cookies_path) or f"{platform}_{task_id}"
-        dispatch_result = dispatch(
-            transcript,
-            title,
-            url,
-            platform,
-            config,
-            cli_targets=send_targets if send_targets else None,
-            dry_run=dry_run,
-        )
-        dispatch_result["task_id"] = task_id
-        dispatch_result["transcript_file"] = str(transcript_path)
-        dispatch_result["source_file"] = str(source_path) if save_video and source_path else None
-        dispatch_result["source_saved"] = bool(save_video and source_path)
-
-        if not dry_run:
-            for target, res in dispatch_result["send_results"].items():
-                if res == "success":
-                    Logger.info(f"{target} 分发成功")
-                else:
-                    Logger.warning(f"{target} 分发失败（不影响其他目标）: {res}")
-
-        print(f"\n完成！转录文件: {transcript_path}")
-        if save_video and source_path:
-            print(f"保留的视频文件: {source_path}\n")
-        else:
-            print("")
-
-    except Exception as e:
-        cleanup_video(source_path, keep_video=save_video)
-        error_result = {
-            "task_id": task_id,
-            "task_status": "failed",
-            "platform": platform,
-            "url": url,
-            "stage": stage,
-            "error": str(e),
-            "source_file": str(source_path) if save_video and source_path else None,
-            "source_saved": bool(save_video and source_path),
-        }
-        print(json.dumps(error_result, ensure_ascii=False, indent=2), file=sys.stderr)
-        Logger.error(f"任务失败，阶段: {stage} | 原因: {e}", task_id)
-        traceback.print_exc()
+    config = Config.from_file(str(CONFIG_PATH))
+    partials = make_partials(args, config)
+    results = run_batch(
+        platform,
+        urls,
+        Services(config, str(OUTPUT_DIR)),
+        cookies_path=args[args.index("--cookies") + 1] if "--cookies" in args else None,
+        send_targets=parse_send_targets(args),
+        dry_run="--dry-run" in args,
+        save_video="--save-video" in args or "--keep-video" in args,
+        pools=parse_pools(args[args.index("--pools") + 1] if "--pools" in args else None),
+        queue_size=int(args[args.index("--queue-size") + 1]) if "--queue-size" in args else 4,
+        partials=partials,
+    )
+    if partials is not None:
+        partials.close()
+    summary = recorder.format_summary()
+    if summary:
+        Logger.plain(summary)
+    Logger.flush()
+    # 流式模式下 stdout 只有 JSONL 事件，各任务结果已在 done 事件中
+    if "--stream" not in args:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    if any(r.get("task_status") == "failed" for r in results):
         sys.exit(1)
-    finally:
-        try:
-            if oss_object and uploader:
-                uploader.delete_object(oss_object)
-        except Exception:
-            pass
+
+
+def search(command, args):
+    """检索转录库；reindex 把尚未入库的历史转录文件补录进去，并补算近重复签名"""
+    from pipeline.transcript_store import TranscriptStore
+
+    store = TranscriptStore(str(OUTPUT_DIR / "transcripts.db"))
+    if command == "reindex":
+        from pipeline.near_dup import DuplicateIndex
+
+        added = store.index_files(str(OUTPUT_DIR / "transcripts"))
+        signed = DuplicateIndex(store.path).backfill(store)
+        print(json.dumps({"added": added, "signed": signed, "total": store.count()}, ensure_ascii=False))
+        return
+
+    terms, i = [], 0
+    while i < len(args):
+        if args[i] in ("--platform", "--limit"):
+            i += 2
+            continue
+        terms.append(args[i])
+        i += 1
+    if not terms:
+        print(json.dumps({"error": "search 需要关键词"}, ensure_ascii=False))
+        sys.exit(1)
+    platform = args[args.index("--platform") + 1] if "--platform" in args else None
+    limit = int(args[args.index("--limit") + 1]) if "--limit" in args else 20
+    results = store.search(" ".join(terms), limit=limit, platform=platform)
+    print(json.dumps({"query": " ".join(terms), "count": len(results), "results": results},
+                     ensure_ascii=False, indent=2))
 
 
 if __name__ == "__main__":
@@ -1,23 +1,33 @@
 """
 抖音视频转录工具 - 模块化版本
+
+子模块按需导入：访问 pipeline.OSSUploader 等名称时才加载对应模块及其 SDK。
 """
 
-from pipeline.config import Config
-from pipeline.logger import Logger
-from pipeline.downloader import DouyinDownloader
-from pipeline.audio_extractor import AudioExtractor
-from pipeline.oss_uploader import OSSUploader
-from pipeline.transcriber import CloudTranscriber
-from pipeline.notion_sync import NotionSync
-from .pipeline import TranscriptionPipeline
-
-__all__ = [
-    "Config",
-    "Logger",
-    "DouyinDownloader",
-    "AudioExtractor",
-    "OSSUploader",
-    "CloudTranscriber",
-    "NotionSync",
-    "TranscriptionPipeline",
-]
+import importlib
+
+_EXPORTS = {
+    "Config": "pipeline.config",
+    "Logger": "pipeline.logger",
+    "DouyinDownloader": "pipeline.downloader",
+    "AudioExtractor": "pipeline.audio_extractor",
+    "OSSUploader": "pipeline.oss_uploader",
+    "CloudTranscriber": "pipeline.transcriber",
+    "NotionSync": "pipeline.notion_sync",
+    "TranscriptionPipeline": "pipeline.pipeline",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'pipeline' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
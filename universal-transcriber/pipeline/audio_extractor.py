@@ -5,7 +5,7 @@
 
 import subprocess
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from downloaders.common import find_ffmpeg
 from pipeline.logger import Logger
@@ -34,16 +34,17 @@ class AudioExtractor:
         except:
             return False
 
-    def extract(self, video_path: str, output_filename: Optional[str] = None) -> str:
-        """从视频提取音频（输出16kHz单声道Opus）"""
+    def extract(self, video_path: str, output_filename: Optional[str] = None, output_dir: Optional[str] = None) -> str:
+        """从视频提取音频（输出16kHz单声道Opus）；output_dir 覆盖默认输出目录"""
         video_file = Path(video_path)
         if not video_file.exists():
             raise FileNotFoundError(f"视频文件不存在: {video_path}")
 
+        target_dir = Path(output_dir) if output_dir else self.output_dir
         if output_filename:
-            output_file = self.output_dir / f"{output_filename}.opus"
+            output_file = target_dir / f"{output_filename}.opus"
         else:
-            output_file = self.output_dir / f"{video_file.stem}.opus"
+            output_file = target_dir / f"{video_file.stem}.opus"
 
         Logger.info(f"提取音频: {video_file.name} -> {output_file.name}")
 
@@ -71,3 +72,44 @@ class AudioExtractor:
         Logger.success(f"音频提取完成: {output_file.name} ({file_size:.2f} MB)")
 
         return str(output_file)
+
+    def decode_pcm(self, audio_path: str, rate: int = 8000) -> bytes:
+        """解码为 16 位单声道原始 PCM（音频指纹用）"""
+        cmd = [
+            self.ffmpeg_path,
+            "-v", "error",
+            "-i", str(audio_path),
+            "-ac", "1",
+            "-ar", str(rate),
+            "-f", "s16le",
+            "pipe:1",
+        ]
+        result = subprocess.run(cmd, capture_output=True, timeout=600)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg错误: {result.stderr.decode('utf-8', errors='replace')}")
+        return result.stdout
+
+    def split(self, audio_path: str, times: List[float], output_dir: str) -> List[str]:
+        """在 times（秒）处切段，不重新编码；返回按顺序排列的分段文件（超出音频时长的切点自然忽略）"""
+        source = Path(audio_path)
+        target_dir = Path(output_dir)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        suffix = source.suffix or ".opus"
+        cmd = [
+            self.ffmpeg_path,
+            "-v", "error",
+            "-i", str(source),
+            "-f", "segment",
+            "-segment_times", ",".join(f"{t:g}" for t in times),
+            "-reset_timestamps", "1",
+            "-c", "copy",
+            "-y",
+            str(target_dir / f"{source.stem}_%03d{suffix}"),
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg错误: {result.stderr}")
+        chunks = sorted(str(p) for p in target_dir.glob(f"{source.stem}_[0-9][0-9][0-9]{suffix}"))
+        if not chunks:
+            raise RuntimeError("音频分段失败，未生成分段文件")
+        return chunks
@@ -0,0 +1,157 @@
+"""
+内容分类模块
+按关键词给转录打标签（Notion 的 领域 / 分类）。所有维度的关键词编译成一个前缀树形式的正则，
+全文只扫描一遍，逐个标签累加「权重 × 命中次数」，取得分最高者；不够 min_score 时用默认标签。
+同分按配置顺序取前者，结果附带命中明细，可解释、可复现。
+规则来自 send_rules.yaml 的 classification 段；其中没写的维度（以及 min_score）沿用 DEFAULT_RULES
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pipeline.logger import Logger
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "config" / "send_rules.yaml"
+
+DEFAULT_RULES: Dict = {
+    "min_score": 1,
+    "field": {
+        "default": "人类大逻辑",
+        "labels": {
+            "人类大逻辑": {"ai": 1, "人工智能": 2, "算法": 1, "技术": 0.5, "人类": 0.5,
+                          "思维": 1, "情感": 1, "哲学": 2, "意识": 1},
+            "商业大逻辑": {"商业": 1, "资本": 1, "经济": 1, "投资": 1, "融资": 2, "创业": 1},
+            "国际关系...": {"国际": 1, "关系": 0.5, "政治": 1, "地缘": 2, "外交": 2, "战争": 1},
+        },
+    },
+    "category": {
+        "default": "话题资料库",
+        "labels": {
+            "逻辑&理论&模型库": {"理论": 1, "逻辑": 1, "模型": 1, "框架": 1, "分析工具": 2},
+        },
+    },
+}
+
+_ASCII_WORD = re.compile(r"[0-9a-z]+")
+
+
+@dataclass
+class Label:
+    """某一维度的分类结果：label 为选中的标签，hits 为该标签命中的关键词及次数"""
+
+    label: str
+    score: float
+    hits: Dict[str, int] = field(default_factory=dict)
+    scores: Dict[str, float] = field(default_factory=dict)
+
+    def explain(self) -> str:
+        if not self.hits:
+            return f"{self.label}（默认）"
+        detail = "、".join(f"{kw}×{n}" for kw, n in sorted(self.hits.items(), key=lambda kv: -kv[1]))
+        return f"{self.label}（{self.score:g}分：{detail}）"
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """关键词 → 前缀树正则：公共前缀只比较一次，分支贪婪，同一位置优先匹配最长关键词"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class Classifier:
+    """一次扫描完成所有维度的关键词打分"""
+
+    def __init__(self, rules: Optional[Dict] = None):
+        # 按维度合并：配置里只写了 field 时，category 仍用内置规则，调用方总能取到两个维度
+        rules = {**DEFAULT_RULES, **(rules or {})}
+        self.min_score = float(rules.get("min_score", 1))
+        self.dimensions: Dict[str, Tuple[str, List[str]]] = {}
+        # 关键词 → [(维度, 标签, 权重)]
+        self.index: Dict[str, List[Tuple[str, str, float]]] = {}
+        for dimension, spec in rules.items():
+            if not isinstance(spec, dict):
+                continue
+            labels = spec.get("labels") or {}
+            self.dimensions[dimension] = (spec.get("default", ""), list(labels))
+            for label, keywords in labels.items():
+                if isinstance(keywords, list):
+                    keywords = {kw: 1 for kw in keywords}
+                for keyword, weight in (keywords or {}).items():
+                    self.index.setdefault(str(keyword).lower(), []).append((dimension, label, float(weight)))
+        self.pattern = re.compile(_trie_pattern(list(self.index)), re.IGNORECASE) if self.index else None
+
+    def _counts(self, text: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        if self.pattern is None:
+            return counts
+        for match in self.pattern.finditer(text):
+            keyword = match.group().lower()
+            # 英文关键词按整词匹配：ai 不算 said / email 里的 ai
+            if _ASCII_WORD.fullmatch(keyword):
+                start, end = match.span()
+                if (start and text[start - 1].isascii() and text[start - 1].isalnum()) or (
+                    end < len(text) and text[end].isascii() and text[end].isalnum()
+                ):
+                    continue
+            counts[keyword] = counts.get(keyword, 0) + 1
+        return counts
+
+    def classify(self, text: str) -> Dict[str, Label]:
+        """返回 {维度: Label}"""
+        counts = self._counts(text)
+        scores: Dict[str, Dict[str, float]] = {dim: {} for dim in self.dimensions}
+        hits: Dict[Tuple[str, str], Dict[str, int]] = {}
+        for keyword, n in counts.items():
+            for dimension, label, weight in self.index[keyword]:
+                scores[dimension][label] = scores[dimension].get(label, 0.0) + weight * n
+                hits.setdefault((dimension, label), {})[keyword] = n
+        result = {}
+        for dimension, (default, order) in self.dimensions.items():
+            ranked = sorted(scores[dimension].items(), key=lambda kv: (-kv[1], order.index(kv[0])))
+            if ranked and ranked[0][1] >= self.min_score:
+                label, score = ranked[0]
+                result[dimension] = Label(label, score, hits[(dimension, label)], dict(ranked))
+            else:
+                result[dimension] = Label(default, 0.0, {}, dict(ranked))
+        return result
+
+
+_cached: Optional[Tuple[float, Classifier]] = None
+
+
+def shared(rules_path: Optional[str] = None) -> Classifier:
+    """按 send_rules.yaml 的 classification 段构建分类器；文件修改后自动重建"""
+    global _cached
+    path = Path(rules_path or RULES_PATH)
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        mtime = 0.0
+    if _cached is not None and _cached[0] == mtime:
+        return _cached[1]
+    rules = None
+    if mtime:
+        try:
+            import yaml
+
+            with open(path, "r", encoding="utf-8") as f:
+                rules = (yaml.safe_load(f) or {}).get("classification")
+        except Exception as e:
+            Logger.warning(f"分类规则读取失败，使用内置规则: {e}")
+    classifier = Classifier(rules)
+    _cached = (mtime, classifier)
+    return classifier
@@ -31,6 +31,28 @@ class Config:
     github_user: str = "SuperSweeey"
     github_repo: str = "SuperSweeey.github.io"
     github_repo_dir: str = "/root/.openclaw/workspace/SuperSweeey.github.io"
+    # GitHub Pages 发布：推送进行中到达的笔记合并为下一次提交推送，每批最多 N 条
+    github_batch_items: int = 20
+    # OSS 分片上传：超过阈值的文件分片并行上传、断点续传
+    oss_multipart_threshold_mb: int = 20
+    oss_part_size_mb: int = 5
+    oss_upload_threads: int = 4
+    # OSS 音频对象按内容复用，过期天数由存储桶生命周期规则回收（0 表示任务结束即异步批量删除）
+    oss_object_ttl_days: int = 1
+    oss_connection_pool_size: int = 16
+    # output/ 磁盘管理：保留的视频/音频配额、最少剩余空间、tmpfs 临时目录（"" 关闭）、孤儿回收时间
+    workspace_quota_gb: float = 20.0
+    workspace_min_free_gb: float = 2.0
+    scratch_tmpfs: str = "/dev/shm"
+    workspace_orphan_hours: float = 6.0
+    # 近重复转录判定阈值（MinHash 估计的 Jaccard 相似度，0 表示不判重）
+    dedupe_threshold: float = 0.8
+    # 音频指纹命中阈值（同一偏移上对齐的哈希占比，0 表示不做指纹比对）
+    fingerprint_threshold: float = 0.1
+    # 流式转录（main.py --stream）：首段时长决定首字延迟，后续按定长分段并行转录；webhook 为默认推送地址
+    stream_first_chunk_seconds: int = 60
+    stream_chunk_seconds: int = 300
+    stream_webhook: str = ""
 
     @classmethod
     def from_file(cls, filepath: str = "config.json") -> "Config":
@@ -8,17 +8,82 @@ import re
 import shutil
 import subprocess
 import tempfile
+import threading
 import time
 from pathlib import Path
 from typing import Optional
 import requests
 
 from pipeline.logger import Logger
+from pipeline import governor, metrics
+from pipeline.governor import CircuitOpenError, retry_after_of
+
+BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-web-security",
+    "--disable-features=IsolateOrigins,site-per-process",
+]
+# 直链下载每完成这一比例记一条进度日志
+PROGRESS_STEP = 0.25
+
+
+class BrowserHost:
+    """常驻浏览器：独立事件循环线程 + 复用的 Chromium 实例（服务模式使用）"""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="browser-host", daemon=True)
+        self.thread.start()
+        self._playwright = None
+        self._browser = None
+
+    @classmethod
+    def shared(cls) -> "BrowserHost":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    async def _ensure_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            from playwright.async_api import async_playwright
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            Logger.info("常驻浏览器已启动")
+        return self._browser
+
+    def run(self, coro_factory, timeout: float = 90):
+        """在浏览器线程上执行 coro_factory(browser)"""
+
+        async def runner():
+            return await coro_factory(await self._ensure_browser())
+
+        return asyncio.run_coroutine_threadsafe(runner(), self.loop).result(timeout)
+
+    def close(self):
+        async def shutdown():
+            if self._browser is not None:
+                await self._browser.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(15)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
 
 
 class DouyinDownloader:
     """抖音视频下载器"""
 
+    # 服务模式下置为 True，复用 BrowserHost 中的浏览器
+    warm_browser = False
+
     def __init__(self, output_dir: str = "./downloads", cookies_path: str = None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -46,7 +111,7 @@ class DouyinDownloader:
                 break
 
     async def _capture(self, url):
-        """使用Playwright捕获视频URL"""
+        """使用Playwright捕获视频URL（单次启动浏览器）"""
         try:
             from playwright.async_api import async_playwright
         except ImportError:
@@ -54,123 +119,122 @@ class DouyinDownloader:
             return False
 
         async with async_playwright() as p:
-            b = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-web-security",
-                    "--disable-features=IsolateOrigins,site-per-process",
-                ],
-            )
-
-            c = await b.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                viewport={"width": 1280, "height": 720},
-            )
-
-            # 加载cookies (支持Netscape格式和JSON格式)
-            if self.cookies_path:
-                try:
-                    with open(self.cookies_path, "r", encoding="utf-8") as f:
-                        first_line = f.readline()
-                        f.seek(0)
-
-                        if first_line.startswith("# Netscape"):
-                            # Netscape格式
-                            cookies = []
-                            for line in f:
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                # 处理#HttpOnly_开头的行
-                                is_http_only = False
-                                if line.startswith("#HttpOnly_"):
-                                    line = line[len("#HttpOnly_"):]
-                                    is_http_only = True
-                                elif line.startswith("#"):
-                                    continue
-                                parts = line.split("\t")
-                                if len(parts) >= 7:
-                                    cookie = {
-                                        "name": parts[5],
-                                        "value": parts[6],
-                                        "domain": parts[0],
-                                        "path": parts[2],
-                                        "secure": parts[3].lower() == "true",
-                                    }
-                                    if is_http_only:
-                                        cookie["httpOnly"] = True
-                                    cookies.append(cookie)
-                            await c.add_cookies(cookies)
-                        else:
-                            # JSON格式
-                            import json
-
-                            cookies = json.load(f)
-                            await c.add_cookies(cookies)
-                except Exception as e:
-                    Logger.warning(f"加载cookies失败: {e}")
-
-            page = await c.new_page()
-
-            async def h(r):
-                if "/web/aweme/detail/" in r.url and r.status == 200:
-                    try:
-                        data = await r.json()
-                        detail = data["aweme_detail"]
-                        self.vurl = detail["video"]["play_addr"]["url_list"][-1]
-                        self.title = detail.get("desc", "") or detail.get("share_info", {}).get("share_title", "")
-                        Logger.info(f"捕获到视频URL: {self.vurl[:60]}...")
-                        if self.title:
-                            Logger.info(f"视频标题: {self.title[:60]}")
-                    except:
-                        pass
+            b = await p.chromium.launch(headless=True, args=BROWSER_ARGS)
+            try:
+                return await self._capture_with(b, url)
+            finally:
+                await b.close()
 
-            page.on("response", h)
+    async def _capture_with(self, b, url):
+        """在已启动的浏览器中打开独立上下文捕获视频URL"""
+        c = await b.new_context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            viewport={"width": 1280, "height": 720},
+        )
 
+        # 加载cookies (支持Netscape格式和JSON格式)
+        if self.cookies_path:
             try:
-                target = url
-                if "v.douyin.com" in url or "iesdouyin.com" in url:
-                    Logger.info(f"访问短链接: {url}")
-                elif "modal_id=" in url:
-                    match = re.search(r"modal_id=([0-9]+)", url)
-                    if match:
-                        target = f"https://www.douyin.com/video/{match.group(1)}"
+                with open(self.cookies_path, "r", encoding="utf-8") as f:
+                    first_line = f.readline()
+                    f.seek(0)
+
+                    if first_line.startswith("# Netscape"):
+                        # Netscape格式
+                        cookies = []
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            # 处理#HttpOnly_开头的行
+                            is_http_only = False
+                            if line.startswith("#HttpOnly_"):
+                                line = line[len("#HttpOnly_"):]
+                                is_http_only = True
+                            elif line.startswith("#"):
+                                continue
+                            parts = line.split("\t")
+                            if len(parts) >= 7:
+                                cookie = {
+                                    "name": parts[5],
+                                    "value": parts[6],
+                                    "domain": parts[0],
+                                    "path": parts[2],
+                                    "secure": parts[3].lower() == "true",
+                                }
+                                if is_http_only:
+                                    cookie["httpOnly"] = True
+                                cookies.append(cookie)
+                        await c.add_cookies(cookies)
+                    else:
+                        # JSON格式
+                        import json
+
+                        cookies = json.load(f)
+                        await c.add_cookies(cookies)
+            except Exception as e:
+                Logger.warning(f"加载cookies失败: {e}")
 
-                Logger.info(f"访问页面: {target}")
+        page = await c.new_page()
 
+        async def h(r):
+            if "/web/aweme/detail/" in r.url and r.status == 200:
                 try:
-                    await page.goto(
-                        target, timeout=30000, wait_until="domcontentloaded"
-                    )
+                    data = await r.json()
+                    detail = data["aweme_detail"]
+                    self.vurl = detail["video"]["play_addr"]["url_list"][-1]
+                    self.title = detail.get("desc", "") or detail.get("share_info", {}).get("share_title", "")
+                    Logger.info(f"捕获到视频URL: {self.vurl[:60]}...")
+                    if self.title:
+                        Logger.info(f"视频标题: {self.title[:60]}")
                 except:
                     pass
 
+        page.on("response", h)
+
+        try:
+            target = url
+            if "v.douyin.com" in url or "iesdouyin.com" in url:
+                Logger.info(f"访问短链接: {url}")
+            elif "modal_id=" in url:
+                match = re.search(r"modal_id=([0-9]+)", url)
+                if match:
+                    target = f"https://www.douyin.com/video/{match.group(1)}"
+
+            Logger.info(f"访问页面: {target}")
+
+            try:
+                await page.goto(
+                    target, timeout=30000, wait_until="domcontentloaded"
+                )
+            except:
+                pass
+
+            try:
+                await page.wait_for_selector("video", timeout=10000)
+                await page.mouse.wheel(0, 500)
+            except:
+                pass
+
+            for i in range(20):
+                if self.vurl:
+                    break
+                await asyncio.sleep(0.5)
+
+            if not self.vurl:
                 try:
-                    await page.wait_for_selector("video", timeout=10000)
-                    await page.mouse.wheel(0, 500)
+                    src = await page.eval_on_selector("video", "v => v.src")
+                    if src and not src.startswith("blob:"):
+                        self.vurl = (
+                            src if src.startswith("http") else ("https:" + src)
+                        )
                 except:
                     pass
 
-                for i in range(20):
-                    if self.vurl:
-                        break
-                    await asyncio.sleep(0.5)
-
-                if not self.vurl:
-                    try:
-                        src = await page.eval_on_selector("video", "v => v.src")
-                        if src and not src.startswith("blob:"):
-                            self.vurl = (
-                                src if src.startswith("http") else ("https:" + src)
-                            )
-                    except:
-                        pass
-
-            except Exception as e:
-                Logger.error(f"页面访问错误: {e}")
-            finally:
-                await b.close()
+        except Exception as e:
+            Logger.error(f"页面访问错误: {e}")
+        finally:
+            await c.close()
 
         return bool(self.vurl)
 
@@ -207,18 +271,27 @@ class DouyinDownloader:
     def download(self, url: str, filename: str = None, audio_only: bool = False) -> str:
         """下载视频（或仅音频）"""
         self.vurl = None
+        gov = governor.get("douyin")
         for attempt in range(1, 4):
             try:
                 Logger.info(f"开始解析抖音视频地址（第 {attempt}/3 次）")
-                asyncio.run(self._capture(url))
+                with gov.slot():
+                    if self.warm_browser:
+                        BrowserHost.shared().run(lambda b: self._capture_with(b, url), timeout=90)
+                    else:
+                        asyncio.run(self._capture(url))
                 if self.vurl:
+                    gov.success()
                     break
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 Logger.warning(f"Playwright运行失败（第 {attempt}/3 次）: {e}")
             if attempt < 3:
-                time.sleep(2 * attempt)
+                gov.backoff(attempt)
 
         if not self.vurl:
+            gov.failure()
             raise RuntimeError("抖音下载失败[CAPTURE_FAILED]: 无法获取视频下载链接，可能是页面结构变化、网络异常或缺少有效 cookies。")
 
         if not filename:
@@ -233,19 +306,20 @@ class DouyinDownloader:
             for attempt in range(1, 4):
                 tmp = None
                 try:
-                    r = requests.get(
-                        self.vurl,
-                        headers={"User-Agent": "Mozilla/5.0"},
-                        stream=True,
-                        timeout=120,
-                    )
-                    r.raise_for_status()
-                    # 写到临时文件（无进度显示，临时文件自动清理）
-                    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                        tmp_path = tmp.name
-                        for chunk in r.iter_content(chunk_size=65536):
-                            if chunk:
-                                tmp.write(chunk)
+                    with gov.slot():
+                        r = requests.get(
+                            self.vurl,
+                            headers={"User-Agent": "Mozilla/5.0"},
+                            stream=True,
+                            timeout=120,
+                        )
+                        r.raise_for_status()
+                        # 写到临时文件（无进度显示，临时文件自动清理）
+                        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False, dir=str(self.output_dir)) as tmp:
+                            tmp_path = tmp.name
+                            for chunk in r.iter_content(chunk_size=65536):
+                                if chunk:
+                                    tmp.write(chunk)
                     # ffmpeg 从临时文件提取音频
                     cmd = [ffmpeg, "-i", tmp_path, "-vn", "-acodec", "libopus",
                            "-ar", "16000", "-b:a", "16k", "-y", str(out)]
@@ -260,6 +334,7 @@ class DouyinDownloader:
                             out.unlink()
                         if attempt < 3:
                             Logger.warning(f"转码失败（第 {attempt}/3 次），重试...")
+                            metrics.add_retry()
                             time.sleep(2 * attempt)
                             continue
                         raise RuntimeError(f"ffmpeg 转码失败: {err}")
@@ -268,16 +343,19 @@ class DouyinDownloader:
                     if tmp is not None:
                         Path(tmp_path).unlink(missing_ok=True)
                     code, hint = self._classify_download_error(e)
-                    if attempt < 3 and code in {"NETWORK_TIMEOUT", "NETWORK_ERROR", "RATE_LIMITED"}:
-                        Logger.warning(f"下载重试（第 {attempt}/3 次）: {code} - {hint}")
-                        time.sleep(2 * attempt)
-                        continue
+                    if code in {"NETWORK_TIMEOUT", "NETWORK_ERROR", "RATE_LIMITED"}:
+                        if attempt < 3:
+                            Logger.warning(f"下载重试（第 {attempt}/3 次）: {code} - {hint}")
+                            gov.backoff(attempt, retry_after_of(e))
+                            continue
+                        gov.failure()
                     raise RuntimeError(f"抖音下载失败[{code}]: {hint}") from e
                 except subprocess.TimeoutExpired:
                     if tmp is not None:
                         Path(tmp_path).unlink(missing_ok=True)
                     if attempt < 3:
                         Logger.warning(f"ffmpeg 超时（第 {attempt}/3 次），重试...")
+                        metrics.add_retry()
                         continue
                     raise RuntimeError("ffmpeg 转码超时")
                 except Exception as e:
@@ -296,36 +374,41 @@ class DouyinDownloader:
 
         for attempt in range(1, 4):
             try:
-                r = requests.get(
-                    self.vurl,
-                    headers={"User-Agent": "Mozilla/5.0"},
-                    stream=True,
-                    timeout=120,
-                )
-                r.raise_for_status()
+                with gov.slot():
+                    r = requests.get(
+                        self.vurl,
+                        headers={"User-Agent": "Mozilla/5.0"},
+                        stream=True,
+                        timeout=120,
+                    )
+                    r.raise_for_status()
 
-                total_size = int(r.headers.get("content-length", 0))
-                downloaded = 0
+                    total_size = int(r.headers.get("content-length", 0))
+                    downloaded = 0
+                    # 进度按 PROGRESS_STEP 的比例节流记一条日志（阶段由当前 span 标注），热循环里只做一次比较
+                    step = max(int(total_size * PROGRESS_STEP), 1) if total_size > 0 else 0
+                    next_report = step
 
-                with open(out, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
+                    with open(out, "wb") as f:
+                        for chunk in r.iter_content(chunk_size=1024 * 1024):
                             f.write(chunk)
                             downloaded += len(chunk)
-                            if total_size > 0 and downloaded % (1024 * 1024) < 8192:
-                                percent = (downloaded / total_size) * 100
-                                print(f"\r  进度: {percent:.1f}%", end="", flush=True)
-
-                print()
+                            if step and downloaded >= next_report:
+                                Logger.info(f"下载进度: {downloaded / total_size * 100:.0f}%")
+                                next_report = downloaded + step
                 break
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 code, hint = self._classify_download_error(e)
                 if out.exists():
                     out.unlink(missing_ok=True)
-                if attempt < 3 and code in {"NETWORK_TIMEOUT", "NETWORK_ERROR", "RATE_LIMITED"}:
-                    Logger.warning(f"抖音下载重试（第 {attempt}/3 次）: {code} - {hint}")
-                    time.sleep(3 * attempt)
-                    continue
+                if code in {"NETWORK_TIMEOUT", "NETWORK_ERROR", "RATE_LIMITED"}:
+                    if attempt < 3:
+                        Logger.warning(f"抖音下载重试（第 {attempt}/3 次）: {code} - {hint}")
+                        gov.backoff(attempt, retry_after_of(e))
+                        continue
+                    gov.failure()
                 raise RuntimeError(f"抖音下载失败[{code}]: {hint}") from e
 
         file_size = out.stat().st_size / (1024 * 1024)
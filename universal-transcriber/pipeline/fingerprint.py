@@ -0,0 +1,194 @@
+"""
+音频指纹模块
+同一段音频发到不同平台后链接不同，按 URL 的缓存命中不了。提取音频后本地算一个地标式指纹：
+短时频谱取局部峰值，峰值两两配对成 (f1, f2, Δt) 哈希，写入 SQLite 倒排表（与转录库同库）。
+查询时统计「库内偏移 − 查询偏移」直方图，同一偏移上对齐的哈希足够多即视为同一音频，
+直接复用已有转录，省掉 OSS 上传和 DashScope 调用。频谱与配对全部用 NumPy 向量化计算
+"""
+
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+RATE = 8000
+N_FFT = 1024
+HOP = 512
+# 只看 300Hz–3.5kHz（语音与人声主要能量所在，也避开转码最容易损伤的高频）
+MIN_BIN, MAX_BIN = 38, 448
+PEAK_TIME, PEAK_FREQ = 3, 12
+PEAKS_PER_FRAME = 2
+FAN_OUT = 6
+MAX_DT = 63
+# 查询只取前 QUERY_SECONDS 秒的哈希，长视频的查询代价不随时长增长
+QUERY_SECONDS = 120
+MIN_ALIGNED = 20
+# 时长相差超过该比例不算同一音频（避免短片段命中包含它的长视频）
+DURATION_TOLERANCE = 0.1
+_BLOCK_FRAMES = 2048
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fp_tracks (
+    id INTEGER PRIMARY KEY,
+    task_id TEXT UNIQUE NOT NULL,
+    seconds REAL NOT NULL,
+    hashes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fp_hashes (
+    hash INTEGER NOT NULL,
+    track INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fp_hashes_hash ON fp_hashes (hash);
+"""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("numpy库未安装，请运行: pip install numpy")
+    return numpy
+
+
+@dataclass
+class Fingerprint:
+    """hashes/offsets 为等长数组：哈希值与锚点所在帧"""
+
+    hashes: object
+    offsets: object
+    seconds: float
+
+
+def _sliding_max(np, array, radius: int, axis: int):
+    """沿 axis 的滑动窗口最大值（窗口 2*radius+1），按位移逐次取 maximum，避免展开窗口"""
+    out = array.copy()
+    size = array.shape[axis]
+    for shift in range(1, radius + 1):
+        if shift >= size:
+            break
+        head = [slice(None)] * array.ndim
+        tail = [slice(None)] * array.ndim
+        head[axis], tail[axis] = slice(shift, None), slice(None, -shift)
+        np.maximum(out[tuple(head)], array[tuple(tail)], out=out[tuple(head)])
+        np.maximum(out[tuple(tail)], array[tuple(head)], out=out[tuple(tail)])
+    return out
+
+
+def _peaks(np, spectrum):
+    """时频局部最大值，每帧最多保留 PEAKS_PER_FRAME 个最强峰"""
+    frames, bins = spectrum.shape
+    local_max = _sliding_max(np, _sliding_max(np, spectrum, PEAK_FREQ, 1), PEAK_TIME, 0)
+    floor = np.median(spectrum) + 2.0
+    candidates = np.where((spectrum >= local_max) & (spectrum > floor), spectrum, -np.inf)
+    k = min(PEAKS_PER_FRAME, bins)
+    top = np.argpartition(-candidates, k - 1, axis=1)[:, :k]
+    rows = np.repeat(np.arange(frames), k)
+    cols = top.ravel()
+    keep = np.isfinite(candidates[rows, cols])
+    return rows[keep], cols[keep]
+
+
+def compute(pcm: bytes) -> Fingerprint:
+    """16 位单声道 RATE Hz PCM → 指纹"""
+    np = _numpy()
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    seconds = len(samples) / RATE
+    if len(samples) < N_FFT:
+        return Fingerprint(np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32), seconds)
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    window = np.hanning(N_FFT).astype(np.float32)
+    frames = sliding_window_view(samples, N_FFT)[::HOP]
+    times, freqs = [], []
+    # 分块做 STFT，一小时音频的峰值内存也只有几十 MB
+    for start in range(0, len(frames), _BLOCK_FRAMES):
+        lead = min(start, PEAK_TIME)
+        block = frames[start - lead:start + _BLOCK_FRAMES + PEAK_TIME]
+        spectrum = np.log1p(np.abs(np.fft.rfft(block * window, axis=1))[:, MIN_BIN:MAX_BIN])
+        t, f = _peaks(np, spectrum)
+        inside = (t >= lead) & (t < lead + _BLOCK_FRAMES)
+        times.append(t[inside] - lead + start)
+        freqs.append(f[inside])
+    t = np.concatenate(times)
+    f = np.concatenate(freqs)
+    order = np.lexsort((f, t))
+    t, f = t[order], f[order]
+
+    hashes, offsets = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = t[k:] - t[:-k]
+        ok = (dt >= 1) & (dt <= MAX_DT)
+        # 哈希布局：锚点频率 9 位 | 目标频率 9 位 | Δt 6 位
+        anchor_f, target_f = f[:-k][ok].astype(np.uint32), f[k:][ok].astype(np.uint32)
+        hashes.append((anchor_f << 15) | (target_f << 6) | dt[ok].astype(np.uint32))
+        offsets.append(t[:-k][ok].astype(np.int32))
+    return Fingerprint(np.concatenate(hashes), np.concatenate(offsets), seconds)
+
+
+class FingerprintIndex:
+    """音频指纹倒排索引"""
+
+    def __init__(self, path: str, threshold: float = 0.1):
+        """threshold：同一偏移上对齐的哈希占查询哈希的最低比例"""
+        self.path = str(path)
+        self.threshold = threshold
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS fp_query (hash INTEGER, offset INTEGER)")
+            self._local.conn = conn
+        return conn
+
+    def add(self, task_id: str, fingerprint: Fingerprint):
+        rows = zip(fingerprint.hashes.tolist(), fingerprint.offsets.tolist())
+        with self._write_lock, self._conn() as conn:
+            old = conn.execute("SELECT id FROM fp_tracks WHERE task_id = ?", (task_id,)).fetchone()
+            if old is not None:
+                conn.execute("DELETE FROM fp_hashes WHERE track = ?", old)
+                conn.execute("DELETE FROM fp_tracks WHERE id = ?", old)
+            track = conn.execute(
+                "INSERT INTO fp_tracks (task_id, seconds, hashes) VALUES (?, ?, ?)",
+                (task_id, fingerprint.seconds, len(fingerprint.hashes)),
+            ).lastrowid
+            conn.executemany("INSERT INTO fp_hashes (hash, track, offset) VALUES (?, ?, ?)",
+                             ((h, track, o) for h, o in rows))
+
+    def query(self, fingerprint: Fingerprint, exclude: str = "") -> Optional[Dict]:
+        """命中返回 {"task_id", "score", "aligned"}：score 为对齐哈希占查询哈希的比例"""
+        window = fingerprint.offsets < QUERY_SECONDS * RATE // HOP
+        hashes = fingerprint.hashes[window].tolist()
+        if len(hashes) < MIN_ALIGNED:
+            return None
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM fp_query")
+            conn.executemany("INSERT INTO fp_query (hash, offset) VALUES (?, ?)",
+                             zip(hashes, fingerprint.offsets[window].tolist()))
+            rows = conn.execute(
+                "SELECT t.task_id, t.seconds, COUNT(*) AS aligned FROM fp_query q"
+                " JOIN fp_hashes h ON h.hash = q.hash JOIN fp_tracks t ON t.id = h.track"
+                " WHERE t.task_id != ? GROUP BY h.track, h.offset - q.offset ORDER BY aligned DESC LIMIT 5",
+                (exclude,),
+            ).fetchall()
+            conn.execute("DELETE FROM fp_query")
+        for task_id, seconds, aligned in rows:
+            score = aligned / len(hashes)
+            if aligned < MIN_ALIGNED or score < self.threshold:
+                break
+            if abs(seconds - fingerprint.seconds) <= DURATION_TOLERANCE * max(seconds, fingerprint.seconds):
+                return {"task_id": task_id, "score": round(score, 3), "aligned": aligned}
+        return None
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM fp_tracks").fetchone()[0]
+
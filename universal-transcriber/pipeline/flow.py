@@ -0,0 +1,307 @@
+"""
+转录流程定义
+下载 → 提取/指纹 → 上传 → 转录 → 保存/判重 → 交付 → 入库 的阶段图，main.run_task 与 TranscriptionPipeline 共用。
+
+ctx 约定的初始键：
+    task_id, platform, url, cookies_path, save_video, services, downloader,
+    download_dir, audio_dir, transcripts_dir, keep_source, keep_audio
+（download_dir / audio_dir 为保留目录或任务临时目录，见 pipeline.workspace）
+交付阶段额外需要：config, send_targets, dry_run（分发）或 notion, notion_title（Notion 同步）
+可选 partials（pipeline.partials.PartialPublisher）：分段流式转录，转完一段推送一段
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict
+
+from pipeline import metrics
+from pipeline.graph import Stage, StageCache, StageGraph
+from pipeline.logger import Logger
+
+cache = StageCache()
+
+# 可写回任务存储的阶段产出：与机器无关、可 JSON 序列化（本地路径和临时签名 URL 不算）
+CHECKPOINT_KEYS = ("transcript", "segments", "original_title", "ai_title")
+
+
+def _size(path) -> int:
+    try:
+        return os.path.getsize(str(path)) if path else 0
+    except OSError:
+        return 0
+
+
+def _download(ctx: Dict) -> Dict:
+    ctx["services"].workspace().ensure_space()
+    source_path = ctx["downloader"].download(
+        ctx["url"],
+        str(ctx["download_dir"]),
+        ctx["task_id"],
+        ctx.get("cookies_path"),
+        audio_only=not ctx.get("save_video"),
+    )
+    metrics.add_bytes(bytes_in=_size(source_path))
+    Logger.info(f"下载完成: {source_path}")
+    return {"source_path": source_path}
+
+
+def _drop_source(ctx: Dict):
+    source_path = ctx.get("source_path")
+    if not source_path or not os.path.exists(source_path):
+        return
+    if ctx.get("keep_source"):
+        Logger.info(f"保留视频文件: {Path(source_path).name}")
+        return
+    os.remove(source_path)
+    Logger.info(f"已删除临时源文件: {Path(source_path).name}")
+
+
+def _extract(ctx: Dict) -> Dict:
+    audio_path = ctx["services"].extractor().extract(
+        ctx["source_path"], f"audio_{ctx['task_id']}", output_dir=ctx.get("audio_dir")
+    )
+    metrics.add_bytes(bytes_in=_size(ctx["source_path"]), bytes_out=_size(audio_path))
+    Logger.info(f"音频提取完成: {audio_path}")
+    return {"audio_path": audio_path}
+
+
+def _drop_audio(ctx: Dict):
+    audio_path = ctx.get("audio_path")
+    if ctx.get("keep_audio") or not audio_path or not os.path.exists(audio_path):
+        return
+    os.remove(audio_path)
+    Logger.info("已删除临时音频文件")
+
+
+def _fingerprint(ctx: Dict) -> Dict:
+    # 同一音频换了链接再次出现时，直接复用已有转录（跳过上传与云端转录）
+    services = ctx["services"]
+    if services.config.fingerprint_threshold <= 0:
+        return {"audio_match": None}
+    try:
+        from pipeline import fingerprint
+
+        pcm = services.extractor().decode_pcm(ctx["audio_path"], fingerprint.RATE)
+        fp = fingerprint.compute(pcm)
+        match = services.fingerprint_index().query(fp, exclude=ctx["task_id"])
+        if match and services.transcript_store().get(match["task_id"]) is None:
+            match = None
+    except Exception as e:
+        Logger.warning(f"音频指纹计算失败，照常转录: {e}", ctx["task_id"])
+        return {"audio_match": None}
+    if match:
+        Logger.info(
+            f"音频指纹命中任务 {match['task_id']}（对齐 {match['aligned']} 个哈希，占比 {match['score']}），复用其转录",
+            ctx["task_id"],
+        )
+    return {"audio_match": match, "fingerprint": fp}
+
+
+def _upload(ctx: Dict) -> Dict:
+    # 指纹命中不需要上传；流式转录在转录阶段逐段上传
+    if ctx.get("audio_match") or ctx.get("partials"):
+        return {"oss_url": None, "oss_object": None}
+    oss_url, oss_object = ctx["services"].uploader().upload_audio(ctx["audio_path"])
+    Logger.info("OSS上传完成")
+    return {"oss_url": oss_url, "oss_object": oss_object}
+
+
+def _release_oss_object(ctx: Dict):
+    # 未启用 TTL 回收时，最后一个使用者转录完即删除；删除异步攒批，不占关键路径
+    if ctx.get("oss_object"):
+        ctx["services"].uploader().release(ctx["oss_object"])
+
+
+def _transcribe(ctx: Dict) -> Dict:
+    publisher = ctx.get("partials")
+    if ctx.get("audio_match"):
+        original = ctx["services"].transcript_store().get(ctx["audio_match"]["task_id"])
+        segments = original["segments"] or []
+        if publisher is not None:
+            end_time = segments[-1]["end_time"] if segments else None
+            publisher.partial(ctx["task_id"], 0, 1, original["transcript"], segments, 0, end_time)
+        return {"transcript": original["transcript"], "segments": segments}
+    if publisher is not None:
+        from pipeline.partials import transcribe_chunked
+
+        scratch = ctx.get("scratch")
+        chunk_dir = str(Path(scratch.path) / "chunks") if scratch is not None else None
+        transcript, segments = transcribe_chunked(ctx["services"], ctx["audio_path"], ctx["task_id"], publisher,
+                                                  chunk_dir)
+    else:
+        transcript, segments = ctx["services"].transcriber().transcribe_detailed(
+            ctx["oss_url"], task_id=ctx["task_id"]
+        )
+    metrics.add_bytes(bytes_in=len(transcript.encode("utf-8")))
+    return {"transcript": transcript, "segments": segments}
+
+
+def _save(ctx: Dict) -> Dict:
+    transcript_path = Path(ctx["transcripts_dir"]) / f"transcript_{ctx['task_id']}.txt"
+    transcript_path.write_text(ctx.get("transcript_header", "") + ctx["transcript"], encoding="utf-8")
+    Logger.success(f"转录文本已保存: {transcript_path.name}")
+    Logger.plain(f"\n转录预览（前300字）:\n{ctx['transcript'][:300]}\n")
+    return {"transcript_path": str(transcript_path)}
+
+
+def _dedupe(ctx: Dict) -> Dict:
+    # 转录一出来就判重：近重复的转发视频直接关联原始转录，后续标题、摘要、发布都省掉
+    duplicate = None
+    services = ctx["services"]
+    if services.config.dedupe_threshold <= 0:
+        return {"duplicate": None}
+    from pipeline.near_dup import comparable
+
+    if not comparable(ctx["transcript"]):
+        # 过短的文本不判重也不入索引（_index 见不到 minhash 即跳过）
+        return {"duplicate": None}
+    try:
+        index = services.duplicate_index()
+        signature = index.signature(ctx["transcript"])
+        match = index.query(signature, exclude=ctx["task_id"])
+        original = services.transcript_store().get(match["task_id"]) if match else None
+    except Exception as e:
+        Logger.warning(f"近重复检测失败，按新内容处理: {e}", ctx["task_id"])
+        return {"duplicate": None}
+    if original is not None:
+        duplicate = {
+            "task_id": original["task_id"],
+            "url": original["url"],
+            "ai_title": original["ai_title"],
+            "similarity": match["similarity"],
+        }
+        Logger.info(f"检测到近重复转录: {original['url']}（相似度 {match['similarity']}）", ctx["task_id"])
+    return {"duplicate": duplicate, "minhash": signature}
+
+
+def _title(ctx: Dict) -> Dict:
+    import dispatcher
+
+    original = ctx["downloader"].get_title(ctx["url"], ctx.get("cookies_path"))
+    duplicate = ctx.get("duplicate")
+    if duplicate and duplicate["ai_title"]:
+        ai_title = duplicate["ai_title"]
+    else:
+        ai_title = dispatcher.generate_title(ctx["transcript"], ctx["config"]) or ""
+    return {"original_title": original or f"{ctx['platform']}_{ctx['task_id']}", "ai_title": ai_title}
+
+
+def _title_key(ctx: Dict):
+    return ctx["url"], hashlib.sha1(ctx["transcript"].encode("utf-8")).hexdigest()
+
+
+def _dispatch(ctx: Dict) -> Dict:
+    import dispatcher
+
+    result = dispatcher.dispatch(
+        ctx["transcript"],
+        ctx["original_title"],
+        ctx["url"],
+        ctx["platform"],
+        ctx["config"],
+        cli_targets=ctx.get("send_targets") or None,
+        dry_run=ctx.get("dry_run", False),
+        ai_title=ctx["ai_title"],
+        duplicate_of=ctx.get("duplicate"),
+    )
+    metrics.add_bytes(bytes_out=len(ctx["transcript"].encode("utf-8")) * len(result["send_results"]))
+    return {"dispatch_result": result}
+
+
+def _notion(ctx: Dict) -> Dict:
+    if ctx.get("duplicate"):
+        Logger.info(f"近重复内容，跳过Notion同步（原始任务 {ctx['duplicate']['task_id']}）", ctx["task_id"])
+        return {"notion_page": None}
+    try:
+        page = ctx["notion"].create_page(ctx["notion_title"], ctx["url"], ctx["transcript"])
+    except Exception as e:
+        Logger.warning(f"Notion同步失败: {e}")
+        page = None
+    return {"notion_page": page}
+
+
+def _index(ctx: Dict) -> Dict:
+    # 入库失败不影响任务结果，之后可用 main.py reindex 补录
+    duplicate = ctx.get("duplicate")
+    try:
+        ctx["services"].transcript_store().add(
+            ctx["task_id"],
+            ctx["transcript"],
+            platform=ctx["platform"],
+            url=ctx["url"],
+            title=ctx.get("original_title") or ctx.get("notion_title", ""),
+            ai_title=ctx.get("ai_title", ""),
+            summary=(ctx.get("dispatch_result") or {}).get("summary", ""),
+            segments=ctx.get("segments"),
+            transcript_path=ctx.get("transcript_path", ""),
+            duplicate_of=duplicate["task_id"] if duplicate else "",
+        )
+        # 只有原始转录进近重复索引，桶里不堆积转发副本；指纹同理
+        if not duplicate and ctx.get("minhash") is not None:
+            ctx["services"].duplicate_index().add(ctx["task_id"], ctx["minhash"])
+        if not ctx.get("audio_match") and ctx.get("fingerprint") is not None:
+            ctx["services"].fingerprint_index().add(ctx["task_id"], ctx["fingerprint"])
+    except Exception as e:
+        Logger.warning(f"转录入库失败: {e}", ctx["task_id"])
+    return {}
+
+
+def _index_stage(*inputs: str) -> Stage:
+    return Stage("index", _index, inputs=("transcript_path", "duplicate") + inputs)
+
+
+def _core(download_label: str):
+    return [
+        Stage("download", _download, outputs=("source_path",), label=download_label,
+              cleanup=_drop_source, attrs=lambda ctx: {"platform": ctx["platform"]}),
+        Stage("extract", _extract, inputs=("source_path",), outputs=("audio_path",),
+              label="提取音频", cleanup=_drop_audio),
+        Stage("fingerprint", _fingerprint, inputs=("audio_path",), outputs=("audio_match",)),
+        Stage("upload", _upload, inputs=("audio_path", "audio_match"), outputs=("oss_url", "oss_object"),
+              label="上传到OSS", retries=1, cleanup=_release_oss_object),
+        # 流式转录直接切分本地音频：声明 audio_path，提取阶段的清理要等转录结束
+        Stage("transcribe", _transcribe, inputs=("oss_url", "audio_match", "audio_path"), outputs=("transcript",),
+              label="云端转录"),
+        Stage("save", _save, inputs=("transcript",), outputs=("transcript_path",)),
+        Stage("dedupe", _dedupe, inputs=("transcript",), outputs=("duplicate",)),
+    ]
+
+
+# 多平台任务：标题生成与转录落盘并行，之后统一分发
+TASK_GRAPH = StageGraph(
+    _core("下载视频/音频")
+    + [
+        Stage("title", _title, inputs=("transcript", "duplicate"), outputs=("original_title", "ai_title"),
+              cache_key=_title_key),
+        Stage("dispatch", _dispatch,
+              inputs=("transcript", "original_title", "ai_title", "transcript_path", "duplicate"),
+              outputs=("dispatch_result",), label="分发内容"),
+        _index_stage("dispatch_result"),
+    ],
+    cache=cache,
+)
+
+# 跨任务流水线（main.py batch）的工位划分与默认线程数：网络、CPU、云端轮询各自独立扩缩
+TASK_POOLS = (
+    ("download", ("download",)),
+    ("extract", ("extract", "fingerprint")),
+    ("upload", ("upload",)),
+    ("transcribe", ("transcribe",)),
+    ("deliver", ("save", "dedupe", "title", "dispatch", "index")),
+)
+POOL_SIZES = {"download": 3, "extract": 2, "upload": 3, "transcribe": 8, "deliver": 2}
+
+# 只转录落盘，不交付
+TRANSCRIBE_GRAPH = StageGraph(_core("下载视频") + [_index_stage()], cache=cache)
+
+# 抖音 + Notion 同步（TranscriptionPipeline）
+NOTION_GRAPH = StageGraph(
+    _core("下载视频")
+    + [
+        Stage("dispatch", _notion, inputs=("transcript", "transcript_path", "duplicate"), outputs=("notion_page",),
+              label="保存到Notion", attrs=lambda ctx: {"target": "notion"}),
+        _index_stage(),
+    ],
+    cache=cache,
+)
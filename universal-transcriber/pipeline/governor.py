@@ -0,0 +1,314 @@
+"""
+外部服务调度模块
+每个服务一个 Governor：令牌桶限速、并发上限、带抖动的指数退避（遵守 Retry-After）与熔断器。
+参数来自 send_rules.yaml 的 governors 段，未配置的服务使用 DEFAULTS。
+"""
+
+import contextlib
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from pipeline import metrics
+from pipeline.logger import Logger
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "config" / "send_rules.yaml"
+TRANSIENT_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+DEFAULTS: Dict[str, Dict] = {
+    "default": {
+        "rate": 5.0,
+        "burst": 5,
+        "concurrency": 4,
+        "max_retries": 3,
+        "base_delay": 1.0,
+        "max_delay": 30.0,
+        "failure_threshold": 5,
+        "reset_timeout": 60.0,
+    },
+    "douyin": {"rate": 0.5, "burst": 2, "concurrency": 2, "base_delay": 2.0},
+    "yt_dlp": {"rate": 0.5, "burst": 2, "concurrency": 3, "base_delay": 3.0},
+    "oss": {"rate": 20.0, "burst": 20, "concurrency": 8},
+    "dashscope": {"rate": 2.0, "burst": 4, "concurrency": 4},
+    "notion": {"rate": 3.0, "burst": 3, "concurrency": 3, "max_retries": 5},
+    "llm": {"rate": 2.0, "burst": 4, "concurrency": 4, "base_delay": 5.0},
+    "github": {"rate": 1.0, "burst": 2, "concurrency": 1, "base_delay": 5.0},
+}
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全）"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """阻塞直到取得令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """服务端要求退避时清空令牌，所有调用方一起等待"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间拒绝调用"""
+
+    def __init__(self, service: str, remaining: float):
+        super().__init__(f"服务 {service} 熔断中，{remaining:.0f}s 后再试")
+        self.service = service
+        self.remaining = remaining
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    """从异常中取服务端要求的等待秒数（retry_after 属性或响应头 Retry-After）"""
+    value = getattr(exc, "retry_after", None)
+    if value is not None:
+        return value
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    return parse_retry_after(headers.get("Retry-After")) if headers is not None else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """限流、5xx、网络错误视为可重试；其余 4xx 与程序错误不重试"""
+    status = _status_of(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    return isinstance(exc, (OSError, TimeoutError))
+
+
+class Governor:
+    """单个外部服务的限速、并发、退避与熔断"""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 5.0,
+        burst: Optional[float] = None,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = int(concurrency)
+        self.max_retries = int(max_retries)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+        self._in_flight = 0
+
+    def _admit(self):
+        """熔断检查：打开期内拒绝；到期后每个 reset_timeout 只放行一个探测请求（半开）"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            since = self._probe_at if self._probe_at is not None else self._opened_at
+            remaining = since + self.reset_timeout - now
+            if remaining > 0:
+                raise CircuitOpenError(self.name, remaining)
+            self._probe_at = now
+
+    @contextlib.contextmanager
+    def slot(self):
+        """占用一个并发名额并消耗一个令牌"""
+        self._admit()
+        self._slots.acquire()
+        try:
+            self.bucket.acquire()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                yield self
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+        finally:
+            self._slots.release()
+
+    def success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                Logger.info(f"{self.name} 熔断恢复")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_at = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_at is not None or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._probe_at = None
+                Logger.warning(
+                    f"{self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f}s"
+                )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """服务端给了 Retry-After 就照办，否则指数退避加抖动（取区间上半段）"""
+        if retry_after is not None:
+            return retry_after
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None, reason: str = "") -> float:
+        """等待后重试。带 Retry-After 的限流由令牌桶暂停承接（所有调用方一起退避）。
+        中间重试不计入熔断：一次调用最终失败时由调用方计一次 failure()"""
+        wait = self.delay(attempt, retry_after)
+        metrics.add_retry()
+        if reason:
+            Logger.warning(f"{self.name} 重试（第 {attempt} 次失败，{wait:.1f}s 后）: {reason}")
+        if retry_after is not None:
+            self.bucket.pause(wait)
+        else:
+            time.sleep(wait)
+        return wait
+
+    def call(
+        self,
+        fn: Callable,
+        retryable: Callable[[BaseException], bool] = is_transient,
+        max_retries: Optional[int] = None,
+    ):
+        """在名额内执行 fn()，可重试的错误按退避策略重试"""
+        attempts = max_retries or self.max_retries
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.slot():
+                    result = fn()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not retryable(e):
+                    # 服务有响应（如 4xx）或程序错误：既不算失败，也不清零连续失败计数
+                    raise
+                if attempt >= attempts:
+                    self.failure()
+                    raise
+                self.backoff(attempt, retry_after_of(e), reason=str(e)[:120])
+                continue
+            self.success()
+            return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            if self._opened_at is None:
+                state = "closed"
+            elif self._probe_at is not None:
+                state = "half_open"
+            else:
+                state = "open"
+            return {
+                "state": state,
+                "failures": self._failures,
+                "in_flight": self._in_flight,
+                "concurrency": self.concurrency,
+                "rate": self.bucket.rate,
+            }
+
+
+_governors: Dict[str, Governor] = {}
+_settings: Optional[Dict[str, Dict]] = None
+_lock = threading.Lock()
+
+
+def _load_settings() -> Dict[str, Dict]:
+    try:
+        import yaml
+
+        with open(RULES_PATH, "r", encoding="utf-8") as f:
+            return (yaml.safe_load(f) or {}).get("governors") or {}
+    except Exception:
+        return {}
+
+
+def _resolve(name: str, settings: Dict[str, Dict]) -> Dict:
+    """内置 default → 内置服务值 → yaml default → yaml 服务值，后者覆盖前者"""
+    merged = dict(DEFAULTS["default"])
+    merged.update(DEFAULTS.get(name, {}))
+    merged.update(settings.get("default") or {})
+    merged.update(settings.get(name) or {})
+    return merged
+
+
+def configure(settings: Optional[Dict[str, Dict]]):
+    """应用 send_rules.yaml 的 governors 段；参数变化的服务重建，其余保留熔断状态"""
+    global _settings
+    settings = settings or {}
+    with _lock:
+        previous = _settings
+        _settings = settings
+        if previous is None:
+            return
+        for name in list(_governors):
+            if _resolve(name, previous) != _resolve(name, settings):
+                _governors.pop(name)
+
+
+def get(name: str) -> Governor:
+    """按服务名取进程内共享的 Governor"""
+    global _settings
+    with _lock:
+        gov = _governors.get(name)
+        if gov is None:
+            if _settings is None:
+                _settings = _load_settings()
+            gov = Governor(name, **_resolve(name, _settings))
+            _governors[name] = gov
+        return gov
+
+
+def stats() -> Dict[str, Dict]:
+    with _lock:
+        governors = list(_governors.values())
+    return {gov.name: gov.stats() for gov in governors}
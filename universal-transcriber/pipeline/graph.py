@@ -0,0 +1,197 @@
+"""
+阶段图执行模块
+每个阶段声明输入与输出，调度器在输入就绪时执行；互不依赖的阶段并行运行，
+并统一处理重试、结果缓存、阶段计量与清理
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from pipeline import metrics
+from pipeline.logger import Logger
+
+
+@dataclass
+class Stage:
+    """一个阶段：fn(ctx) 返回包含 outputs 各键的字典"""
+
+    name: str
+    fn: Callable[[Dict], Dict]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    label: str = ""
+    retries: int = 0
+    cache_key: Optional[Callable[[Dict], Hashable]] = None
+    cleanup: Optional[Callable[[Dict], None]] = None
+    attrs: Callable[[Dict], Dict] = field(default=lambda ctx: {})
+
+
+class StageFailed(RuntimeError):
+    """某个阶段最终失败；ctx 保留失败前已产出的结果"""
+
+    def __init__(self, stage: Stage, error: BaseException, ctx: Dict):
+        super().__init__(str(error))
+        self.stage = stage
+        self.error = error
+        self.ctx = ctx
+
+
+class StageCache:
+    """进程内 LRU 缓存，按阶段名 + cache_key 保存阶段输出"""
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[str, Hashable], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: Dict):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+class StageGraph:
+    """声明式阶段图与调度器"""
+
+    def __init__(self, stages: List[Stage], cache: Optional[StageCache] = None, workers: int = 4):
+        producers = {}
+        for stage in stages:
+            for key in stage.outputs:
+                if key in producers:
+                    raise ValueError(f"输出 {key} 同时由 {producers[key]} 和 {stage.name} 产生")
+                producers[key] = stage.name
+        self.stages = list(stages)
+        self.cache = cache or StageCache()
+        self.workers = workers
+        self._steps = {s.name: i for i, s in enumerate((s for s in stages if s.label), 1)}
+        self._total_steps = len(self._steps)
+        # 阶段产出被哪些阶段消费：全部消费者结束后即可清理
+        self._consumers = {
+            s.name: {c.name for c in stages if set(c.inputs) & set(s.outputs)} for s in stages
+        }
+
+    def needed(self, ctx: Dict) -> List[Stage]:
+        """从检查点恢复时：输出已在 ctx 中的阶段跳过，只为被跳过阶段供数的上游也一并跳过"""
+        needed = set()
+        for stage in reversed(self.stages):
+            if stage.outputs and all(k in ctx for k in stage.outputs):
+                continue
+            consumers = self._consumers[stage.name]
+            if not consumers or consumers & needed:
+                needed.add(stage.name)
+        return [s for s in self.stages if s.name in needed]
+
+    def run(self, ctx: Dict, task_id: str = "",
+            on_stage: Optional[Callable[[Stage, Dict], None]] = None) -> Dict:
+        """执行整张图，返回补全后的 ctx；失败时抛出 StageFailed（清理照常执行）。
+        on_stage(stage, result) 在每个阶段成功后调用，用于写检查点"""
+        pending = self.needed(ctx)
+        finished = set()
+        cleaned = set()
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stage-{task_id}") as pool:
+            running = {}
+            while pending or running:
+                if failure is None:
+                    for stage in [s for s in pending if all(k in ctx for k in s.inputs)]:
+                        pending.remove(stage)
+                        running[pool.submit(self.execute, stage, dict(ctx), task_id)] = stage
+                if not running:
+                    if pending and failure is None:
+                        missing = sorted({k for s in pending for k in s.inputs if k not in ctx})
+                        failure = StageFailed(pending[0], RuntimeError(f"缺少输入: {', '.join(missing)}"), ctx)
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if failure is None:
+                            failure = StageFailed(stage, e, ctx)
+                        continue
+                    ctx.update(result)
+                    finished.add(stage.name)
+                    if on_stage is not None:
+                        try:
+                            on_stage(stage, result)
+                        except Exception as e:
+                            Logger.warning(f"{stage.name} 检查点写入失败: {e}", task_id)
+                for stage in self.stages:
+                    if self._releasable(stage, finished, cleaned, pending, running):
+                        cleaned.add(stage.name)
+                        pool.submit(self.cleanup, stage, ctx, task_id)
+            for stage in self.stages:
+                if stage.cleanup and stage.name in finished and stage.name not in cleaned:
+                    self.cleanup(stage, ctx, task_id)
+        if failure is not None:
+            raise failure
+        return ctx
+
+    def _releasable(self, stage, finished, cleaned, pending, running) -> bool:
+        if stage.cleanup is None or stage.name not in finished or stage.name in cleaned:
+            return False
+        consumers = self._consumers[stage.name]
+        if not consumers:
+            return False
+        busy = {s.name for s in pending} | {s.name for s in running.values()}
+        return not consumers & busy and consumers <= finished
+
+    def stage(self, name: str) -> Stage:
+        return next(s for s in self.stages if s.name == name)
+
+    def releasable(self, finished, cleaned) -> List[Stage]:
+        """产出已被全部消费者用完、可以清理的阶段（跨任务流水线按任务逐步释放）"""
+        return [
+            s for s in self.stages
+            if s.cleanup and s.name in finished and s.name not in cleaned
+            and self._consumers[s.name] and self._consumers[s.name] <= finished
+        ]
+
+    def execute(self, stage: Stage, ctx: Dict, task_id: str) -> Dict:
+        """执行单个阶段：步骤日志、缓存、span 计量与重试；ctx["cancel"]（threading.Event）已置位时不再开始"""
+        cancel = ctx.get("cancel")
+        if cancel is not None and cancel.is_set():
+            raise RuntimeError("任务已取消")
+        if stage.label:
+            Logger.step(self._steps[stage.name], self._total_steps, stage.label, task_id)
+        key = (stage.name, stage.cache_key(ctx)) if stage.cache_key else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                Logger.info(f"{stage.name} 命中缓存", task_id)
+                return dict(cached)
+        with metrics.span(stage.name, task_id, **stage.attrs(ctx)):
+            for attempt in range(stage.retries + 1):
+                try:
+                    result = stage.fn(ctx) or {}
+                    break
+                except Exception as e:
+                    if attempt >= stage.retries:
+                        raise
+                    metrics.add_retry()
+                    Logger.warning(f"{stage.name} 失败，重试（{attempt + 1}/{stage.retries}）: {e}", task_id)
+        missing = [k for k in stage.outputs if k not in result]
+        if missing:
+            raise RuntimeError(f"阶段 {stage.name} 未产出: {', '.join(missing)}")
+        if key is not None:
+            self.cache.put(key, dict(result))
+        return result
+
+    def cleanup(self, stage: Stage, ctx: Dict, task_id: str):
+        try:
+            stage.cleanup(ctx)
+        except Exception as e:
+            Logger.warning(f"{stage.name} 清理失败: {e}", task_id)
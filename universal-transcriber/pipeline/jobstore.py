@@ -0,0 +1,496 @@
+"""
+任务存储模块
+多个 worker 进程（或多台机器）共享的任务表：认领时加租约，运行中定期续约，
+租约过期的任务重新排队；结果与阶段检查点写回存储，重跑时从检查点继续。
+
+    sqlite:///path/to/jobs.db   本地/共享盘上的 SQLite（WAL）
+    redis://host:6379/0         Redis（需要 redis 库）
+    memory://                   进程内的 Redis 替身，用于本地调试
+"""
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from pipeline.scheduler import PRIORITIES
+
+MAX_ATTEMPTS = 3
+# Redis 认领时一次查看的队首候选数；候选都被其他 worker 抢先加了租约时留待下一轮
+CLAIM_CANDIDATES = 8
+
+
+def _now() -> float:
+    return time.time()
+
+
+class JobStore(ABC):
+    """任务存储接口"""
+
+    @abstractmethod
+    def enqueue(self, payload: Dict, priority: str = "normal", job_id: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease: float) -> Optional[Dict]:
+        """认领一个排队任务，返回 {job_id, payload, checkpoint, attempts}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str, lease: float) -> bool:
+        """续约；租约已被收回时返回 False，worker 应放弃该任务"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def checkpoint(self, job_id: str, worker_id: str, values: Dict) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, result: Dict, failed: bool = False) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def requeue_expired(self) -> int:
+        """把租约过期的任务放回队列（超过 MAX_ATTEMPTS 次则标记失败）"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite 实现；每个线程一个连接，认领用 BEGIN IMMEDIATE 保证互斥"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        checkpoint TEXT NOT NULL DEFAULT '{}',
+        result TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        lease_until REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+    CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_until);
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, payload, priority="normal", job_id=None):
+        job_id = job_id or str(uuid.uuid4())[:8]
+        now = _now()
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, status, priority, payload, created_at, updated_at)"
+            " VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, PRIORITIES[priority], json.dumps(payload, ensure_ascii=False), now, now),
+        )
+        return job_id
+
+    def claim(self, worker_id, lease):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = _now()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                (worker_id, now + lease, now, row["job_id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {
+            "job_id": row["job_id"],
+            "payload": json.loads(row["payload"]),
+            "checkpoint": json.loads(row["checkpoint"]),
+            "attempts": row["attempts"] + 1,
+        }
+
+    def _owned_update(self, sql, params, job_id, worker_id) -> bool:
+        cur = self._conn().execute(
+            sql + " WHERE job_id = ? AND worker = ? AND status = 'running'", (*params, job_id, worker_id)
+        )
+        return cur.rowcount == 1
+
+    def heartbeat(self, job_id, worker_id, lease):
+        now = _now()
+        return self._owned_update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ?", (now + lease, now), job_id, worker_id
+        )
+
+    def checkpoint(self, job_id, worker_id, values):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT checkpoint FROM jobs WHERE job_id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker_id),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return False
+            merged = {**json.loads(row["checkpoint"]), **values}
+            conn.execute(
+                "UPDATE jobs SET checkpoint = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(merged, ensure_ascii=False), _now(), job_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def complete(self, job_id, worker_id, result, failed=False):
+        return self._owned_update(
+            "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated_at = ?",
+            ("failed" if failed else "done", json.dumps(result, ensure_ascii=False), _now()),
+            job_id,
+            worker_id,
+        )
+
+    def requeue_expired(self):
+        now = _now()
+        conn = self._conn()
+        failed = conn.execute(
+            "UPDATE jobs SET status = 'failed', result = ?, worker = NULL, lease_until = NULL, updated_at = ?"
+            " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (json.dumps({"error": "租约多次过期"}, ensure_ascii=False), now, now, MAX_ATTEMPTS),
+        ).rowcount
+        requeued = conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, updated_at = ?"
+            " WHERE status = 'running' AND lease_until < ?",
+            (now, now),
+        ).rowcount
+        return requeued + failed
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("payload", "checkpoint", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def stats(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class WatchError(Exception):
+    """WATCH 的键在 EXEC 前被修改（MemoryRedis 版的 redis.exceptions.WatchError）"""
+
+
+def _watch_errors() -> tuple:
+    try:
+        from redis.exceptions import WatchError as RedisWatchError
+    except ImportError:
+        return (WatchError,)
+    return (WatchError, RedisWatchError)
+
+
+class MemoryPipeline:
+    """MemoryRedis 的 WATCH / MULTI / EXEC：MULTI 之前的命令立即执行，之后的命令排队到 execute"""
+
+    def __init__(self, redis: "MemoryRedis"):
+        self.redis = redis
+        self.watched: Dict[str, int] = {}
+        self.commands = None
+
+    def __enter__(self) -> "MemoryPipeline":
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def reset(self):
+        self.watched, self.commands = {}, None
+
+    def watch(self, *keys):
+        with self.redis._lock:
+            self.watched.update({key: self.redis._versions.get(key, 0) for key in keys})
+
+    def multi(self):
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        if self.commands is None:
+            return method
+
+        def queued(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+
+        return queued
+
+    def execute(self):
+        with self.redis._lock:
+            try:
+                if any(self.redis._versions.get(k, 0) != v for k, v in self.watched.items()):
+                    raise WatchError("被 WATCH 的键已被修改")
+                return [method(*args, **kwargs) for method, args, kwargs in self.commands or []]
+            finally:
+                self.reset()
+
+
+class MemoryRedis:
+    """RedisJobStore 用到的 Redis 命令子集（decode_responses=True 语义），线程安全"""
+
+    def __init__(self):
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._zsets: Dict[str, Dict[str, float]] = {}
+        # 每次写入递增，供 WATCH 判断键是否被改过
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def _touch(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def pipeline(self) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            h = self._hashes.setdefault(key, {})
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = sum(1 for k in items if k not in h)
+            h.update({k: str(v) for k, v in items.items()})
+            self._touch(key)
+            return added
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._hashes.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            h = self._hashes.setdefault(key, {})
+            h[field] = str(int(h.get(field, 0)) + amount)
+            self._touch(key)
+            return int(h[field])
+
+    def zadd(self, key, mapping, nx=False, xx=False, ch=False):
+        with self._lock:
+            z = self._zsets.setdefault(key, {})
+            count = 0
+            for member, score in mapping.items():
+                if (xx and member not in z) or (nx and member in z):
+                    continue
+                count += member not in z or (ch and z[member] != float(score))
+                z[member] = float(score)
+            self._touch(key)
+            return count
+
+    def zrem(self, key, *members):
+        with self._lock:
+            z = self._zsets.get(key, {})
+            self._touch(key)
+            return sum(1 for m in members if z.pop(m, None) is not None)
+
+    def zrange(self, key, start, end):
+        with self._lock:
+            members = [m for m, _ in sorted(self._zsets.get(key, {}).items(), key=lambda kv: (kv[1], kv[0]))]
+            return members[start:None if end == -1 else end + 1]
+
+    def zrangebyscore(self, key, min, max):
+        with self._lock:
+            lo = float("-inf") if min == "-inf" else float(min)
+            hi = float("inf") if max == "+inf" else float(max)
+            z = self._zsets.get(key, {})
+            return [m for m, s in sorted(z.items(), key=lambda kv: kv[1]) if lo <= s <= hi]
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._zsets.get(key, {}))
+
+
+class RedisJobStore(JobStore):
+    """Redis 实现：队列与租约各是一个有序集合，任务详情存 hash"""
+
+    def __init__(self, client, prefix: str = "ut"):
+        self.r = client
+        self.prefix = prefix
+        self.queue_key = f"{prefix}:queue"
+        self.lease_key = f"{prefix}:leases"
+        self._watch_errors = _watch_errors()
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def enqueue(self, payload, priority="normal", job_id=None):
+        job_id = job_id or str(uuid.uuid4())[:8]
+        now = _now()
+        self.r.hset(self._job_key(job_id), mapping={
+            "job_id": job_id,
+            "status": "queued",
+            "priority": PRIORITIES[priority],
+            "payload": json.dumps(payload, ensure_ascii=False),
+            "checkpoint": "{}",
+            "attempts": 0,
+            "worker": "",
+            "created_at": now,
+        })
+        # 分数 = 优先级档位 * 1e10 + 入队时间：同档先进先出
+        self.r.zadd(self.queue_key, {job_id: PRIORITIES[priority] * 1e10 + now})
+        return job_id
+
+    def claim(self, worker_id, lease):
+        # 先加租约（NX 保证只有一个 worker 加成功）再出队：进程在两步之间崩溃时任务仍带着租约，
+        # 过期后由 requeue_expired 收回，不会既不在队列里也不在租约里
+        for job_id in self.r.zrange(self.queue_key, 0, CLAIM_CANDIDATES - 1):
+            if not self.r.zadd(self.lease_key, {job_id: _now() + lease}, nx=True):
+                continue
+            if not self.r.zrem(self.queue_key, job_id):
+                # 已不在队列里（被认领或正被重新排队），撤回刚加的租约
+                self.r.zrem(self.lease_key, job_id)
+                continue
+            break
+        else:
+            return None
+        key = self._job_key(job_id)
+        attempts = self.r.hincrby(key, "attempts", 1)
+        self.r.hset(key, mapping={"status": "running", "worker": worker_id})
+        job = self.r.hgetall(key)
+        return {
+            "job_id": job_id,
+            "payload": json.loads(job["payload"]),
+            "checkpoint": json.loads(job.get("checkpoint") or "{}"),
+            "attempts": attempts,
+        }
+
+    def _owned_write(self, job_id, worker_id, write) -> Optional[list]:
+        """WATCH 任务 hash 后确认归属，再在 MULTI 中执行 write(pipe, job)；
+        检查与写入之间任务被重新排队或被他人认领时 EXEC 失败，重新检查。不再归属时返回 None"""
+        key = self._job_key(job_id)
+        while True:
+            with self.r.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    job = pipe.hgetall(key)
+                    if job.get("worker") != worker_id or job.get("status") != "running":
+                        return None
+                    pipe.multi()
+                    write(pipe, job)
+                    return pipe.execute()
+                except self._watch_errors:
+                    continue
+
+    def heartbeat(self, job_id, worker_id, lease):
+        results = self._owned_write(
+            job_id, worker_id, lambda pipe, job: pipe.zadd(self.lease_key, {job_id: _now() + lease}, xx=True, ch=True)
+        )
+        # 租约已被 requeue_expired 移除（尚未改写状态）时 zadd 不生效，同样视为失去租约
+        return bool(results and results[0])
+
+    def checkpoint(self, job_id, worker_id, values):
+        def write(pipe, job):
+            merged = {**json.loads(job.get("checkpoint") or "{}"), **values}
+            pipe.hset(self._job_key(job_id), "checkpoint", json.dumps(merged, ensure_ascii=False))
+
+        return self._owned_write(job_id, worker_id, write) is not None
+
+    def complete(self, job_id, worker_id, result, failed=False):
+        def write(pipe, job):
+            pipe.zrem(self.lease_key, job_id)
+            pipe.hset(self._job_key(job_id), mapping={
+                "status": "failed" if failed else "done",
+                "result": json.dumps(result, ensure_ascii=False),
+            })
+
+        return self._owned_write(job_id, worker_id, write) is not None
+
+    def requeue_expired(self):
+        count = 0
+        for job_id in self.r.zrangebyscore(self.lease_key, "-inf", _now()):
+            # 只有成功移除租约的那个进程负责重新排队
+            if not self.r.zrem(self.lease_key, job_id):
+                continue
+            key = self._job_key(job_id)
+            job = self.r.hgetall(key)
+            if int(job.get("attempts", 0)) >= MAX_ATTEMPTS:
+                self.r.hset(key, mapping={
+                    "status": "failed",
+                    "worker": "",
+                    "result": json.dumps({"error": "租约多次过期"}, ensure_ascii=False),
+                })
+            else:
+                self.r.hset(key, mapping={"status": "queued", "worker": ""})
+                self.r.zadd(self.queue_key, {job_id: int(job["priority"]) * 1e10 + float(job["created_at"])})
+            count += 1
+        return count
+
+    def get(self, job_id):
+        job = self.r.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        for key in ("payload", "checkpoint", "result"):
+            job[key] = json.loads(job[key]) if job.get(key) else None
+        job["attempts"] = int(job["attempts"])
+        job["priority"] = int(job["priority"])
+        return job
+
+    def stats(self):
+        return {"queued": self.r.zcard(self.queue_key), "running": self.r.zcard(self.lease_key)}
+
+
+_memory_stores: Dict[str, RedisJobStore] = {}
+
+
+def open_store(url: str) -> JobStore:
+    """按 URL 打开任务存储：sqlite:///path、redis://...、memory://"""
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith("memory://"):
+        name = url[len("memory://"):]
+        if name not in _memory_stores:
+            _memory_stores[name] = RedisJobStore(MemoryRedis())
+        return _memory_stores[name]
+    if url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("redis库未安装，请运行: pip install redis")
+        return RedisJobStore(redis.Redis.from_url(url, decode_responses=True))
+    raise ValueError(f"不支持的任务存储: {url}（可用 sqlite:///、redis://、memory://）")
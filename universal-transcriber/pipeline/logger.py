@@ -1,30 +1,207 @@
 """
 日志工具模块
+调用方只把记录放进队列，后台线程写控制台、JSONL 与按任务拆分的日志文件
 """
 
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+from pipeline import metrics
+
+_TAGS = {
+    "info": "[INFO]",
+    "success": "[OK]",
+    "warning": "[WARN]",
+    "error": "[ERROR]",
+}
+_LEVELS = {
+    "info": logging.INFO,
+    "success": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "step": logging.INFO,
+    "plain": logging.INFO,
+}
+
+
+def _console_line(record: logging.LogRecord) -> str:
+    if record.kind == "plain":
+        return record.getMessage()
+    prefix = f"[{record.task_id}] " if record.task_id else ""
+    if record.kind == "step":
+        return f"{prefix}Step {record.step}: {record.getMessage()}"
+    return f"{prefix}{_TAGS[record.kind]} {record.getMessage()}"
+
+
+class _ConsoleHandler(logging.Handler):
+    """保持原有的人类可读格式；每次写入时取当前 sys.stdout（stderr=True 时取 sys.stderr）"""
+
+    def __init__(self, stderr: bool = False):
+        super().__init__()
+        self.stderr = stderr
+
+    def emit(self, record):
+        try:
+            stream = sys.stderr if self.stderr else sys.stdout
+            stream.write(_console_line(record) + "\n")
+            stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.kind,
+            "task_id": record.task_id or None,
+            "stage": record.stage,
+            "msg": record.getMessage(),
+        }
+        if record.kind == "step":
+            event["step"] = record.step
+        return json.dumps(event, ensure_ascii=False)
+
+
+class _TaskFileHandler(logging.Handler):
+    """按 task_id 写 <dir>/<task_id>.log，最多同时保持 max_open 个文件句柄"""
+
+    def __init__(self, directory: str, max_open: int = 32):
+        super().__init__()
+        self.directory = Path(directory)
+        self.max_open = max_open
+        self._files = {}
+
+    def emit(self, record):
+        if not record.task_id:
+            return
+        try:
+            fh = self._files.pop(record.task_id, None)
+            if fh is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                fh = open(self.directory / f"{record.task_id}.log", "a", encoding="utf-8")
+                if len(self._files) >= self.max_open:
+                    oldest = next(iter(self._files))
+                    self._files.pop(oldest).close()
+            self._files[record.task_id] = fh
+            fh.write(_console_line(record) + "\n")
+            fh.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for fh in self._files.values():
+            fh.close()
+        self._files.clear()
+        super().close()
+
+
+class _Backend:
+    """QueueHandler + QueueListener：记录在调用线程入队，格式化与 IO 在后台线程完成"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.logger = logging.getLogger("universal_transcriber")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(logging.handlers.QueueHandler(self.queue))
+        self.handlers = [_ConsoleHandler()]
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.listener is None:
+                self.listener = logging.handlers.QueueListener(
+                    self.queue, *self.handlers, respect_handler_level=False
+                )
+                self.listener.start()
+
+    def flush(self):
+        """等待队列中的记录全部写出"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+        self.start()
+
+    def configure(self, console: bool = True, json_path: Optional[str] = None, task_log_dir: Optional[str] = None,
+                  console_stderr: bool = False):
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+            for handler in self.handlers:
+                if not isinstance(handler, _ConsoleHandler):
+                    handler.close()
+            handlers = [_ConsoleHandler(console_stderr)] if console else []
+            if json_path:
+                Path(json_path).parent.mkdir(parents=True, exist_ok=True)
+                json_handler = logging.FileHandler(json_path, encoding="utf-8")
+                json_handler.setFormatter(_JsonFormatter())
+                handlers.append(json_handler)
+            if task_log_dir:
+                handlers.append(_TaskFileHandler(task_log_dir))
+            self.handlers = handlers
+
+
+_backend = _Backend()
+atexit.register(lambda: _backend.listener and _backend.listener.stop())
+
+
+def _log(kind: str, msg: str, task_id: str = "", step: str = None):
+    if _backend.listener is None:
+        _backend.start()
+    stage = None
+    span = metrics.current_span()
+    if span is not None:
+        stage = span.stage
+        task_id = task_id or span.task_id
+    _backend.logger.log(
+        _LEVELS[kind], msg, extra={"kind": kind, "task_id": task_id, "stage": stage, "step": step}
+    )
+
 
 class Logger:
+    @staticmethod
+    def configure(console: bool = True, json_path: Optional[str] = None, task_log_dir: Optional[str] = None,
+                  console_stderr: bool = False):
+        """设置日志输出：控制台、JSONL 文件、按任务拆分的日志目录；console_stderr 把控制台日志改写到 stderr"""
+        _backend.configure(console=console, json_path=json_path, task_log_dir=task_log_dir,
+                           console_stderr=console_stderr)
+
+    @staticmethod
+    def flush():
+        _backend.flush()
+
     @staticmethod
     def info(msg: str, task_id: str = ""):
-        prefix = f"[{task_id}] " if task_id else ""
-        print(f"{prefix}[INFO] {msg}")
+        _log("info", msg, task_id)
 
     @staticmethod
     def success(msg: str, task_id: str = ""):
-        prefix = f"[{task_id}] " if task_id else ""
-        print(f"{prefix}[OK] {msg}")
+        _log("success", msg, task_id)
 
     @staticmethod
     def error(msg: str, task_id: str = ""):
-        prefix = f"[{task_id}] " if task_id else ""
-        print(f"{prefix}[ERROR] {msg}")
+        _log("error", msg, task_id)
 
     @staticmethod
     def warning(msg: str, task_id: str = ""):
-        prefix = f"[{task_id}] " if task_id else ""
-        print(f"{prefix}[WARN] {msg}")
+        _log("warning", msg, task_id)
 
     @staticmethod
     def step(step_num: int, total: int, msg: str, task_id: str = ""):
-        prefix = f"[{task_id}] " if task_id else ""
-        print(f"{prefix}Step {step_num}/{total}: {msg}")
+        _log("step", msg, task_id, step=f"{step_num}/{total}")
+
+    @staticmethod
+    def plain(msg: str, task_id: str = ""):
+        """不带前缀的输出（预览、完成提示），与其他日志保持同一顺序"""
+        _log("plain", msg, task_id)
@@ -0,0 +1,253 @@
+"""
+性能埋点模块
+阶段 span（耗时、字节、重试、子进程CPU、峰值内存），JSONL 事件、运行汇总与 Prometheus 文本导出
+"""
+
+import contextvars
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _child_cpu() -> Optional[float]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Span:
+    """一个阶段的计量区间"""
+
+    def __init__(self, recorder: "Recorder", stage: str, task_id: str = "", **attrs):
+        self.recorder = recorder
+        self.stage = stage
+        self.task_id = task_id
+        self.attrs = attrs
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.status = "ok"
+        self.error = None
+        self._token = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._started_at = time.time()
+        self._cpu = _child_cpu()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.status = "error"
+            self.error = str(exc)[:200]
+        cpu_end = _child_cpu()
+        event = {
+            "event": "span",
+            "ts": self._started_at,
+            "task_id": self.task_id,
+            "stage": self.stage,
+            "status": self.status,
+            "wall_s": round(time.perf_counter() - self._start, 4),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "retries": self.retries,
+            "child_cpu_s": round(cpu_end - self._cpu, 4) if cpu_end is not None else None,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+        if self.error:
+            event["error"] = self.error
+        event.update(self.attrs)
+        self.recorder.emit(event)
+        return False
+
+
+class Recorder:
+    """收集 span 事件：写 JSONL、生成汇总与 Prometheus 文本"""
+
+    def __init__(self, events_path: Optional[str] = None):
+        self.events_path = Path(events_path) if events_path else None
+        self._stages: Dict[str, Dict] = {}
+        self._queues: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str, task_id: str = "", **attrs) -> Span:
+        return Span(self, stage, task_id, **attrs)
+
+    def emit(self, event: Dict):
+        """写入 JSONL 并累加阶段汇总（常驻服务中不保留事件列表）"""
+        with self._lock:
+            if event.get("event") == "span":
+                self._accumulate(event)
+            if self.events_path:
+                self.events_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.events_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def _accumulate(self, e: Dict):
+        s = self._stages.setdefault(
+            e["stage"],
+            {"count": 0, "errors": 0, "wall_s": 0.0, "max_wall_s": 0.0,
+             "bytes_in": 0, "bytes_out": 0, "retries": 0, "child_cpu_s": 0.0},
+        )
+        s["count"] += 1
+        s["errors"] += e["status"] != "ok"
+        s["wall_s"] += e["wall_s"]
+        s["max_wall_s"] = max(s["max_wall_s"], e["wall_s"])
+        s["bytes_in"] += e["bytes_in"]
+        s["bytes_out"] += e["bytes_out"]
+        s["retries"] += e["retries"]
+        s["child_cpu_s"] += e["child_cpu_s"] or 0.0
+
+    def record_queue(self, name: str, depth: int, capacity: int, blocked_s: float = 0.0, waited_s: float = 0.0):
+        """流水线队列采样：入队后的深度、生产者被反压阻塞的时间、消费者空等的时间"""
+        with self._lock:
+            q = self._queues.setdefault(
+                name,
+                {"capacity": capacity, "depth": 0, "max_depth": 0, "samples": 0, "depth_sum": 0,
+                 "blocked_s": 0.0, "waited_s": 0.0},
+            )
+            q["depth"] = depth
+            q["max_depth"] = max(q["max_depth"], depth)
+            q["samples"] += 1
+            q["depth_sum"] += depth
+            q["blocked_s"] += blocked_s
+            q["waited_s"] += waited_s
+
+    def queues(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(values) for name, values in self._queues.items()}
+
+    def summary(self) -> Dict[str, Dict]:
+        """按阶段聚合：次数、总耗时、最大耗时、字节、重试、错误数"""
+        with self._lock:
+            return {stage: dict(values) for stage, values in self._stages.items()}
+
+    def format_summary(self) -> str:
+        stages = self.summary()
+        if not stages:
+            return ""
+        total = sum(s["wall_s"] for s in stages.values()) or 1.0
+        lines = ["阶段耗时汇总:"]
+        for name, s in stages.items():
+            lines.append(
+                f"  {name:<12} {s['wall_s']:8.2f}s ({s['wall_s'] / total:5.1%})"
+                f"  in {s['bytes_in'] / 1048576:7.2f}MB  out {s['bytes_out'] / 1048576:7.2f}MB"
+                f"  重试 {s['retries']}  子进程CPU {s['child_cpu_s']:.2f}s"
+            )
+        queues = self.queues()
+        if queues:
+            lines.append("队列（上游阻塞久 = 下游是瓶颈，下游空等久 = 上游是瓶颈）:")
+            for name, q in queues.items():
+                mean = q["depth_sum"] / q["samples"] if q["samples"] else 0.0
+                lines.append(
+                    f"  {name:<12} 平均深度 {mean:4.1f}/{q['capacity']}  最大 {q['max_depth']}"
+                    f"  上游阻塞 {q['blocked_s']:7.2f}s  下游空等 {q['waited_s']:7.2f}s"
+                )
+        peak = _peak_rss_mb()
+        if peak is not None:
+            lines.append(f"  峰值内存 {peak:.1f} MB")
+        return "\n".join(lines)
+
+    def prometheus_text(self) -> str:
+        """Prometheus 文本格式导出"""
+        stages = self.summary()
+        metrics = [
+            ("transcriber_stage_runs_total", "counter", "Stage executions.", "count"),
+            ("transcriber_stage_errors_total", "counter", "Stage executions that raised.", "errors"),
+            ("transcriber_stage_seconds_total", "counter", "Wall time spent in stage.", "wall_s"),
+            ("transcriber_stage_max_seconds", "gauge", "Slowest single stage execution.", "max_wall_s"),
+            ("transcriber_stage_bytes_in_total", "counter", "Bytes read by stage.", "bytes_in"),
+            ("transcriber_stage_bytes_out_total", "counter", "Bytes written by stage.", "bytes_out"),
+            ("transcriber_stage_retries_total", "counter", "Retries inside stage.", "retries"),
+            ("transcriber_stage_child_cpu_seconds_total", "counter", "Subprocess CPU time.", "child_cpu_s"),
+        ]
+        out = []
+        for metric, kind, help_text, key in metrics:
+            out.append(f"# HELP {metric} {help_text}")
+            out.append(f"# TYPE {metric} {kind}")
+            for stage, s in stages.items():
+                out.append(f'{metric}{{stage="{stage}"}} {s[key]}')
+        queues = self.queues()
+        if queues:
+            for metric, kind, help_text, key in (
+                ("transcriber_queue_depth", "gauge", "Items waiting in a pipeline queue.", "depth"),
+                ("transcriber_queue_max_depth", "gauge", "Deepest observed pipeline queue.", "max_depth"),
+                ("transcriber_queue_blocked_seconds_total", "counter", "Producer time blocked on a full queue.",
+                 "blocked_s"),
+                ("transcriber_queue_waited_seconds_total", "counter", "Consumer time waiting on an empty queue.",
+                 "waited_s"),
+            ):
+                out.append(f"# HELP {metric} {help_text}")
+                out.append(f"# TYPE {metric} {kind}")
+                for name, q in queues.items():
+                    out.append(f'{metric}{{queue="{name}"}} {q[key]}')
+        peak = _peak_rss_mb()
+        if peak is not None:
+            out.append("# HELP transcriber_peak_rss_megabytes Peak resident set size.")
+            out.append("# TYPE transcriber_peak_rss_megabytes gauge")
+            out.append(f"transcriber_peak_rss_megabytes {peak}")
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(self.prometheus_text(), encoding="utf-8")
+
+
+_recorder = Recorder()
+
+
+def recorder() -> Recorder:
+    return _recorder
+
+
+def configure(events_path: Optional[str] = None) -> Recorder:
+    """设置进程级记录器的 JSONL 输出路径"""
+    _recorder.events_path = Path(events_path) if events_path else None
+    return _recorder
+
+
+def span(stage: str, task_id: str = "", **attrs) -> Span:
+    return _recorder.span(stage, task_id, **attrs)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def record_queue(name: str, depth: int, capacity: int, blocked_s: float = 0.0, waited_s: float = 0.0):
+    _recorder.record_queue(name, depth, capacity, blocked_s, waited_s)
+
+
+def add_retry(n: int = 1):
+    """在当前 span 上记一次重试（无 span 时忽略）"""
+    s = _current_span.get()
+    if s is not None:
+        s.retries += n
+
+
+def add_bytes(bytes_in: int = 0, bytes_out: int = 0):
+    s = _current_span.get()
+    if s is not None:
+        s.bytes_in += bytes_in
+        s.bytes_out += bytes_out
@@ -0,0 +1,152 @@
+"""
+近重复转录检测模块
+同一视频被转发、重新上传到不同平台后，转录文本几乎相同。对文本取字符 shingle 做 MinHash 签名，
+按 LSH 分带写入 SQLite 桶表；查询只取与签名同桶的候选再精算相似度，耗时与库大小基本无关。
+签名与桶表和转录库共用 output/transcripts.db。
+去掉标点空白后不足 MIN_CHARS 字的短文本（「谢谢观看」、纯音乐的零星识别）既不查询也不入库：
+shingle 太少时签名几乎只由同几个片段决定，互不相干的短视频也会被判为近重复
+"""
+
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from pipeline.logger import Logger
+
+SHINGLE = 5
+MIN_CHARS = 80
+NUM_PERM = 128
+# 16 带 × 8 行：Jaccard 约 0.7 以上才有较大概率同桶
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = 4294967291  # 小于 2^32 的最大素数，保证 a*x+b 不溢出 uint64
+_BLOCK = 4096
+_NOISE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash (
+    task_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS minhash_bands (
+    band INTEGER NOT NULL,
+    bucket BLOB NOT NULL,
+    task_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS minhash_bands_lookup ON minhash_bands (band, bucket);
+"""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("numpy库未安装，请运行: pip install numpy")
+    return numpy
+
+
+def normalize(text: str) -> str:
+    """去掉空白与标点并转小写：断句、标点差异不影响判重"""
+    return _NOISE.sub("", text).lower()
+
+
+def comparable(text: str) -> bool:
+    """文本是否够长，值得参与近重复判定"""
+    return len(normalize(text)) >= MIN_CHARS
+
+
+class MinHasher:
+    """字符 shingle 的 MinHash 签名（NumPy 分块向量化计算）"""
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle: int = SHINGLE, seed: int = 1):
+        np = _numpy()
+        rng = np.random.RandomState(seed)
+        self.np = np
+        self.shingle = shingle
+        self.a = rng.randint(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str):
+        np = self.np
+        text = normalize(text)
+        k = self.shingle
+        shingles = {zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(max(1, len(text) - k + 1))}
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        signature = np.full(len(self.a), _PRIME, dtype=np.uint64)
+        for start in range(0, len(hashes), _BLOCK):
+            block = hashes[start:start + _BLOCK, None]
+            np.minimum(signature, ((block * self.a + self.b) % _PRIME).min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+
+class DuplicateIndex:
+    """MinHash + LSH 近重复索引"""
+
+    def __init__(self, path: str, threshold: float = 0.8):
+        self.path = str(path)
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def signature(self, text: str):
+        return self.hasher.signature(text)
+
+    @staticmethod
+    def _bands(signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def add(self, task_id: str, signature):
+        with self._write_lock, self._conn() as conn:
+            conn.execute("DELETE FROM minhash_bands WHERE task_id = ?", (task_id,))
+            conn.execute("INSERT OR REPLACE INTO minhash (task_id, signature) VALUES (?, ?)",
+                         (task_id, signature.tobytes()))
+            conn.executemany("INSERT INTO minhash_bands (band, bucket, task_id) VALUES (?, ?, ?)",
+                             [(band, bucket, task_id) for band, bucket in self._bands(signature)])
+
+    def query(self, signature, exclude: str = "") -> Optional[Dict]:
+        """同桶候选中估计 Jaccard 最高且不低于阈值的一条：{"task_id", "similarity"}"""
+        np = self.hasher.np
+        conn = self._conn()
+        candidates = set()
+        for band, bucket in self._bands(signature):
+            candidates.update(row[0] for row in conn.execute(
+                "SELECT task_id FROM minhash_bands WHERE band = ? AND bucket = ?", (band, bucket)
+            ))
+        candidates.discard(exclude)
+        best = None
+        for task_id in candidates:
+            row = conn.execute("SELECT signature FROM minhash WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None:
+                continue
+            similarity = float(np.mean(np.frombuffer(row[0], dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"task_id": task_id, "similarity": round(similarity, 3)}
+        return best
+
+    def backfill(self, store) -> int:
+        """为转录库中尚无签名的原始转录（非重复项）补算签名，返回补算数量；过短的文本跳过"""
+        known = {row[0] for row in self._conn().execute("SELECT task_id FROM minhash")}
+        added = 0
+        for task_id, transcript in store.originals():
+            if task_id in known or not comparable(transcript):
+                continue
+            self.add(task_id, self.signature(transcript))
+            added += 1
+        if added:
+            Logger.info(f"近重复索引已补算 {added} 条签名")
+        return added
@@ -0,0 +1,157 @@
+"""
+笔记渲染模块
+预编译模板 + 内容哈希的共享样式表，未变化的笔记不重写。
+笔记标识由链接与转录内容导出，重新发布时沿用已发布页面的日期与总结，同一笔记的渲染结果逐字节一致
+"""
+
+import datetime
+import hashlib
+import html
+import re
+from pathlib import Path
+from string import Template
+from typing import Dict, Optional
+
+NOTE_CSS = """body {
+    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+    max-width: 800px;
+    margin: 0 auto;
+    padding: 2rem;
+    color: #333;
+    line-height: 1.7;
+}
+h1 {
+    font-size: 1.8rem;
+    border-bottom: 2px solid #eee;
+    padding-bottom: 0.5rem;
+}
+.meta {
+    color: #888;
+    font-size: 0.9rem;
+    margin-bottom: 1.5rem;
+}
+.meta a {
+    color: #888;
+}
+.summary {
+    background: #f8f9fa;
+    border-left: 4px solid #4a90e2;
+    padding: 1rem 1.5rem;
+    margin: 1.5rem 0;
+    border-radius: 0 8px 8px 0;
+}
+.summary-title {
+    font-weight: bold;
+    color: #4a90e2;
+    margin-bottom: 0.5rem;
+}
+.content {
+    white-space: pre-wrap;
+    background: #fafafa;
+    padding: 1.5rem;
+    border-radius: 8px;
+    font-size: 0.95rem;
+}
+.back-link {
+    margin-top: 2rem;
+}
+.back-link a {
+    color: #4a90e2;
+    text-decoration: none;
+}
+"""
+
+CSS_HASH = hashlib.sha256(NOTE_CSS.encode("utf-8")).hexdigest()[:10]
+CSS_NAME = f"notes.{CSS_HASH}.css"
+
+NOTE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+    <link rel="stylesheet" href="../assets/$css">
+</head>
+<body>
+    <h1>$title</h1>
+    <div class="meta">
+        <p><strong>原始链接：</strong><a href="$url" target="_blank" rel="noopener">$url_text</a></p>
+        <p><strong>日期：</strong>$date</p>
+    </div>
+    <div class="summary">
+        <div class="summary-title">AI 总结</div>
+        <div>$summary</div>
+    </div>
+    <div class="content">$content</div>
+    <div class="back-link"><a href="../index.html">← 返回首页</a></div>
+</body>
+</html>""")
+
+
+_DATE = re.compile(r"<p><strong>日期：</strong>([^<]*)</p>")
+_SUMMARY = re.compile(r'<div class="summary-title">AI 总结</div>\s*<div>(.*?)</div>', re.S)
+
+
+def note_id(url: str, content: str) -> str:
+    """由链接与转录内容导出的笔记标识：同一转录再次发布落在同一页面"""
+    return hashlib.sha256(f"{url}\n{content}".encode("utf-8")).hexdigest()[:8]
+
+
+def read_note(repo_dir: str, transcript_id: str) -> Optional[Dict[str, str]]:
+    """已发布笔记的 {date, summary}；不存在或无法解析时返回 None"""
+    path = Path(repo_dir) / "notes" / f"{transcript_id}.html"
+    try:
+        page = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    date, summary = _DATE.search(page), _SUMMARY.search(page)
+    if not date or not summary:
+        return None
+    return {"date": html.unescape(date.group(1)), "summary": html.unescape(summary.group(1))}
+
+
+def _safe_href(url: str) -> str:
+    """只允许 http(s) 链接进入 href，其余一律置空"""
+    url = (url or "").strip()
+    if not url.lower().startswith(("http://", "https://")):
+        return "#"
+    return html.escape(url, quote=True)
+
+
+def render_note(title: str, url: str, summary: str, content: str, date_str: Optional[str] = None) -> str:
+    return NOTE_TEMPLATE.substitute(
+        title=html.escape(title or ""),
+        css=CSS_NAME,
+        url=_safe_href(url),
+        url_text=html.escape(url or ""),
+        date=html.escape(date_str or datetime.datetime.now().strftime("%Y-%m-%d")),
+        summary=html.escape(summary or ""),
+        content=html.escape(content or ""),
+    )
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """内容哈希一致时跳过写入，返回是否实际写盘"""
+    data = text.encode("utf-8")
+    if path.exists() and path.stat().st_size == len(data):
+        if _digest(path.read_bytes()) == _digest(data):
+            return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def write_note(repo_dir: str, transcript_id: str, title: str, url: str, summary: str,
+               content: str, date_str: Optional[str] = None) -> bool:
+    """渲染并写入 notes/<id>.html，返回是否有文件被改写；未指定日期时沿用已发布页面的日期"""
+    if date_str is None:
+        existing = read_note(repo_dir, transcript_id)
+        date_str = existing["date"] if existing else None
+    css_changed = write_if_changed(Path(repo_dir) / "assets" / CSS_NAME, NOTE_CSS)
+    page = render_note(title, url, summary, content, date_str)
+    note_changed = write_if_changed(Path(repo_dir) / "notes" / f"{transcript_id}.html", page)
+    return note_changed or css_changed
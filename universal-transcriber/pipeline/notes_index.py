@@ -0,0 +1,288 @@
+"""
+笔记索引模块
+GitHub Pages 笔记站点的结构化索引：NDJSON 数据文件 + 分页首页 + 搜索分片
+"""
+
+import datetime
+import html
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List
+
+LIST_MARKER = '<ul class="note-list" id="noteList">'
+SEARCH_SCRIPT = "assets/notes-search.js"
+
+_ITEM_RE = re.compile(
+    r'<li class="note-item" data-date="(?P<date>[^"]*)">\s*'
+    r'<a href="notes/(?P<id>[^"]+)\.html">(?P<title>.*?)</a>\s*'
+    r'<div class="note-date">.*?</div>\s*'
+    r'<div class="note-summary">(?P<summary>.*?)</div>\s*</li>',
+    re.S,
+)
+
+_SEARCH_JS = """(function () {
+  var list = document.getElementById("noteList");
+  if (!list) return;
+  var input = document.getElementById("noteSearch");
+  if (!input) {
+    input = document.createElement("input");
+    input.id = "noteSearch";
+    input.type = "search";
+    input.placeholder = "搜索笔记…";
+    list.parentNode.insertBefore(input, list);
+  }
+  var original = list.innerHTML, loaded = null;
+  function load() {
+    if (loaded) return loaded;
+    loaded = fetch("data/search/manifest.json").then(function (r) { return r.json(); })
+      .then(function (m) {
+        return Promise.all(m.shards.map(function (s) {
+          return fetch(s).then(function (r) { return r.json(); });
+        }));
+      }).then(function (parts) { return [].concat.apply([], parts); });
+    return loaded;
+  }
+  function esc(s) {
+    return String(s).replace(/[&<>"']/g, function (c) {
+      return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+    });
+  }
+  input.addEventListener("input", function () {
+    var q = input.value.trim().toLowerCase();
+    if (!q) { list.innerHTML = original; return; }
+    load().then(function (rows) {
+      var hits = rows.filter(function (r) {
+        return (r[1] + " " + r[2]).toLowerCase().indexOf(q) !== -1;
+      }).reverse().slice(0, 200);
+      list.innerHTML = hits.map(function (r) {
+        return '<li class="note-item" data-date="' + esc(r[3]) + '"><a href="notes/' + esc(r[0]) +
+          '.html">' + esc(r[1]) + '</a><div class="note-date">' + esc(r[3]) +
+          '</div><div class="note-summary">' + esc(r[2]) + "</div></li>";
+      }).join("");
+    });
+  });
+})();
+"""
+
+
+def _item_html(note: Dict, prefix: str = "") -> str:
+    date = html.escape(note.get("date", ""))
+    return (
+        f'        <li class="note-item" data-date="{date}">\n'
+        f'            <a href="{prefix}notes/{html.escape(note["id"])}.html">{html.escape(note["title"])}</a>\n'
+        f'            <div class="note-date">{date}</div>\n'
+        f'            <div class="note-summary">{html.escape(note.get("summary", ""))}</div>\n'
+        f"        </li>\n"
+    )
+
+
+class NotesIndex:
+    """笔记索引：新增笔记只追加数据文件并重绘首页，已满的归档页与搜索分片不再改写"""
+
+    def __init__(self, repo_dir: str, page_size: int = 50, shard_size: int = 1000):
+        self.repo_dir = Path(repo_dir)
+        self.page_size = page_size
+        self.shard_size = shard_size
+        self.data_dir = self.repo_dir / "data"
+        self.data_path = self.data_dir / "notes.ndjson"
+        self.meta_path = self.data_dir / "notes-meta.json"
+        self.search_dir = self.data_dir / "search"
+        self.archive_dir = self.repo_dir / "archive"
+        self.index_path = self.repo_dir / "index.html"
+
+    # ---------- 数据文件 ----------
+
+    def count(self) -> int:
+        if not self.meta_path.exists():
+            self._bootstrap()
+        return json.loads(self.meta_path.read_text(encoding="utf-8")).get("count", 0)
+
+    def _bootstrap(self):
+        """首次运行：从旧版 index.html 的 <li> 列表迁移出数据文件"""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        notes = []
+        if not self.data_path.exists() and self.index_path.exists():
+            content = self.index_path.read_text(encoding="utf-8")
+            for m in _ITEM_RE.finditer(content):
+                notes.append(
+                    {
+                        "id": m.group("id"),
+                        "title": html.unescape(m.group("title").strip()),
+                        "summary": html.unescape(m.group("summary").strip()),
+                        "date": m.group("date"),
+                    }
+                )
+            with open(self.data_path, "w", encoding="utf-8") as f:
+                for note in notes:
+                    f.write(json.dumps(note, ensure_ascii=False) + "\n")
+            count = len(notes)
+        elif self.data_path.exists():
+            with open(self.data_path, "rb") as f:
+                count = sum(1 for line in f if line.strip())
+        else:
+            self.data_path.touch()
+            count = 0
+        self._write_meta(count)
+        if notes:
+            self._render_blocks(0, count)
+
+    def _write_meta(self, count: int):
+        tmp = self.meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"count": count}), encoding="utf-8")
+        os.replace(tmp, self.meta_path)
+
+    def tail(self, n: int) -> List[Dict]:
+        """从文件末尾倒读最后 n 条记录，不读全文件"""
+        if n <= 0 or not self.data_path.exists():
+            return []
+        lines: List[bytes] = []
+        with open(self.data_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            buf = b""
+            while pos > 0 and len(lines) <= n:
+                step = min(65536, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                parts = buf.split(b"\n")
+                buf = parts[0]
+                lines = [p for p in parts[1:] if p.strip()] + lines
+            if pos == 0 and buf.strip():
+                lines = [buf] + lines
+        return [json.loads(line) for line in lines[-n:]]
+
+    def append(self, entries: List[Dict]) -> List[Path]:
+        """追加笔记并增量重绘，返回被改写的文件"""
+        if not entries:
+            return []
+        old = self.count()
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        with open(self.data_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                entry.setdefault("date", today)
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        new = old + len(entries)
+        self._write_meta(new)
+        return self._render_blocks(old, new)
+
+    # ---------- 渲染 ----------
+
+    def _render_blocks(self, old: int, new: int) -> List[Path]:
+        """重绘受 [old, new) 影响的归档页、搜索分片与首页"""
+        page_start = (old // self.page_size) * self.page_size
+        shard_start = (old // self.shard_size) * self.shard_size
+        window = new - min(page_start, shard_start, max(0, new - self.page_size))
+        records = self.tail(window)
+        base = new - len(records)
+        changed = []
+
+        for start in range(page_start, new, self.page_size):
+            chunk = records[start - base : start - base + self.page_size]
+            if len(chunk) == self.page_size:
+                changed.append(self._write_archive_page(start // self.page_size + 1, chunk))
+
+        for start in range(shard_start, new, self.shard_size):
+            chunk = records[start - base : start - base + self.shard_size]
+            changed.append(self._write_shard(start // self.shard_size + 1, chunk))
+        changed.append(self._write_manifest(new))
+
+        latest = records[-self.page_size :]
+        changed.append(self._write_index(latest, new))
+        self._ensure_search_script()
+        return changed
+
+    def _pager(self, total: int, prefix: str) -> str:
+        pages = total // self.page_size
+        if not pages:
+            return ""
+        links = " ".join(
+            f'<a href="{prefix}archive/{k}.html">{k}</a>' for k in range(pages, 0, -1)
+        )
+        return f'<nav class="note-pager">归档: {links}</nav>'
+
+    def _write_archive_page(self, number: int, notes: List[Dict]) -> Path:
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        items = "".join(_item_html(n, "../") for n in reversed(notes))
+        page = f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>笔记归档 {number}</title>
+</head>
+<body>
+    <h1>笔记归档 {number}</h1>
+    <ul class="note-list">
+{items}    </ul>
+    <div class="back-link"><a href="../index.html">← 返回首页</a></div>
+</body>
+</html>"""
+        path = self.archive_dir / f"{number}.html"
+        path.write_text(page, encoding="utf-8")
+        return path
+
+    def _write_shard(self, number: int, notes: List[Dict]) -> Path:
+        self.search_dir.mkdir(parents=True, exist_ok=True)
+        rows = [[n["id"], n["title"], n.get("summary", "")[:200], n.get("date", "")] for n in notes]
+        path = self.search_dir / f"{number:04d}.json"
+        path.write_text(json.dumps(rows, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        return path
+
+    def _write_manifest(self, total: int) -> Path:
+        shards = (total + self.shard_size - 1) // self.shard_size
+        manifest = {
+            "count": total,
+            "shards": [f"data/search/{k:04d}.json" for k in range(1, shards + 1)],
+        }
+        path = self.search_dir / "manifest.json"
+        self.search_dir.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(manifest, separators=(",", ":")), encoding="utf-8")
+        return path
+
+    def _write_index(self, latest: List[Dict], total: int) -> Path:
+        """只替换首页 noteList 的内容，保留站点原有布局"""
+        if self.index_path.exists():
+            content = self.index_path.read_text(encoding="utf-8")
+        else:
+            content = f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>笔记</title>
+</head>
+<body>
+    {LIST_MARKER}
+    </ul>
+</body>
+</html>"""
+        start = content.find(LIST_MARKER)
+        if start == -1:
+            return self.index_path
+        body_start = start + len(LIST_MARKER)
+        end = content.find("</ul>", body_start)
+        if end == -1:
+            return self.index_path
+        items = "".join(_item_html(n) for n in reversed(latest))
+        after = content[end + len("</ul>") :]
+        after = re.sub(r'\s*<nav class="note-pager">.*?</nav>', "", after, count=1, flags=re.S)
+        content = content[:body_start] + "\n" + items + "    </ul>" + self._pager_block(total) + after
+        script_tag = f'<script src="{SEARCH_SCRIPT}" defer></script>'
+        if script_tag not in content and "</body>" in content:
+            content = content.replace("</body>", f"    {script_tag}\n</body>", 1)
+        self.index_path.write_text(content, encoding="utf-8")
+        return self.index_path
+
+    def _pager_block(self, total: int) -> str:
+        pager = self._pager(total, "")
+        return f"\n    {pager}" if pager else ""
+
+    def _ensure_search_script(self):
+        path = self.repo_dir / SEARCH_SCRIPT
+        if path.exists() and path.read_text(encoding="utf-8") == _SEARCH_JS:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(_SEARCH_JS, encoding="utf-8")
@@ -6,65 +6,24 @@ Notion数据库同步
 from datetime import datetime
 from typing import Tuple
 
+from pipeline import classifier
 from pipeline.logger import Logger
+from pipeline.notion_writer import paragraph_blocks, shared_writer
 
 
 class NotionSync:
     """Notion数据库同步器"""
 
     def __init__(self, token: str, database_id: str):
-        try:
-            from notion_client import Client
-        except ImportError:
-            raise RuntimeError(
-                "notion_client库未安装，请运行: pip install notion-client"
-            )
-
-        self.client = Client(auth=token)
+        self.writer = shared_writer(token)
         self.database_id = database_id
 
     def classify_content(self, content: str) -> Tuple[str, str]:
-        """根据内容自动分类"""
-        content_lower = content.lower()
-
-        # 领域分类
-        if any(
-            kw in content_lower
-            for kw in [
-                "ai",
-                "人工智能",
-                "算法",
-                "技术",
-                "人类",
-                "思维",
-                "情感",
-                "哲学",
-                "意识",
-            ]
-        ):
-            field = "人类大逻辑"
-        elif any(
-            kw in content_lower
-            for kw in ["商业", "资本", "经济", "投资", "融资", "创业"]
-        ):
-            field = "商业大逻辑"
-        elif any(
-            kw in content_lower
-            for kw in ["国际", "关系", "政治", "地缘", "外交", "战争"]
-        ):
-            field = "国际关系..."
-        else:
-            field = "人类大逻辑"
-
-        # 分类
-        if any(
-            kw in content_lower for kw in ["理论", "逻辑", "模型", "框架", "分析工具"]
-        ):
-            category = "逻辑&理论&模型库"
-        else:
-            category = "话题资料库"
-
-        return field, category
+        """根据内容自动分类（规则见 send_rules.yaml 的 classification 段）"""
+        labels = classifier.shared().classify(content)
+        field, category = labels["field"], labels["category"]
+        Logger.info(f"自动分类: 领域 {field.explain()}，分类 {category.explain()}")
+        return field.label, category.label
 
     def create_page(
         self,
@@ -83,19 +42,8 @@ class NotionSync:
             field = field or auto_field
             category = category or auto_category
 
-        # 分割长文本
-        content_blocks = []
-        max_chunk = 1900
-
-        for i in range(0, len(content), max_chunk):
-            chunk = content[i : i + max_chunk]
-            content_blocks.append(
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {"rich_text": [{"text": {"content": chunk}}]},
-                }
-            )
+        # 按句子边界分割长文本
+        content_blocks = paragraph_blocks(content)
 
         # 使用用户数据库的实际字段名
         properties = {
@@ -107,10 +55,8 @@ class NotionSync:
         if category:
             properties["分类"] = {"select": {"name": category}}
 
-        page = self.client.pages.create(
-            parent={"database_id": self.database_id},
-            properties=properties,
-            children=content_blocks,
+        page = self.writer.create_page(
+            {"database_id": self.database_id}, properties, content_blocks
         )
 
         Logger.success(f"Notion页面创建成功: {page.get('url', 'N/A')}")
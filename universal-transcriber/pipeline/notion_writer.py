@@ -0,0 +1,226 @@
+"""
+Notion写入模块
+分批追加块、遵守限流的Notion REST客户端
+"""
+
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pipeline import governor
+from pipeline.governor import Governor, parse_retry_after
+from pipeline.logger import Logger
+
+NOTION_API = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+MAX_BLOCKS_PER_REQUEST = 100
+MAX_TEXT_CHARS = 1900
+RETRYABLE_STATUS = {409, 429, 500, 502, 503, 504}
+# 非幂等请求（建页、追加块）只在服务端明确没有执行时重试：5xx、超时都可能已经写入
+UNSENT_RETRYABLE_STATUS = {409, 429}
+CREATE_ATTEMPTS = 3
+
+_SENTENCE_END = re.compile(r"[。！？!?；;…]+[”’\"')）]*|\.(?=\s)|\n+")
+_SOFT_BREAK = re.compile(r"[，,、：:]|\s")
+
+
+def split_sentences(text: str, max_chars: int = MAX_TEXT_CHARS) -> List[str]:
+    """按句子边界切分长文本，每段不超过 max_chars"""
+    chunks = []
+    text = text or ""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = start + max_chars
+        if end >= length:
+            chunks.append(text[start:])
+            break
+        window = text[start:end]
+        cut = 0
+        for match in _SENTENCE_END.finditer(window):
+            cut = match.end()
+        if cut < max_chars // 2:
+            for match in _SOFT_BREAK.finditer(window):
+                if match.end() > cut:
+                    cut = match.end()
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(text[start : start + cut])
+        start += cut
+    return [c for c in chunks if c.strip()]
+
+
+def paragraph_blocks(text: str) -> List[Dict]:
+    return [
+        {
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {"rich_text": [{"text": {"content": chunk}}]},
+        }
+        for chunk in split_sentences(text)
+    ]
+
+
+class NotionAPIError(RuntimeError):
+    """Notion接口返回的错误"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"Notion API {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class NotionWriter:
+    """Notion写入器 - 一个会话复用于整批任务"""
+
+    def __init__(
+        self,
+        token: str,
+        max_retries: Optional[int] = None,
+        timeout: int = 60,
+        limiter: Optional[Governor] = None,
+        base_url: Optional[str] = None,
+    ):
+        import requests
+
+        self.base_url = base_url or NOTION_API
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {token}",
+                "Notion-Version": NOTION_VERSION,
+                "Content-Type": "application/json",
+            }
+        )
+        self.limiter = limiter or governor.get("notion")
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, method: str, path: str, payload: Dict, idempotent: bool = True) -> Dict:
+        """单次请求交给 notion 调度器：限速、并发、Retry-After 退避与熔断；
+        idempotent=False 时只重试确定未被执行的失败（429/409、连接未建立）"""
+
+        def attempt():
+            response = self.session.request(
+                method, f"{self.base_url}{path}", json=payload, timeout=self.timeout
+            )
+            if response.status_code < 400:
+                return response.json()
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise NotionAPIError(
+                response.status_code,
+                message[:200],
+                parse_retry_after(response.headers.get("Retry-After")),
+            )
+
+        retryable = _retryable if idempotent else _retryable_unsent
+        return self.limiter.call(attempt, retryable=retryable, max_retries=self.max_retries)
+
+    def append_blocks(self, block_id: str, blocks: List[Dict]) -> int:
+        """按每批100块追加子块，返回请求次数"""
+        requests_made = 0
+        for i in range(0, len(blocks), MAX_BLOCKS_PER_REQUEST):
+            batch = blocks[i : i + MAX_BLOCKS_PER_REQUEST]
+            self._request("PATCH", f"/blocks/{block_id}/children", {"children": batch}, idempotent=False)
+            requests_made += 1
+        return requests_made
+
+    def _find_page(self, parent: Dict, properties: Dict, since: float) -> Optional[Dict]:
+        """在数据库中找 since 之后创建、标题相同的页面（建页请求结果不明时确认是否已写入）"""
+        database_id = parent.get("database_id")
+        title = next(((name, prop["title"]) for name, prop in properties.items() if "title" in prop), None)
+        if not database_id or title is None:
+            return None
+        name, rich_text = title
+        text = "".join(part.get("text", {}).get("content", "") for part in rich_text)
+        # created_time 精确到分钟，往前多留一分钟
+        after = datetime.fromtimestamp(since, timezone.utc) - timedelta(minutes=1)
+        result = self._request("POST", f"/databases/{database_id}/query", {
+            "filter": {"and": [
+                {"property": name, "title": {"equals": text}},
+                {"timestamp": "created_time", "created_time": {"on_or_after": after.isoformat()}},
+            ]},
+            "page_size": 1,
+        })
+        pages = result.get("results") or []
+        return pages[0] if pages else None
+
+    def _create(self, parent: Dict, properties: Dict, children: List[Dict]) -> Dict:
+        """建页：超时、5xx 等结果不明的失败先查询页面是否已建成，确认没有才重新提交"""
+        payload = {"parent": parent, "properties": properties, "children": children}
+        for attempt in range(1, CREATE_ATTEMPTS + 1):
+            since = time.time()
+            try:
+                return self._request("POST", "/pages", payload, idempotent=False)
+            except Exception as e:
+                # 429/409 等确定未执行的失败已在 _request 内重试过
+                if attempt >= CREATE_ATTEMPTS or not _retryable(e) or _retryable_unsent(e):
+                    raise
+                error = e
+            page = self._find_page(parent, properties, since)
+            if page is not None:
+                Logger.info("Notion 建页请求结果不明，但页面已创建，不再重复提交")
+                return page
+            if "database_id" not in parent:
+                # 无法确认是否已写入，宁可失败也不重复建页
+                raise error
+            self.limiter.backoff(attempt, reason=f"建页结果不明，确认未写入后重试: {str(error)[:120]}")
+
+    def create_page(self, parent: Dict, properties: Dict, blocks: List[Dict]) -> Dict:
+        """首批块随页面一起创建，剩余块分批追加"""
+        first, rest = blocks[:MAX_BLOCKS_PER_REQUEST], blocks[MAX_BLOCKS_PER_REQUEST:]
+        page = self._create(parent, properties, first)
+        if rest:
+            batches = self.append_blocks(page["id"], rest)
+            Logger.info(f"Notion 追加剩余 {len(rest)} 个块（{batches} 批）")
+        return page
+
+
+_shared_writers: Dict[str, NotionWriter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_writer(token: str) -> NotionWriter:
+    """进程内按 token 复用同一个写入器（会话与限流器共享）"""
+    with _shared_lock:
+        writer = _shared_writers.get(token)
+        if writer is None:
+            writer = NotionWriter(token)
+            _shared_writers[token] = writer
+        return writer
+
+
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, NotionAPIError):
+        return exc.status in RETRYABLE_STATUS
+    return isinstance(exc, OSError)
+
+
+def _retryable_unsent(exc: BaseException) -> bool:
+    """服务端确定没有执行：限流 / 冲突，或连接都没建立（读超时、连接中断不算）"""
+    if isinstance(exc, NotionAPIError):
+        return exc.status in UNSENT_RETRYABLE_STATUS
+    import requests
+
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and not isinstance(exc, requests.exceptions.Timeout):
+        from urllib3.exceptions import NewConnectionError
+
+        reason = exc.args[0] if exc.args else None
+        return isinstance(getattr(reason, "reason", reason), NewConnectionError)
+    return False
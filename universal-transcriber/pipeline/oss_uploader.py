@@ -1,14 +1,45 @@
 """
 OSS上传模块
-阿里云OSS文件上传
+阿里云OSS文件上传：小文件单次 PUT；超过阈值走分片断点续传（多线程上传分片，
+本地记录检查点，网络抖动只重传失败的分片）。
+对象按音频内容的 sha256 命名，上传前先 HEAD，相同音频（重试、重跑）在离 TTL 回收还早时直接复用，
+临近回收则重新上传以刷新修改时间；签名 URL 缓存到临近过期（不超过对象本身的回收时间）；对象不再逐个删除，由存储桶生命周期规则（或本地清扫）按 TTL 回收。
+进程内按凭据共享同一个客户端（连接池跨任务复用），上传/删除另有基于线程池的异步接口，
+删除请求攒批后用 batch_delete_objects 一次提交
 """
 
-import uuid
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
+from pipeline import governor, metrics
+from pipeline.governor import is_transient
 from pipeline.logger import Logger
 
+MB = 1024 * 1024
+OBJECT_PREFIX = "douyin-transcribe/"
+LIFECYCLE_RULE_ID = "universal-transcriber-ttl"
+SWEEP_INTERVAL = 3600
+DELETE_BATCH_WINDOW = 0.5
+# 复用已有对象时，除签名 URL 有效期外还须留出的余量（秒），覆盖转录排队与处理时间
+EXPIRY_MARGIN = 3600
+
+
+def _retryable(exc: BaseException) -> bool:
+    # oss2 的网络错误（RequestError）status 为 -2
+    return is_transient(exc) or getattr(exc, "status", None) == -2
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(MB), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class OSSUploader:
     """阿里云OSS上传器"""
@@ -19,39 +50,295 @@ class OSSUploader:
         access_key_secret: str,
         bucket_name: str,
         endpoint: str,
+        multipart_threshold: int = 20 * MB,
+        part_size: int = 5 * MB,
+        num_threads: int = 4,
+        checkpoint_dir: Optional[str] = None,
+        ttl_days: int = 1,
+        pool_size: int = 16,
+        bucket=None,
     ):
-        try:
-            import oss2
-        except ImportError:
-            raise RuntimeError("oss2库未安装，请运行: pip install oss2")
+        """bucket 可传入已建好的 oss2.Bucket（或兼容对象），否则按凭据创建带连接池的客户端"""
+        if bucket is None:
+            try:
+                import oss2
+            except ImportError:
+                raise RuntimeError("oss2库未安装，请运行: pip install oss2")
 
-        self.auth = oss2.Auth(access_key_id, access_key_secret)
-        self.bucket = oss2.Bucket(self.auth, endpoint, bucket_name)
+            auth = oss2.Auth(access_key_id, access_key_secret)
+            bucket = oss2.Bucket(auth, endpoint, bucket_name, session=oss2.Session(pool_size=pool_size))
+        self.bucket = bucket
         self.bucket_name = bucket_name
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.num_threads = num_threads
+        self.checkpoint_dir = checkpoint_dir
+        self.ttl_days = ttl_days
+        self._urls: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max(2, num_threads), thread_name_prefix="oss")
+        self._pending_deletes: List[Tuple[str, Future]] = []
+        self._flush_scheduled = False
+        # 同一内容对象可能被并发任务共用：引用计数归零才删除；删除与新引用互斥
+        self._refs: Dict[str, int] = {}
+        self._delete_gate = threading.Lock()
+        self.lifecycle_ok = self.ensure_lifecycle() if ttl_days > 0 else True
+
+    def ensure_lifecycle(self) -> bool:
+        """在存储桶上设置前缀过期规则（保留桶上已有的其他规则）；无权限时返回 False，改用本地清扫"""
+        try:
+            from oss2.exceptions import NoSuchLifecycle
+            from oss2.models import BucketLifecycle, LifecycleExpiration, LifecycleRule
+
+            try:
+                rules = list(self.bucket.get_bucket_lifecycle().rules)
+            except NoSuchLifecycle:
+                rules = []
+            ours = [r for r in rules if r.id == LIFECYCLE_RULE_ID]
+            if ours and ours[0].expiration and ours[0].expiration.days == self.ttl_days:
+                return True
+            rules = [r for r in rules if r.id != LIFECYCLE_RULE_ID]
+            rules.append(LifecycleRule(
+                LIFECYCLE_RULE_ID,
+                OBJECT_PREFIX,
+                status=LifecycleRule.ENABLED,
+                expiration=LifecycleExpiration(days=self.ttl_days),
+            ))
+            self.bucket.put_bucket_lifecycle(BucketLifecycle(rules))
+            Logger.info(f"OSS生命周期规则已设置: {OBJECT_PREFIX} {self.ttl_days} 天后过期")
+            return True
+        except Exception as e:
+            Logger.warning(f"OSS生命周期规则设置失败，改为定期清扫过期对象: {e}")
+            return False
+
+    def sweep(self, ttl_seconds: Optional[float] = None) -> int:
+        """删除前缀下超过 TTL 的对象，返回删除数量"""
+        ttl_seconds = ttl_seconds if ttl_seconds is not None else self.ttl_days * 86400
+        cutoff = time.time() - ttl_seconds
+        expired = []
+        marker = ""
+        while True:
+            result = self.bucket.list_objects(prefix=OBJECT_PREFIX, marker=marker, max_keys=1000)
+            expired.extend(o.key for o in result.object_list if o.last_modified < cutoff)
+            if not result.is_truncated:
+                break
+            marker = result.next_marker
+        # 与新引用互斥：仍被进行中的任务引用的对象不删（复用时会重新上传刷新修改时间）
+        with self._delete_gate:
+            with self._lock:
+                expired = [key for key in expired if not self._refs.get(key)]
+            for i in range(0, len(expired), 1000):
+                self.delete_objects(expired[i:i + 1000])
+        with self._lock:
+            for key in expired:
+                self._urls.pop(key, None)
+        if expired:
+            Logger.info(f"已清扫 {len(expired)} 个过期OSS对象")
+        return len(expired)
+
+    def _maybe_sweep(self):
+        if self.lifecycle_ok or self.ttl_days <= 0:
+            return
+        with self._lock:
+            if time.time() - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = time.time()
+
+        def run():
+            try:
+                self.sweep()
+            except Exception as e:
+                Logger.warning(f"OSS过期对象清扫失败: {e}")
+
+        self._executor.submit(run)
+
+    def _put_resumable(self, object_name: str, local_file: Path):
+        """分片断点续传；失败重试时从检查点继续，只补传未完成的分片"""
+        import oss2
+
+        store = oss2.ResumableStore(root=self.checkpoint_dir or str(local_file.parent), dir="oss_checkpoints")
+
+        def attempt():
+            oss2.resumable_upload(
+                self.bucket,
+                object_name,
+                str(local_file),
+                store=store,
+                multipart_threshold=self.multipart_threshold,
+                part_size=self.part_size,
+                num_threads=self.num_threads,
+            )
+
+        governor.get("oss").call(attempt, retryable=_retryable)
+
+    def sign_url(self, object_name: str, expiration: int = 3600, object_ttl: Optional[float] = None) -> str:
+        """签名 URL 缓存复用，剩余有效期不足 1/4 时重新签名；
+        object_ttl 为对象距回收的秒数，缓存的有效期不超过它"""
+        now = time.time()
+        with self._lock:
+            cached = self._urls.get(object_name)
+            if cached and cached[1] - now > expiration / 4:
+                return cached[0]
+        url = self.bucket.sign_url("GET", object_name, expiration)
+        with self._lock:
+            self._urls[object_name] = (url, now + min(expiration, object_ttl if object_ttl is not None else expiration))
+        return url
+
+    def _object_ttl(self, object_name: str) -> Optional[float]:
+        """对象距 TTL 回收的剩余秒数；对象不存在返回 None，不按 TTL 回收时为无穷大"""
+        try:
+            with governor.get("oss").slot():
+                head = self.bucket.head_object(object_name)
+        except Exception as e:
+            # oss2 的 NoSuchKey / NotFound status 为 404
+            if getattr(e, "status", None) == 404:
+                return None
+            raise
+        if self.ttl_days <= 0:
+            return float("inf")
+        return head.last_modified + self.ttl_days * 86400 - time.time()
+
+    def _ensure_object(self, object_name: str, local_file: Path, expiration: int, span) -> float:
+        """确保对象存在且离回收足够远（必要时上传），返回对象距回收的秒数"""
+        object_ttl = self._object_ttl(object_name)
+        if object_ttl is not None and object_ttl < expiration + EXPIRY_MARGIN:
+            # 生命周期规则可能在转录读取前回收它：重新上传刷新修改时间，旧的签名 URL 作废
+            Logger.info(f"OSS已有相同音频但临近过期，重新上传: {object_name}")
+            object_ttl = None
+            with self._lock:
+                self._urls.pop(object_name, None)
+        if object_ttl is not None:
+            Logger.info(f"OSS已有相同音频，跳过上传: {object_name}")
+            if span is not None:
+                span.attrs["reused"] = True
+        else:
+            size = local_file.stat().st_size
+            multipart = size >= self.multipart_threshold
+            Logger.info(f"上传 {local_file.name}（{size / MB:.1f}MB{'，分片' if multipart else ''}）到 OSS...")
+
+            start = time.perf_counter()
+            if multipart:
+                self._put_resumable(object_name, local_file)
+            else:
+                with governor.get("oss").slot():
+                    self.bucket.put_object_from_file(object_name, str(local_file))
+            elapsed = time.perf_counter() - start
+            metrics.add_bytes(bytes_out=size)
+            throughput = size / MB / elapsed if elapsed > 0 else 0.0
+            if span is not None:
+                span.attrs["upload_mb_s"] = round(throughput, 2)
+                span.attrs["multipart"] = multipart
+            Logger.success(f"上传完成，{throughput:.1f}MB/s")
+            object_ttl = self.ttl_days * 86400 if self.ttl_days > 0 else float("inf")
+        return object_ttl
 
     def upload_audio(
         self, local_file_path: str, expiration: int = 3600
     ) -> Tuple[str, str]:
-        """上传音频文件到OSS"""
+        """上传音频文件到OSS（内容相同的对象已存在时跳过上传）"""
         local_file = Path(local_file_path)
         if not local_file.exists():
             raise FileNotFoundError(f"文件不存在: {local_file_path}")
 
-        object_name = f"douyin-transcribe/{uuid.uuid4()}.wav"
+        object_name = f"{OBJECT_PREFIX}{file_sha256(local_file)}{local_file.suffix.lower() or '.wav'}"
+        span = metrics.current_span()
+        with self._delete_gate, self._lock:
+            self._refs[object_name] = self._refs.get(object_name, 0) + 1
 
-        Logger.info(f"上传 {local_file.name} 到 OSS...")
+        try:
+            object_ttl = self._ensure_object(object_name, local_file, expiration, span)
+            url = self.sign_url(object_name, expiration, object_ttl)
+        except BaseException:
+            # HEAD、上传或签名失败（阶段重试会重新加引用）：撤回本次引用，否则该对象再也不会被清扫或删除
+            self.release(object_name)
+            raise
+        self._maybe_sweep()
+        Logger.info(f"生成临时URL（有效期{expiration // 3600}小时）")
 
-        self.bucket.put_object_from_file(object_name, str(local_file))
-        url = self.bucket.sign_url("GET", object_name, expiration)
+        return url, object_name
 
-        Logger.success(f"上传完成，生成临时URL（有效期{expiration // 3600}小时）")
+    def upload_async(self, local_file_path: str, expiration: int = 3600) -> "Future[Tuple[str, str]]":
+        """在 OSS 线程池中上传，返回 Future[(url, object_name)]"""
+        return self._executor.submit(self.upload_audio, local_file_path, expiration)
 
-        return url, object_name
+    def release(self, object_name: str):
+        """任务不再需要该对象；ttl_days 为 0 时最后一个引用释放后异步删除"""
+        with self._lock:
+            count = self._refs.get(object_name, 0) - 1
+            if count > 0:
+                self._refs[object_name] = count
+                return
+            self._refs.pop(object_name, None)
+        if self.ttl_days <= 0:
+            self.delete_async(object_name)
+
+    def delete_async(self, object_name: str) -> "Future[bool]":
+        """登记删除，DELETE_BATCH_WINDOW 内的请求合并为一次 batch_delete_objects"""
+        future: "Future[bool]" = Future()
+        with self._lock:
+            self._pending_deletes.append((object_name, future))
+            self._urls.pop(object_name, None)
+            schedule = not self._flush_scheduled
+            self._flush_scheduled = True
+        if schedule:
+            self._executor.submit(self._flush_deletes)
+        return future
+
+    def _flush_deletes(self):
+        time.sleep(DELETE_BATCH_WINDOW)
+        with self._delete_gate:
+            with self._lock:
+                pending, self._pending_deletes = self._pending_deletes, []
+                self._flush_scheduled = False
+                # 等待期间又被新任务引用的对象不删
+                skipped = [(k, f) for k, f in pending if self._refs.get(k)]
+                pending = [(k, f) for k, f in pending if not self._refs.get(k)]
+            for _, future in skipped:
+                future.set_result(False)
+            self._delete_pending(pending)
+
+    def _delete_pending(self, pending: List[Tuple[str, Future]]):
+        for i in range(0, len(pending), 1000):
+            batch = pending[i:i + 1000]
+            try:
+                self.delete_objects([key for key, _ in batch])
+            except Exception as e:
+                Logger.warning(f"批量删除OSS对象失败: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for _, future in batch:
+                future.set_result(True)
+
+    def delete_objects(self, object_names: List[str]):
+        """批量删除（单次最多 1000 个）"""
+        with governor.get("oss").slot():
+            self.bucket.batch_delete_objects(object_names)
+        Logger.info(f"已删除 {len(object_names)} 个OSS对象")
 
     def delete_object(self, object_name: str):
         """删除OSS对象"""
         try:
             self.bucket.delete_object(object_name)
+            with self._lock:
+                self._urls.pop(object_name, None)
             Logger.info(f"已删除OSS对象: {object_name}")
         except:
             pass
+
+
+_shared_uploaders: Dict[tuple, OSSUploader] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_uploader(access_key_id: str, access_key_secret: str, bucket_name: str, endpoint: str,
+                    **options) -> OSSUploader:
+    """进程内按凭据与存储桶复用同一个上传器（连接池、签名缓存、删除批次共享）"""
+    key = (access_key_id, bucket_name, endpoint)
+    with _shared_lock:
+        uploader = _shared_uploaders.get(key)
+        if uploader is None:
+            uploader = OSSUploader(access_key_id, access_key_secret, bucket_name, endpoint, **options)
+            _shared_uploaders[key] = uploader
+        return uploader
@@ -0,0 +1,185 @@
+"""
+流式转录模块
+长视频整段提交 Paraformer 要等整条音频转完才有第一个字。流式模式把音频切成「短首段 + 定长后续段」，
+各段并行上传、提交，按顺序一段转完就推送一段：首段只有一分钟，几秒到几十秒内就能看到开头的文字。
+推送目标：stdout（JSONL，一行一个事件）、webhook（后台线程按序 POST）、进程内回调（服务模式）。
+
+事件格式：
+    {"event": "partial", "task_id", "chunk", "chunks", "begin_time", "end_time", "text", "segments", "elapsed_s"}
+    {"event": "done", "task_id", "status", "result", "elapsed_s"}
+时间均为整段音频时间轴上的毫秒
+"""
+
+import json
+import queue
+import shutil
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pipeline import metrics
+from pipeline.logger import Logger
+
+# 切点上限：超过 12 小时的部分并入最后一段
+MAX_PLAN_SECONDS = 12 * 3600
+# 同时在 DashScope 排队的分段数（提交仍受 governor 的 dashscope 限流约束）
+MAX_INFLIGHT = 8
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_ATTEMPTS = 3
+
+_stdout_lock = threading.Lock()
+_CLOSE = object()
+
+
+def chunk_plan(first_seconds: float, chunk_seconds: float) -> List[float]:
+    """切点列表（秒）：首段 first_seconds，其后每 chunk_seconds 一段"""
+    first_seconds = max(1.0, first_seconds)
+    chunk_seconds = max(1.0, chunk_seconds)
+    times, t = [], first_seconds
+    while t < MAX_PLAN_SECONDS:
+        times.append(t)
+        t += chunk_seconds
+    return times
+
+
+class PartialPublisher:
+    """把转录事件推给 stdout / webhook / 回调；一个发布器可供多个任务共用"""
+
+    def __init__(self, stdout: bool = False, webhook: str = "", callback: Optional[Callable[[Dict], None]] = None):
+        self.stdout = stdout
+        self.webhook = webhook
+        self.callback = callback
+        self.started = time.monotonic()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        if webhook:
+            self._thread = threading.Thread(target=self._post_loop, name="partials-webhook", daemon=True)
+            self._thread.start()
+
+    def publish(self, event: Dict):
+        event = {**event, "elapsed_s": round(time.monotonic() - self.started, 3)}
+        if self.stdout:
+            line = json.dumps(event, ensure_ascii=False)
+            with _stdout_lock:
+                sys.stdout.write(line + "\n")
+                sys.stdout.flush()
+        if self.callback is not None:
+            try:
+                self.callback(event)
+            except Exception as e:
+                Logger.warning(f"流式回调出错: {e}", event.get("task_id", ""))
+        if self._thread is not None:
+            self._queue.put(event)
+
+    def partial(self, task_id: str, chunk: int, chunks: int, text: str, segments: List[Dict],
+                begin_time: int, end_time: Optional[int]):
+        self.publish({
+            "event": "partial",
+            "task_id": task_id,
+            "chunk": chunk,
+            "chunks": chunks,
+            "begin_time": begin_time,
+            "end_time": end_time,
+            "text": text,
+            "segments": segments,
+        })
+
+    def done(self, task_id: str, result: Dict):
+        self.publish({
+            "event": "done",
+            "task_id": task_id,
+            "status": result.get("task_status", "done"),
+            "result": result,
+        })
+
+    def _post(self, event: Dict):
+        body = json.dumps(event, ensure_ascii=False).encode("utf-8")
+        for attempt in range(WEBHOOK_ATTEMPTS):
+            request = urllib.request.Request(
+                self.webhook, data=body, headers={"Content-Type": "application/json"}, method="POST"
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT) as response:
+                    response.read()
+                return
+            except Exception as e:
+                if attempt == WEBHOOK_ATTEMPTS - 1:
+                    Logger.warning(f"webhook 推送失败（{event['event']}）: {e}", event.get("task_id", ""))
+                else:
+                    time.sleep(2 ** attempt)
+
+    def _post_loop(self):
+        # 单线程按序投递：接收方看到的分段顺序与转录顺序一致
+        while True:
+            event = self._queue.get()
+            if event is _CLOSE:
+                return
+            self._post(event)
+
+    def close(self, timeout: float = 30.0):
+        """等待 webhook 队列投递完（最多 timeout 秒）"""
+        if self._thread is not None:
+            self._queue.put(_CLOSE)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def transcribe_chunked(services, audio_path: str, task_id: str, publisher: PartialPublisher,
+                       chunk_dir: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """分段并行转录，按顺序逐段推送；返回与整段转录相同的 (全文, 分句)。
+    分段文件写到 chunk_dir（一般是任务临时目录下，计入工作区配额），未给出时放在音频旁边，结束后删除"""
+    started = time.monotonic()
+    config = services.config
+    extractor, uploader, transcriber = services.extractor(), services.uploader(), services.transcriber()
+    plan = chunk_plan(config.stream_first_chunk_seconds, config.stream_chunk_seconds)
+    chunk_dir = Path(chunk_dir) if chunk_dir else Path(audio_path).parent / f"chunks_{task_id}"
+    uploads = []
+    try:
+        paths = extractor.split(audio_path, plan, str(chunk_dir))
+        offsets = [0] + [int(t * 1000) for t in plan[:len(paths) - 1]]
+        Logger.info(f"分 {len(paths)} 段流式转录", task_id)
+        uploads = [uploader.upload_async(path) for path in paths]
+
+        def run_chunk(i: int):
+            oss_url, _ = uploads[i].result()
+            job = transcriber.submit(oss_url, task_id=task_id)
+            return transcriber.collect(job, task_id, offsets[i])
+
+        texts, segments = [], []
+        span = metrics.current_span()
+        with ThreadPoolExecutor(max_workers=min(len(paths), MAX_INFLIGHT), thread_name_prefix="chunk") as pool:
+            futures = [pool.submit(run_chunk, i) for i in range(len(paths))]
+            for i, future in enumerate(futures):
+                try:
+                    chunk_texts, chunk_segments = future.result()
+                except Exception:
+                    # 任一段失败即整体失败，尚未开始的分段不再提交
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                text = "\n".join(chunk_texts)
+                end_time = offsets[i + 1] if i + 1 < len(offsets) else (
+                    chunk_segments[-1]["end_time"] if chunk_segments else None
+                )
+                publisher.partial(task_id, i, len(paths), text, chunk_segments, offsets[i], end_time)
+                if i == 0 and span is not None:
+                    span.attrs["first_text_s"] = round(time.monotonic() - started, 3)
+                if text:
+                    texts.append(text)
+                segments.extend(chunk_segments)
+    finally:
+        wait(uploads)
+        for upload in uploads:
+            if not upload.exception():
+                uploader.release(upload.result()[1])
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    if not texts:
+        raise RuntimeError("转录结果为空")
+    full_text = "\n".join(texts)
+    Logger.success(f"转录完成，共 {len(full_text)} 字符", task_id)
+    return full_text, segments
@@ -3,19 +3,18 @@
 协调所有组件完成转录流程
 """
 
-import os
 import uuid
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict
 from datetime import datetime
 
+from pipeline import flow
 from pipeline.config import Config
+from pipeline.graph import StageFailed
 from pipeline.logger import Logger
-from pipeline.downloader import DouyinDownloader
-from pipeline.audio_extractor import AudioExtractor
-from pipeline.oss_uploader import OSSUploader
-from pipeline.transcriber import CloudTranscriber
 from pipeline.notion_sync import NotionSync
+from pipeline.registry import get_downloader
+from pipeline.services import Services
 
 
 class TranscriptionPipeline:
@@ -39,15 +38,11 @@ class TranscriptionPipeline:
 
         Logger.info("初始化组件...")
 
-        self.downloader = DouyinDownloader(str(self.download_dir))
-        self.audio_extractor = AudioExtractor(str(self.audio_dir), config.ffmpeg_path)
-        self.oss_uploader = OSSUploader(
-            config.oss_access_key_id,
-            config.oss_access_key_secret,
-            config.oss_bucket_name,
-            config.oss_endpoint,
-        )
-        self.transcriber = CloudTranscriber(config.dashscope_api_key)
+        self.services = Services(config, str(self.output_dir))
+        self.downloader = get_downloader("douyin")
+        self.audio_extractor = self.services.extractor()
+        self.oss_uploader = self.services.uploader()
+        self.transcriber = self.services.transcriber()
         self.notion = NotionSync(config.notion_token, config.notion_database_id)
 
         Logger.success("所有组件初始化完成")
@@ -56,73 +51,43 @@ class TranscriptionPipeline:
         """处理单个抖音视频"""
         task_id = str(uuid.uuid4())[:8]
 
-        print(f"\n{'=' * 70}")
-        print(f"[{task_id}] 开始处理: {url}")
-        print(f"{'=' * 70}\n")
-
-        video_path = None
-        audio_path = None
-        oss_object = None
-
+        Logger.plain(f"\n{'=' * 70}")
+        Logger.plain(f"[{task_id}] 开始处理: {url}")
+        Logger.plain(f"{'=' * 70}\n")
+
+        workspace = self.services.workspace()
+        ctx = {
+            "task_id": task_id,
+            "platform": "douyin",
+            "url": url,
+            "save_video": True,
+            "keep_source": True,
+            "keep_audio": False,
+            "services": self.services,
+            "downloader": self.downloader,
+            "scratch": workspace.task(task_id),
+            "download_dir": workspace.kept("downloads"),
+            "transcripts_dir": workspace.kept("transcripts"),
+            "transcript_header": (
+                f"URL: {url}\nTask ID: {task_id}\nTime: {datetime.now().isoformat()}\n"
+                + "=" * 70
+                + "\n\n"
+            ),
+            "notion": self.notion,
+            "notion_title": f"抖音_{task_id}",
+        }
+        graph = flow.NOTION_GRAPH if save_to_notion else flow.TRANSCRIBE_GRAPH
+        ctx["audio_dir"] = ctx["scratch"].path
         try:
-            Logger.step(1, 5, "下载视频", task_id)
-            video_path = self.downloader.download(url, f"video_{task_id}")
-
-            Logger.step(2, 5, "提取音频", task_id)
-            audio_path = self.audio_extractor.extract(video_path, f"audio_{task_id}")
-
-            Logger.step(3, 5, "上传到OSS", task_id)
-            oss_url, oss_object = self.oss_uploader.upload_audio(audio_path)
-
-            Logger.step(4, 5, "云端转录", task_id)
-            text = self.transcriber.transcribe(oss_url, task_id=task_id)
-
-            # 保存转录文本到本地文件
-            transcript_file = self.transcripts_dir / f"transcript_{task_id}.txt"
-            with open(transcript_file, "w", encoding="utf-8") as f:
-                f.write(f"URL: {url}\n")
-                f.write(f"Task ID: {task_id}\n")
-                f.write(f"Time: {datetime.now().isoformat()}\n")
-                f.write("=" * 70 + "\n\n")
-                f.write(text)
-            Logger.success(f"转录文本已保存: {transcript_file.name}")
-
-            if save_to_notion:
-                Logger.step(5, 5, "保存到Notion", task_id)
-                try:
-                    self.notion.create_page(f"抖音_{task_id}", url, text)
-                except Exception as e:
-                    Logger.warning(f"Notion同步失败: {e}")
-
-            self._cleanup(video_path, audio_path, oss_object)
-
-            print(f"\n{'=' * 70}")
-            Logger.success(f"处理完成! 任务ID: {task_id}", task_id)
-            print(f"{'=' * 70}\n")
-
-            return {"success": True, "task_id": task_id, "text": text, "url": url}
-
-        except Exception as e:
-            self._cleanup(video_path, audio_path, oss_object)
+            ctx = graph.run(ctx, task_id)
+        except StageFailed as e:
             Logger.error(f"处理失败: {e}", task_id)
             return {"success": False, "task_id": task_id, "error": str(e), "url": url}
+        finally:
+            ctx["scratch"].close()
 
-    def _cleanup(
-        self,
-        video_path: Optional[str],
-        audio_path: Optional[str],
-        oss_object: Optional[str],
-    ):
-        """清理临时文件 - 保留原视频"""
-        try:
-            if video_path and os.path.exists(video_path):
-                Logger.info(f"保留视频文件: {os.path.basename(video_path)}")
-
-            if audio_path and os.path.exists(audio_path):
-                os.remove(audio_path)
-                Logger.info("已删除临时音频文件")
+        Logger.plain(f"\n{'=' * 70}")
+        Logger.success(f"处理完成! 任务ID: {task_id}", task_id)
+        Logger.plain(f"{'=' * 70}\n")
 
-            if oss_object:
-                self.oss_uploader.delete_object(oss_object)
-        except Exception as e:
-            Logger.warning(f"清理文件失败: {e}")
+        return {"success": True, "task_id": task_id, "text": ctx["transcript"], "url": url}
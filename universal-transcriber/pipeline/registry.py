@@ -0,0 +1,115 @@
+"""
+插件注册模块
+下载器与分发器的清单、入口点发现与进程内缓存
+"""
+
+import importlib
+import threading
+from typing import Dict, List, Optional, Protocol, runtime_checkable
+
+DOWNLOADER_GROUP = "universal_transcriber.downloaders"
+SENDER_GROUP = "universal_transcriber.senders"
+
+# 内置插件清单：名称 -> 模块路径（BASE_DIR 已在 sys.path 中）
+DOWNLOADER_MANIFEST: Dict[str, str] = {
+    "douyin": "downloaders.douyin",
+    "bilibili": "downloaders.bilibili",
+    "youtube": "downloaders.youtube",
+    "xiaohongshu": "downloaders.xiaohongshu",
+}
+SENDER_MANIFEST: Dict[str, str] = {
+    "notion": "senders.notion",
+    "github": "senders.github",
+    "flomo": "senders.flomo",
+}
+
+
+@runtime_checkable
+class Downloader(Protocol):
+    """下载器协议；可选实现 probe_duration(url, cookies_path) 返回媒体时长（秒）"""
+
+    def download(self, url: str, output_dir: str, task_id: str, cookies_path: Optional[str] = None,
+                 audio_only: bool = True) -> str: ...
+
+    def get_title(self, url: str, cookies_path: Optional[str] = None) -> Optional[str]: ...
+
+
+@runtime_checkable
+class Sender(Protocol):
+    """分发器协议；send 返回 dict 且含 summary 时，摘要随转录一起入库"""
+
+    def send(self, transcript: str, title: str, url: str, config, options: Optional[dict] = None): ...
+
+
+class PluginRegistry:
+    """按名称加载插件，每个进程只导入一次"""
+
+    def __init__(self, kind: str, manifest: Dict[str, str], group: str):
+        self.kind = kind
+        self.manifest = dict(manifest)
+        self.group = group
+        self._cache: Dict[str, object] = {}
+        self._entry_points = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, plugin):
+        """注册插件对象或模块路径"""
+        with self._lock:
+            if isinstance(plugin, str):
+                self.manifest[name] = plugin
+                self._cache.pop(name, None)
+            else:
+                self._cache[name] = plugin
+
+    def _discover(self):
+        if self._entry_points is None:
+            try:
+                from importlib.metadata import entry_points
+
+                self._entry_points = {ep.name: ep for ep in entry_points().select(group=self.group)}
+            except Exception:
+                self._entry_points = {}
+        return self._entry_points
+
+    def names(self) -> List[str]:
+        return sorted(set(self.manifest) | set(self._cache) | set(self._discover()))
+
+    def get(self, name: str):
+        plugin = self._cache.get(name)
+        if plugin is not None:
+            return plugin
+        with self._lock:
+            plugin = self._cache.get(name)
+            if plugin is not None:
+                return plugin
+            if name in self.manifest:
+                plugin = importlib.import_module(self.manifest[name])
+            elif name in self._discover():
+                plugin = self._discover()[name].load()
+            else:
+                raise RuntimeError(f"未知的{self.kind}: {name}，可用: {self.names()}")
+            self._cache[name] = plugin
+            return plugin
+
+
+downloaders = PluginRegistry("下载器", DOWNLOADER_MANIFEST, DOWNLOADER_GROUP)
+senders = PluginRegistry("分发目标", SENDER_MANIFEST, SENDER_GROUP)
+
+
+def get_downloader(name: str) -> Downloader:
+    return downloaders.get(name)
+
+
+def get_sender(name: str) -> Sender:
+    return senders.get(name)
+
+
+def probe_duration(downloader: Downloader, url: str, cookies_path: Optional[str] = None) -> Optional[float]:
+    """探测媒体时长；插件未实现或探测失败时返回 None"""
+    probe = getattr(downloader, "probe_duration", None)
+    if not callable(probe):
+        return None
+    try:
+        return probe(url, cookies_path)
+    except Exception:
+        return None
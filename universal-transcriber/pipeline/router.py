@@ -0,0 +1,287 @@
+"""
+Notion 语义路由模块
+按内容而不是平台决定转录存进哪个 Notion 数据库：转录向量化后与各数据库的质心向量
+（NumPy 矩阵）比较余弦相似度，最高分超过阈值才采用，否则退回 send_rules.yaml 的平台规则。
+按内容路由成功（或命令行指定了目标）的归档把该条向量并入目标数据库的质心（增量均值），越用越准；
+退回平台规则的归档不学习，免得误路由自我强化。
+
+向量化默认用哈希 TF-IDF（汉字二元组 + 英文单词，哈希到固定维度，无需下载模型）；
+配置了本地模型（sentence-transformers）时改用语义向量。并发分发（批量流水线的交付工位、服务模式）
+的转录合并成批编码：编码进行中到达的转录攒成下一批，摊薄模型开销。
+质心等状态保存在 output/notion_routing.npz，学习后去抖 SAVE_DELAY 秒写盘，进程退出时补写
+"""
+
+import atexit
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pipeline.logger import Logger
+
+HASH_DIM = 1 << 16
+BATCH_SIZE = 32
+SAVE_DELAY = 30.0
+_CJK_RUN = re.compile(r"[㐀-鿿豈-﫿]+")
+_WORD = re.compile(r"[0-9a-z]{2,}")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("numpy库未安装，请运行: pip install numpy")
+    return numpy
+
+
+class HashedTfidfEmbedder:
+    """汉字二元组与英文单词哈希到 dim 维的对数词频向量；IDF 由 Router 在比较时施加"""
+
+    name = "hashed-tfidf"
+    uses_idf = True
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.np = _numpy()
+        self.dim = dim
+
+    def _features(self, text: str) -> List[int]:
+        text = text.lower()
+        tokens = _WORD.findall(text)
+        for run in _CJK_RUN.findall(text):
+            tokens.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+        return [zlib.crc32(token.encode("utf-8")) % self.dim for token in tokens]
+
+    def embed(self, texts: Sequence[str]):
+        np = self.np
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if features:
+                matrix[row] = np.log1p(np.bincount(features, minlength=self.dim))
+        return matrix
+
+
+class ModelEmbedder:
+    """本地 CPU 句向量模型（sentence-transformers），按批编码"""
+
+    uses_idf = False
+
+    def __init__(self, model: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError("sentence-transformers库未安装，请运行: pip install sentence-transformers")
+        self.np = _numpy()
+        self.name = f"model:{model}"
+        self.model = SentenceTransformer(model, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]):
+        # 长转录只取前 2000 字，句向量模型本身也会截断
+        return self.model.encode(
+            [t[:2000] for t in texts], batch_size=BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(self.np.float32)
+
+
+class Router:
+    """按质心相似度把转录路由到 notion_databases 中的别名"""
+
+    def __init__(self, embedder, state_path: str, threshold: float = 0.15,
+                 seeds: Optional[Dict[str, List[str]]] = None):
+        self.embedder = embedder
+        self.np = embedder.np
+        self.state_path = Path(state_path)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.aliases: List[str] = []
+        self.centroids = self.np.zeros((0, embedder.dim), dtype=self.np.float32)
+        self.counts = self.np.zeros(0, dtype=self.np.int64)
+        # 文档频率：每个哈希维度出现在多少条已归档内容里
+        self.df = self.np.zeros(embedder.dim, dtype=self.np.float32)
+        self.docs = 0
+        self._dirty = False
+        self._save_timer = None
+        self._pending: List[Tuple[str, Future]] = []
+        self._encoding = False
+        self._encode_cond = threading.Condition()
+        self._load()
+        missing = {alias: texts for alias, texts in (seeds or {}).items() if alias not in self.aliases and texts}
+        if missing:
+            for alias, texts in missing.items():
+                self.learn_many(self.embed(texts), [alias] * len(texts), save=False)
+            self._save()
+
+    def _load(self):
+        np = self.np
+        if not self.state_path.exists():
+            return
+        try:
+            with np.load(self.state_path, allow_pickle=False) as state:
+                if str(state["embedder"]) != self.embedder.name or state["centroids"].shape[1] != self.embedder.dim:
+                    Logger.warning("向量化方式已变更，Notion 路由质心重新积累")
+                    return
+                self.aliases = [str(a) for a in state["aliases"]]
+                self.centroids = state["centroids"].astype(np.float32)
+                self.counts = state["counts"].astype(np.int64)
+                self.df = state["df"].astype(np.float32)
+                self.docs = int(state["docs"])
+        except Exception as e:
+            Logger.warning(f"Notion 路由状态读取失败，重新积累: {e}")
+
+    def _save(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp.npz")
+        self.np.savez(
+            tmp,
+            embedder=self.embedder.name,
+            aliases=self.np.array(self.aliases, dtype=str),
+            centroids=self.centroids,
+            counts=self.counts,
+            df=self.df,
+            docs=self.docs,
+        )
+        os.replace(tmp, self.state_path)
+
+    def embed(self, texts: Sequence[str]):
+        """按 BATCH_SIZE 分批向量化"""
+        np = self.np
+        if not texts:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        batches = [self.embedder.embed(texts[i:i + BATCH_SIZE]) for i in range(0, len(texts), BATCH_SIZE)]
+        return np.concatenate(batches)
+
+    def embed_one(self, text: str):
+        """单条转录向量化，返回 (1, dim)；并发调用合并成一批，没有编码在进行时由调用方自己编码当前这一批"""
+        future: Future = Future()
+        with self._encode_cond:
+            self._pending.append((text, future))
+        while not future.done():
+            with self._encode_cond:
+                while self._encoding and not future.done():
+                    self._encode_cond.wait()
+                if future.done():
+                    break
+                self._encoding = True
+                batch, self._pending = self._pending[:BATCH_SIZE], self._pending[BATCH_SIZE:]
+            try:
+                vectors = self.embedder.embed([t for t, _ in batch])
+                for (_, waiter), vector in zip(batch, vectors):
+                    waiter.set_result(vector[None, :])
+            except Exception as e:
+                for _, waiter in batch:
+                    waiter.set_exception(e)
+            finally:
+                with self._encode_cond:
+                    self._encoding = False
+                    self._encode_cond.notify_all()
+        return future.result()
+
+    def _weighted(self, vectors):
+        np = self.np
+        if self.embedder.uses_idf:
+            vectors = vectors * (np.log((1 + self.docs) / (1 + self.df)) + 1.0)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def scores(self, vectors):
+        """(n, 数据库数) 余弦相似度矩阵"""
+        with self._lock:
+            if not self.aliases:
+                return self.np.zeros((len(vectors), 0), dtype=self.np.float32)
+            return self._weighted(vectors) @ self._weighted(self.centroids).T
+
+    def route_vectors(self, vectors) -> List[Tuple[Optional[str], float]]:
+        """[(别名或 None, 最高分)]；低于阈值时别名为 None"""
+        matrix = self.scores(vectors)
+        results = []
+        for row in matrix:
+            if not len(row):
+                results.append((None, 0.0))
+                continue
+            best = int(row.argmax())
+            score = float(row[best])
+            results.append((self.aliases[best] if score >= self.threshold else None, round(score, 3)))
+        return results
+
+    def route(self, text: str) -> Tuple[Optional[str], float]:
+        return self.route_vectors(self.embed([text]))[0]
+
+    def learn_many(self, vectors, aliases: Sequence[str], save: bool = True):
+        """把已归档内容并入对应质心：c ← c + (v − c) / (n + 1)（v 先归一化，长文不压过短文）"""
+        np = self.np
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+        with self._lock:
+            for vector, alias in zip(vectors, aliases):
+                if alias not in self.aliases:
+                    self.aliases.append(alias)
+                    self.centroids = np.vstack([self.centroids, np.zeros((1, self.embedder.dim), dtype=np.float32)])
+                    self.counts = np.append(self.counts, 0)
+                i = self.aliases.index(alias)
+                self.counts[i] += 1
+                self.centroids[i] += (vector - self.centroids[i]) / self.counts[i]
+                if self.embedder.uses_idf:
+                    self.df += vector > 0
+                    self.docs += 1
+            if save:
+                self._save_later()
+
+    def learn(self, text: str, alias: str):
+        self.learn_many(self.embed([text]), [alias])
+
+    def _save_later(self):
+        """标记有未保存的学习结果，SAVE_DELAY 秒后统一写盘；调用方需持有 self._lock"""
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self._save_on_timer)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_on_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            Logger.warning(f"Notion 路由状态保存失败: {e}")
+
+    def flush(self):
+        """立即写盘未保存的质心（去抖定时器到期、进程退出时调用）"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._save()
+            self._dirty = False
+
+
+_shared: Dict[tuple, Router] = {}
+_shared_lock = threading.Lock()
+
+
+def shared(settings: Dict, base_dir: Path) -> Router:
+    """按 send_rules.yaml 的 notion_routing 段复用同一个路由器"""
+    state_path = base_dir / settings.get("state", "output/notion_routing.npz")
+    model = settings.get("model") or ""
+    key = (str(state_path), model)
+    with _shared_lock:
+        router = _shared.get(key)
+        if router is None:
+            embedder = ModelEmbedder(model) if model else HashedTfidfEmbedder()
+            router = Router(embedder, str(state_path), settings.get("threshold", 0.15), settings.get("seeds"))
+            _shared[key] = router
+        router.threshold = settings.get("threshold", 0.15)
+        return router
+
+
+@atexit.register
+def _flush_shared():
+    with _shared_lock:
+        routers = list(_shared.values())
+    for router in routers:
+        try:
+            router.flush()
+        except Exception as e:
+            Logger.warning(f"Notion 路由状态保存失败: {e}")
@@ -0,0 +1,123 @@
+"""
+任务调度模块
+按优先级、截止时间与预估耗时（媒体时长）挑选下一个排队任务：
+临近截止的任务按最早截止优先，其余按优先级分档、档内最短作业优先（随等待时间老化），
+排队中的任务可以取消，过了截止时间仍未开始的任务直接过期
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+
+# 探测不到时长时按平台给一个保守估计（秒）
+DEFAULT_DURATION = {"douyin": 60, "xiaohongshu": 120, "bilibili": 1200, "youtube": 1200}
+FALLBACK_DURATION = 300
+
+
+def estimate_runtime(duration: float, per_media_second: float = 0.1, overhead: float = 20.0) -> float:
+    """媒体时长 → 预估处理耗时（下载、转码、云端转录大致与时长成正比）"""
+    return overhead + duration * per_media_second
+
+
+class _Entry:
+    __slots__ = ("job_id", "item", "priority", "deadline", "duration", "seq", "queued_at")
+
+    def __init__(self, job_id, item, priority, deadline, duration, seq):
+        self.job_id = job_id
+        self.item = item
+        self.priority = priority
+        self.deadline = deadline
+        self.duration = duration
+        self.seq = seq
+        self.queued_at = time.monotonic()
+
+
+class JobQueue:
+    """线程安全的排队表；get() 每次按当前时间重新计算顺序"""
+
+    def __init__(self, aging: float = 1.0, urgency_margin: float = 30.0,
+                 on_expired: Optional[Callable[[object], None]] = None):
+        self.aging = aging
+        self.urgency_margin = urgency_margin
+        self.on_expired = on_expired
+        self._entries: List[_Entry] = []
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, job_id: str, item, platform: str = "", priority: str = "normal",
+            deadline: Optional[float] = None, duration: Optional[float] = None):
+        """deadline 为 epoch 秒；duration 为媒体时长（秒），未知时按平台默认值"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知优先级: {priority}，可用: {list(PRIORITIES)}")
+        if duration is None:
+            duration = DEFAULT_DURATION.get(platform, FALLBACK_DURATION)
+        with self._cond:
+            self._entries.append(_Entry(job_id, item, priority, deadline, float(duration), self._seq))
+            self._seq += 1
+            self._cond.notify()
+
+    def update_duration(self, job_id: str, duration: float) -> bool:
+        """探测到真实时长后更新预估；已出队的任务返回 False"""
+        with self._cond:
+            for entry in self._entries:
+                if entry.job_id == job_id:
+                    entry.duration = float(duration)
+                    return True
+            return False
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中的任务（已在运行的不受影响）"""
+        with self._cond:
+            for entry in self._entries:
+                if entry.job_id == job_id:
+                    self._entries.remove(entry)
+                    return True
+            return False
+
+    def _key(self, entry: _Entry, now_wall: float, now: float):
+        runtime = estimate_runtime(entry.duration)
+        if entry.deadline is not None and entry.deadline - now_wall <= runtime + self.urgency_margin:
+            return (0, 0, entry.deadline, entry.seq)
+        waited = now - entry.queued_at
+        return (1, PRIORITIES[entry.priority], entry.duration - self.aging * waited, entry.seq)
+
+    def get(self, timeout: Optional[float] = None):
+        """阻塞取出下一个任务的 item；队列关闭或超时返回 None"""
+        end = None if timeout is None else time.monotonic() + timeout
+        expired = []
+        item = None
+        with self._cond:
+            while True:
+                now_wall, now = time.time(), time.monotonic()
+                for entry in [e for e in self._entries if e.deadline is not None and e.deadline < now_wall]:
+                    self._entries.remove(entry)
+                    expired.append(entry.item)
+                if self._entries:
+                    entry = min(self._entries, key=lambda e: self._key(e, now_wall, now))
+                    self._entries.remove(entry)
+                    item = entry.item
+                    break
+                remaining = None if end is None else end - now
+                if self._closed or (remaining is not None and remaining <= 0):
+                    break
+                self._cond.wait(remaining)
+        if self.on_expired:
+            for expired_item in expired:
+                self.on_expired(expired_item)
+        return item
+
+    def close(self):
+        """唤醒所有等待的 get()；已排队的任务仍会被取完"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self) -> Dict[str, int]:
+        with self._cond:
+            counts = {name: 0 for name in PRIORITIES}
+            for entry in self._entries:
+                counts[entry.priority] += 1
+            return counts
@@ -0,0 +1,112 @@
+"""
+服务上下文模块
+按需创建并复用 OSS、DashScope、ffmpeg 等客户端，服务模式下跨任务保持常驻
+"""
+
+import threading
+from pathlib import Path
+
+from pipeline.config import Config
+
+
+class Services:
+    """任务共享的客户端集合（线程安全的惰性初始化）"""
+
+    def __init__(self, config: Config, output_dir: str):
+        self.config = config
+        self.output_dir = Path(output_dir)
+        self._lock = threading.Lock()
+        self._uploader = None
+        self._transcriber = None
+        self._extractor = None
+        self._workspace = None
+        self._transcript_store = None
+        self._duplicate_index = None
+        self._fingerprint_index = None
+
+    def uploader(self):
+        with self._lock:
+            if self._uploader is None:
+                from pipeline.oss_uploader import MB, shared_uploader
+
+                self._uploader = shared_uploader(
+                    self.config.oss_access_key_id,
+                    self.config.oss_access_key_secret,
+                    self.config.oss_bucket_name,
+                    self.config.oss_endpoint,
+                    multipart_threshold=self.config.oss_multipart_threshold_mb * MB,
+                    part_size=self.config.oss_part_size_mb * MB,
+                    num_threads=self.config.oss_upload_threads,
+                    checkpoint_dir=str(self.output_dir),
+                    ttl_days=self.config.oss_object_ttl_days,
+                    pool_size=self.config.oss_connection_pool_size,
+                )
+            return self._uploader
+
+    def transcriber(self):
+        with self._lock:
+            if self._transcriber is None:
+                from pipeline.transcriber import CloudTranscriber
+
+                self._transcriber = CloudTranscriber(self.config.dashscope_api_key)
+            return self._transcriber
+
+    def workspace(self):
+        """output/ 工作区；首次创建时回收崩溃进程遗留的临时文件"""
+        with self._lock:
+            if self._workspace is None:
+                from pipeline.workspace import GB, Workspace
+
+                self._workspace = Workspace(
+                    str(self.output_dir),
+                    quota_bytes=int(self.config.workspace_quota_gb * GB) if self.config.workspace_quota_gb else None,
+                    min_free_bytes=int(self.config.workspace_min_free_gb * GB),
+                    tmpfs_dir=self.config.scratch_tmpfs or None,
+                    orphan_age=self.config.workspace_orphan_hours * 3600,
+                )
+                try:
+                    self._workspace.gc_orphans()
+                except Exception as e:
+                    from pipeline.logger import Logger
+
+                    Logger.warning(f"遗留临时文件回收失败: {e}")
+            return self._workspace
+
+    def transcript_store(self):
+        """转录全文检索库（output/transcripts.db）"""
+        with self._lock:
+            if self._transcript_store is None:
+                from pipeline.transcript_store import TranscriptStore
+
+                self._transcript_store = TranscriptStore(str(self.output_dir / "transcripts.db"))
+            return self._transcript_store
+
+    def duplicate_index(self):
+        """近重复转录索引（与转录库同库）；未安装 numpy 时抛 RuntimeError"""
+        with self._lock:
+            if self._duplicate_index is None:
+                from pipeline.near_dup import DuplicateIndex
+
+                self._duplicate_index = DuplicateIndex(
+                    str(self.output_dir / "transcripts.db"), threshold=self.config.dedupe_threshold
+                )
+            return self._duplicate_index
+
+    def fingerprint_index(self):
+        """音频指纹倒排索引（与转录库同库）；未安装 numpy 时计算指纹会抛 RuntimeError"""
+        with self._lock:
+            if self._fingerprint_index is None:
+                from pipeline.fingerprint import FingerprintIndex
+
+                self._fingerprint_index = FingerprintIndex(
+                    str(self.output_dir / "transcripts.db"), threshold=self.config.fingerprint_threshold
+                )
+            return self._fingerprint_index
+
+    def extractor(self):
+        with self._lock:
+            if self._extractor is None:
+                from pipeline.audio_extractor import AudioExtractor
+
+                self._extractor = AudioExtractor(str(self.output_dir / "audio"), self.config.ffmpeg_path)
+            return self._extractor
@@ -0,0 +1,134 @@
+"""
+跨任务流水线模块
+把阶段图切成若干工位（下载 → 提取 → 上传 → 转录 → 交付），每个工位一个线程池，
+工位之间用有界队列相连：下游满了上游就阻塞（反压），批量任务时网络、CPU 与云端转录队列同时忙碌。
+每个队列记录深度、上游阻塞与下游空等时间，用来判断瓶颈工位。
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pipeline import metrics
+from pipeline.graph import StageFailed, StageGraph
+from pipeline.logger import Logger
+
+_DONE = object()
+
+
+class MeteredQueue:
+    """带计量的有界队列"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._q: "queue.Queue" = queue.Queue(maxsize)
+
+    def put(self, item):
+        start = time.perf_counter()
+        self._q.put(item)
+        metrics.record_queue(self.name, self._q.qsize(), self.maxsize, blocked_s=time.perf_counter() - start)
+
+    def get(self):
+        start = time.perf_counter()
+        item = self._q.get()
+        metrics.record_queue(self.name, self._q.qsize(), self.maxsize, waited_s=time.perf_counter() - start)
+        return item
+
+
+class _Task:
+    __slots__ = ("index", "ctx", "needed", "finished", "cleaned")
+
+    def __init__(self, index: int, ctx: Dict, needed):
+        self.index = index
+        self.ctx = ctx
+        self.needed = needed
+        self.finished = set()
+        self.cleaned = set()
+
+
+class StreamRunner:
+    """pools: [(工位名, (阶段名, ...)), ...]，按顺序串联；sizes: 工位名 → 线程数"""
+
+    def __init__(self, graph: StageGraph, pools: Sequence[Tuple[str, Tuple[str, ...]]],
+                 sizes: Optional[Dict[str, int]] = None, queue_size: int = 4):
+        covered = [name for _, names in pools for name in names]
+        missing = [s.name for s in graph.stages if s.name not in covered]
+        if missing:
+            raise ValueError(f"阶段未分配工位: {', '.join(missing)}")
+        self.graph = graph
+        self.pools = [(pool, [graph.stage(n) for n in names]) for pool, names in pools]
+        self.sizes = {pool: max(1, (sizes or {}).get(pool, 1)) for pool, _ in pools}
+        self.queue_size = queue_size
+
+    def run(self, contexts: Iterable[Dict],
+            on_result: Optional[Callable[[Dict, Optional[StageFailed]], None]] = None) -> List[Tuple[Dict, Optional[StageFailed]]]:
+        """按输入顺序返回 [(ctx, 失败或 None), ...]；on_result 在每个任务结束时立即回调"""
+        queues = [MeteredQueue(pool, self.queue_size) for pool, _ in self.pools]
+        results: Dict[int, Tuple[Dict, Optional[StageFailed]]] = {}
+        lock = threading.Lock()
+
+        def finish(task: _Task, failure: Optional[StageFailed]):
+            for stage in self.graph.stages:
+                if stage.cleanup and stage.name in task.finished and stage.name not in task.cleaned:
+                    self.graph.cleanup(stage, task.ctx, task.ctx["task_id"])
+            with lock:
+                results[task.index] = (task.ctx, failure)
+            if on_result is not None:
+                try:
+                    on_result(task.ctx, failure)
+                except Exception as e:
+                    Logger.warning(f"结果回调失败: {e}", task.ctx["task_id"])
+
+        def work(i: int, stages, remaining: List[int]):
+            inbox = queues[i]
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            while True:
+                task = inbox.get()
+                if task is _DONE:
+                    break
+                task_id = task.ctx["task_id"]
+                failure = None
+                for stage in stages:
+                    if stage.name not in task.needed:
+                        continue
+                    try:
+                        task.ctx.update(self.graph.execute(stage, dict(task.ctx), task_id))
+                    except Exception as e:
+                        failure = StageFailed(stage, e, task.ctx)
+                        break
+                    task.finished.add(stage.name)
+                    for done in self.graph.releasable(task.finished, task.cleaned):
+                        task.cleaned.add(done.name)
+                        self.graph.cleanup(done, task.ctx, task_id)
+                if failure is not None or outbox is None:
+                    finish(task, failure)
+                else:
+                    outbox.put(task)
+            with lock:
+                remaining[i] -= 1
+                last = remaining[i] == 0
+            if last and outbox is not None:
+                for _ in range(self.sizes[self.pools[i + 1][0]]):
+                    outbox.put(_DONE)
+
+        remaining = [self.sizes[pool] for pool, _ in self.pools]
+        threads = [
+            threading.Thread(target=work, args=(i, stages, remaining), name=f"{pool}-{n}", daemon=True)
+            for i, (pool, stages) in enumerate(self.pools)
+            for n in range(self.sizes[pool])
+        ]
+        for t in threads:
+            t.start()
+        sizes = ", ".join(f"{pool}={self.sizes[pool]}" for pool, _ in self.pools)
+        Logger.info(f"流水线已启动: {sizes}（队列上限 {self.queue_size}）")
+
+        count = 0
+        for count, ctx in enumerate(contexts, 1):
+            queues[0].put(_Task(count - 1, ctx, {s.name for s in self.graph.needed(ctx)}))
+        for _ in range(self.sizes[self.pools[0][0]]):
+            queues[0].put(_DONE)
+        for t in threads:
+            t.join()
+        return [results[i] for i in range(count)]
@@ -5,11 +5,20 @@
 
 import json
 import urllib.request
-from typing import List
+from typing import Dict, List, Tuple
 
+from pipeline import governor
 from pipeline.logger import Logger
 
 
+class TranscriptionSubmitError(RuntimeError):
+    """提交转录任务被拒绝（带 HTTP 状态码，供调度器判断是否重试）"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"转录任务提交失败 {status}: {message}")
+        self.status = status
+
+
 class CloudTranscriber:
     """阿里云Paraformer语音识别"""
 
@@ -28,26 +37,53 @@ class CloudTranscriber:
         self, oss_url: str, language_hints: List[str] = None, task_id: str = ""
     ) -> str:
         """转录音频文件"""
+        return self.transcribe_detailed(oss_url, language_hints, task_id)[0]
+
+    def transcribe_detailed(
+        self, oss_url: str, language_hints: List[str] = None, task_id: str = ""
+    ) -> Tuple[str, List[Dict]]:
+        """转录音频文件，同时返回分句 [{begin_time, end_time, text}]（毫秒）"""
+        Logger.step(4, 5, "提交转录任务", task_id)
+        job = self.submit(oss_url, language_hints, task_id)
+        Logger.info("等待转录完成...", task_id)
+        results, segments = self.collect(job, task_id)
+
+        if not results:
+            raise RuntimeError("转录结果为空")
+
+        full_text = "\n".join(results)
+        Logger.success(f"转录完成，共 {len(full_text)} 字符", task_id)
+
+        return full_text, segments
+
+    def submit(self, oss_url: str, language_hints: List[str] = None, task_id: str = "") -> str:
+        """提交转录任务，返回 DashScope 任务 ID"""
         if language_hints is None:
             language_hints = ["zh", "en"]
 
-        Logger.step(4, 5, "提交转录任务", task_id)
+        def submit():
+            response = self.Transcription.async_call(
+                model=self.model, file_urls=[oss_url], language_hints=language_hints
+            )
+            status = getattr(response, "status_code", 200)
+            if status != 200:
+                raise TranscriptionSubmitError(int(status), getattr(response, "message", ""))
+            return response
 
-        task_response = self.Transcription.async_call(
-            model=self.model, file_urls=[oss_url], language_hints=language_hints
-        )
+        task_response = governor.get("dashscope").call(submit)
 
         Logger.info(f"转录任务已提交: {task_response.output.task_id}", task_id)
+        return task_response.output.task_id
 
-        Logger.info("等待转录完成...", task_id)
-        transcription_response = self.Transcription.wait(
-            task=task_response.output.task_id
-        )
+    def collect(self, job: str, task_id: str = "", offset_ms: int = 0) -> Tuple[List[str], List[Dict]]:
+        """等待任务完成，返回 (文本段列表, 分句)；offset_ms 加到分句时间上（分段转录时换算回整段时间轴）"""
+        transcription_response = self.Transcription.wait(task=job)
 
         if transcription_response.status_code != 200:
             raise RuntimeError(f"转录失败: {transcription_response.output.message}")
 
         results = []
+        segments = []
         for result in transcription_response.output.get("results", []):
             if result.get("subtask_status") == "SUCCEEDED":
                 transcript_url = result["transcription_url"]
@@ -59,15 +95,16 @@ class CloudTranscriber:
                     text = transcript.get("text", "")
                     if text:
                         results.append(text)
+                    for sentence in transcript.get("sentences", []):
+                        begin, end = sentence.get("begin_time"), sentence.get("end_time")
+                        segments.append({
+                            "begin_time": begin + offset_ms if begin is not None else None,
+                            "end_time": end + offset_ms if end is not None else None,
+                            "text": sentence.get("text", ""),
+                        })
             else:
                 Logger.warning(
                     f"子任务失败: {result.get('message', 'Unknown error')}", task_id
                 )
 
-        if not results:
-            raise RuntimeError("转录结果为空")
-
-        full_text = "\n".join(results)
-        Logger.success(f"转录完成，共 {len(full_text)} 字符", task_id)
-
-        return full_text
+        return results, segments
@@ -0,0 +1,267 @@
+"""
+转录库模块
+所有转录文本及其元数据（平台、链接、标题、摘要、分句、时间）存入 SQLite，
+用 FTS5 trigram 分词建全文索引（中文无需分词器），任务完成即增量入库，按相关度检索。
+
+trigram 只能匹配 3 个字符及以上的词；两个字的中文词（如“融资”）走一张按汉字二元组
+切分的辅助索引，单字才退化为 LIKE 扫描。
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pipeline.logger import Logger
+
+_CJK = re.compile(r"[㐀-鿿豈-﫿]+")
+_HEADER_END = "=" * 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    task_id TEXT UNIQUE NOT NULL,
+    platform TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    ai_title TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    transcript TEXT NOT NULL,
+    segments TEXT,
+    transcript_path TEXT NOT NULL DEFAULT '',
+    duplicate_of TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_url ON transcripts (url);
+CREATE INDEX IF NOT EXISTS transcripts_path ON transcripts (transcript_path);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+    title, ai_title, summary, transcript,
+    content='transcripts', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS transcripts_ai AFTER INSERT ON transcripts BEGIN
+    INSERT INTO transcripts_fts (rowid, title, ai_title, summary, transcript)
+    VALUES (new.id, new.title, new.ai_title, new.summary, new.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS transcripts_ad AFTER DELETE ON transcripts BEGIN
+    INSERT INTO transcripts_fts (transcripts_fts, rowid, title, ai_title, summary, transcript)
+    VALUES ('delete', old.id, old.title, old.ai_title, old.summary, old.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS transcripts_au AFTER UPDATE ON transcripts BEGIN
+    INSERT INTO transcripts_fts (transcripts_fts, rowid, title, ai_title, summary, transcript)
+    VALUES ('delete', old.id, old.title, old.ai_title, old.summary, old.transcript);
+    INSERT INTO transcripts_fts (rowid, title, ai_title, summary, transcript)
+    VALUES (new.id, new.title, new.ai_title, new.summary, new.transcript);
+END;
+
+-- 汉字二元组辅助索引（无内容表，由 TranscriptStore 维护）
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_bigram USING fts5(text, content='', tokenize='unicode61');
+"""
+
+# bm25 列权重：标题 > AI 标题 > 摘要 > 正文
+BM25_WEIGHTS = (10.0, 8.0, 3.0, 1.0)
+
+
+def bigrams(text: str) -> str:
+    """汉字连续段切成重叠二元组，其余文本原样保留（交给 unicode61 按词切分）"""
+    def expand(match):
+        run = match.group(0)
+        if len(run) == 1:
+            return f" {run} "
+        return " " + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + " "
+
+    return _CJK.sub(expand, text)
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _snippet(text: str, terms: List[str], width: int = 40) -> str:
+    lowered = text.lower()
+    positions = [p for p in (lowered.find(t.lower()) for t in terms) if p >= 0]
+    if not positions:
+        return text[: width * 2].replace("\n", " ")
+    start = max(0, min(positions) - width)
+    end = min(len(text), min(positions) + width)
+    return ("…" if start else "") + text[start:end].replace("\n", " ") + ("…" if end < len(text) else "")
+
+
+class TranscriptStore:
+    """转录库；每个线程一个连接，写入串行"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(transcripts)")}
+        if "duplicate_of" not in columns:
+            conn.execute("ALTER TABLE transcripts ADD COLUMN duplicate_of TEXT NOT NULL DEFAULT ''")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _bigram_text(row) -> str:
+        return bigrams(" ".join((row["title"], row["ai_title"], row["summary"], row["transcript"])))
+
+    def add(self, task_id: str, transcript: str, platform: str = "", url: str = "", title: str = "",
+            ai_title: str = "", summary: str = "", segments: Optional[List[Dict]] = None,
+            transcript_path: str = "", duplicate_of: str = "", created_at: Optional[float] = None) -> int:
+        """写入或更新一条转录（按 task_id 去重），返回行 id；duplicate_of 为近重复的原始任务"""
+        now = time.time()
+        record = {
+            "task_id": task_id,
+            "platform": platform or "",
+            "url": url or "",
+            "title": title or "",
+            "ai_title": ai_title or "",
+            "summary": summary or "",
+            "transcript": transcript,
+            "segments": json.dumps(segments, ensure_ascii=False) if segments is not None else None,
+            "transcript_path": transcript_path or "",
+            "duplicate_of": duplicate_of or "",
+            "created_at": created_at or now,
+            "updated_at": now,
+        }
+        conn = self._conn()
+        with self._write_lock, conn:
+            old = conn.execute("SELECT * FROM transcripts WHERE task_id = ?", (task_id,)).fetchone()
+            if old is not None:
+                conn.execute(
+                    "INSERT INTO transcripts_bigram (transcripts_bigram, rowid, text) VALUES ('delete', ?, ?)",
+                    (old["id"], self._bigram_text(old)),
+                )
+                record["created_at"] = old["created_at"]
+                if segments is None:
+                    record["segments"] = old["segments"]
+                for key in ("title", "ai_title", "summary"):
+                    record[key] = record[key] or old[key]
+                conn.execute(
+                    "UPDATE transcripts SET platform = :platform, url = :url, title = :title, ai_title = :ai_title,"
+                    " summary = :summary, transcript = :transcript, segments = :segments,"
+                    " transcript_path = :transcript_path, duplicate_of = :duplicate_of, updated_at = :updated_at"
+                    " WHERE task_id = :task_id",
+                    record,
+                )
+                row_id = old["id"]
+            else:
+                row_id = conn.execute(
+                    "INSERT INTO transcripts (task_id, platform, url, title, ai_title, summary, transcript,"
+                    " segments, transcript_path, duplicate_of, created_at, updated_at) VALUES (:task_id,"
+                    " :platform, :url, :title, :ai_title, :summary, :transcript, :segments, :transcript_path,"
+                    " :duplicate_of, :created_at, :updated_at)",
+                    record,
+                ).lastrowid
+            conn.execute(
+                "INSERT INTO transcripts_bigram (rowid, text) VALUES (?, ?)", (row_id, self._bigram_text(record))
+            )
+        return row_id
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM transcripts WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        item["segments"] = json.loads(item["segments"]) if item["segments"] else None
+        return item
+
+    def originals(self):
+        """逐条返回非重复转录的 (task_id, transcript)"""
+        for row in self._conn().execute("SELECT task_id, transcript FROM transcripts WHERE duplicate_of = ''"):
+            yield row["task_id"], row["transcript"]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def search(self, query: str, limit: int = 20, platform: Optional[str] = None) -> List[Dict]:
+        """按相关度检索；多个词用空格分隔，须全部命中"""
+        terms = [t for t in query.split() if t]
+        if not terms:
+            return []
+        long_terms = [t for t in terms if len(t) >= 3]
+        short_terms = [t for t in terms if len(t) == 2]
+        tiny_terms = [t for t in terms if len(t) == 1]
+
+        params: List = []
+        if long_terms:
+            weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+            sql = (
+                f"SELECT t.*, bm25(transcripts_fts, {weights}) AS score FROM transcripts_fts"
+                " JOIN transcripts t ON t.id = transcripts_fts.rowid WHERE transcripts_fts MATCH ?"
+            )
+            params.append(" AND ".join(_quote(t) for t in long_terms))
+            if short_terms:
+                sql += " AND t.id IN (SELECT rowid FROM transcripts_bigram WHERE transcripts_bigram MATCH ?)"
+                params.append(" AND ".join(_quote(bigrams(t).strip()) for t in short_terms))
+        elif short_terms:
+            sql = (
+                "SELECT t.*, bm25(transcripts_bigram) AS score FROM transcripts_bigram"
+                " JOIN transcripts t ON t.id = transcripts_bigram.rowid WHERE transcripts_bigram MATCH ?"
+            )
+            params.append(" AND ".join(_quote(bigrams(t).strip()) for t in short_terms))
+        else:
+            sql = "SELECT t.*, 0.0 AS score FROM transcripts t WHERE 1"
+        for term in tiny_terms:
+            sql += " AND (t.transcript LIKE ? OR t.title LIKE ? OR t.ai_title LIKE ?)"
+            params.extend([f"%{term}%"] * 3)
+        if platform:
+            sql += " AND t.platform = ?"
+            params.append(platform)
+        sql += " ORDER BY score, t.created_at DESC LIMIT ?"
+        params.append(limit)
+
+        results = []
+        for row in self._conn().execute(sql, params):
+            results.append({
+                "task_id": row["task_id"],
+                "platform": row["platform"],
+                "url": row["url"],
+                "title": row["ai_title"] or row["title"],
+                "created_at": row["created_at"],
+                "score": round(-row["score"], 4),
+                "snippet": _snippet(row["transcript"], terms),
+                "transcript_path": row["transcript_path"],
+                "duplicate_of": row["duplicate_of"],
+            })
+        return results
+
+    def index_files(self, transcripts_dir: str) -> int:
+        """把尚未入库的 transcript_*.txt 增量导入（用于历史文件），返回新增数量"""
+        conn = self._conn()
+        known = {row[0] for row in conn.execute("SELECT transcript_path FROM transcripts")}
+        added = 0
+        for path in sorted(Path(transcripts_dir).glob("transcript_*.txt")):
+            if str(path) in known:
+                continue
+            text = path.read_text(encoding="utf-8", errors="replace")
+            meta = {}
+            if _HEADER_END in text[:2000]:
+                header, _, body = text.partition("\n" + "=" * 70 + "\n")
+                for line in header.splitlines():
+                    key, sep, value = line.partition(": ")
+                    if sep:
+                        meta[key.strip().lower()] = value.strip()
+                text = body.lstrip("\n") if body else text
+            task_id = meta.get("task id") or path.stem[len("transcript_"):]
+            if conn.execute("SELECT 1 FROM transcripts WHERE task_id = ?", (task_id,)).fetchone():
+                continue
+            self.add(task_id, text, url=meta.get("url", ""), transcript_path=str(path),
+                     created_at=path.stat().st_mtime)
+            added += 1
+        if added:
+            Logger.info(f"转录库已导入 {added} 个历史转录文件")
+        return added
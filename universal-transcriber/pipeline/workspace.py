@@ -0,0 +1,216 @@
+"""
+工作区管理模块
+output/ 下的磁盘管理：每个任务一个临时目录（任务结束整体删除，失败路径也不残留），
+放得下时临时目录放在 tmpfs；保留的视频/音频计入配额，超出时按最近最少使用淘汰；
+启动时回收崩溃进程留下的孤儿临时目录与半截下载
+"""
+
+import os
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pipeline.logger import Logger
+
+GB = 1024 ** 3
+KEPT_DIRS = ("downloads", "audio")
+OWNER_FILE = ".owner"
+PARTIAL_SUFFIXES = (".part", ".ytdl", ".tmp")
+# 仅音频任务的临时文件预估（抖音音频直出仍需先落整段视频）
+AUDIO_SCRATCH_BYTES = 256 * 1024 * 1024
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # Windows 上 os.kill(pid, 0) 会终止进程；只按目录年龄判断
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class TaskScratch:
+    """单个任务的临时目录；close() 删除整个目录"""
+
+    def __init__(self, workspace: "Workspace", task_id: str, path: Path):
+        self.workspace = workspace
+        self.task_id = task_id
+        self.path = path
+
+    def close(self):
+        self.workspace._release(self)
+
+    def __enter__(self) -> "TaskScratch":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Workspace:
+    """output/ 目录的配额、临时目录与孤儿回收"""
+
+    def __init__(
+        self,
+        root: str,
+        quota_bytes: Optional[int] = 20 * GB,
+        min_free_bytes: int = 2 * GB,
+        tmpfs_dir: Optional[str] = "/dev/shm",
+        tmpfs_reserve_bytes: int = 512 * 1024 * 1024,
+        orphan_age: float = 6 * 3600,
+    ):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.min_free_bytes = min_free_bytes
+        self.tmpfs_root = Path(tmpfs_dir) / "ut-scratch" if tmpfs_dir and Path(tmpfs_dir).is_dir() else None
+        self.tmpfs_reserve_bytes = tmpfs_reserve_bytes
+        self.orphan_age = orphan_age
+        self.scratch_root = self.root / "scratch"
+        self._active: Dict[str, TaskScratch] = {}
+        self._lock = threading.Lock()
+        for name in KEPT_DIRS + ("transcripts",):
+            (self.root / name).mkdir(parents=True, exist_ok=True)
+        self.scratch_root.mkdir(parents=True, exist_ok=True)
+
+    def kept(self, name: str) -> Path:
+        """保留文件的目录（downloads / audio），计入配额"""
+        return self.root / name
+
+    def task(self, task_id: str, expected_bytes: Optional[int] = None) -> TaskScratch:
+        """分配任务临时目录；预计大小已知且 tmpfs 放得下时放在 tmpfs"""
+        base = self.scratch_root
+        if self.tmpfs_root is not None and expected_bytes is not None:
+            try:
+                free = shutil.disk_usage(self.tmpfs_root.parent).free
+            except OSError:
+                free = 0
+            if free - expected_bytes * 2 >= self.tmpfs_reserve_bytes:
+                base = self.tmpfs_root
+        path = base / task_id
+        path.mkdir(parents=True, exist_ok=True)
+        (path / OWNER_FILE).write_text(f"{socket.gethostname()} {os.getpid()}", encoding="utf-8")
+        scratch = TaskScratch(self, task_id, path)
+        with self._lock:
+            self._active[task_id] = scratch
+        return scratch
+
+    def _release(self, scratch: TaskScratch):
+        with self._lock:
+            self._active.pop(scratch.task_id, None)
+        shutil.rmtree(scratch.path, ignore_errors=True)
+        self.enforce()
+
+    def _kept_files(self) -> List[Tuple[str, os.stat_result, bool]]:
+        """保留文件 (路径, stat, 是否受保护)；文件名含进行中任务 ID 的受保护，计入用量但不淘汰"""
+        with self._lock:
+            active = list(self._active)
+        files = []
+        for name in KEPT_DIRS:
+            for entry in os.scandir(self.root / name):
+                if entry.is_file():
+                    try:
+                        files.append((entry.path, entry.stat(), any(t in entry.name for t in active)))
+                    except OSError:
+                        pass
+        return files
+
+    def usage(self) -> Dict[str, int]:
+        usage = {name: _dir_size(self.root / name) for name in KEPT_DIRS + ("transcripts",)}
+        usage["scratch"] = _dir_size(self.scratch_root)
+        if self.tmpfs_root is not None and self.tmpfs_root.exists():
+            usage["tmpfs_scratch"] = _dir_size(self.tmpfs_root)
+        usage["disk_free"] = shutil.disk_usage(self.root).free
+        return usage
+
+    def _over(self, kept_bytes: int, need: int) -> bool:
+        if self.quota_bytes is not None and kept_bytes > self.quota_bytes:
+            return True
+        return shutil.disk_usage(self.root).free - need < self.min_free_bytes
+
+    def enforce(self, need: int = 0) -> int:
+        """超出配额或剩余空间不足时按最近使用时间淘汰保留文件，返回释放的字节数"""
+        files = self._kept_files()
+        kept_bytes = sum(st.st_size for _, st, _ in files)
+        candidates = sorted(
+            ((path, st) for path, st, protected in files if not protected),
+            key=lambda f: max(f[1].st_atime, f[1].st_mtime),
+        )
+        freed = 0
+        while candidates and self._over(kept_bytes - freed, need):
+            path, st = candidates.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            freed += st.st_size
+            Logger.info(f"磁盘配额：淘汰最久未用的保留文件 {Path(path).name}（{st.st_size / 1048576:.1f}MB）")
+        return freed
+
+    def ensure_space(self, need: int = 0):
+        """新任务开始前保证剩余空间；淘汰后仍不足则直接失败，而不是把磁盘写满"""
+        self.enforce(need)
+        free = shutil.disk_usage(self.root).free
+        if free - need < self.min_free_bytes:
+            raise RuntimeError(
+                f"磁盘空间不足: 剩余 {free / GB:.1f}GB，需保留 {self.min_free_bytes / GB:.1f}GB"
+                f"（可清理 {self.root} 或调低 workspace_min_free_gb）"
+            )
+
+    def gc_orphans(self) -> int:
+        """回收崩溃进程遗留的临时目录（属主进程已退出或超过 orphan_age）与保留目录中的半截文件"""
+        host = socket.gethostname()
+        now = time.time()
+        removed = 0
+        with self._lock:
+            active = {s.path for s in self._active.values()}
+        for base in filter(None, (self.scratch_root, self.tmpfs_root)):
+            if not base.exists():
+                continue
+            for path in base.iterdir():
+                if path in active or not path.is_dir():
+                    continue
+                try:
+                    owner_host, pid = (path / OWNER_FILE).read_text(encoding="utf-8").split()
+                    orphan = owner_host == host and not _pid_alive(int(pid))
+                except (OSError, ValueError):
+                    orphan = False
+                try:
+                    orphan = orphan or now - path.stat().st_mtime > self.orphan_age
+                except OSError:
+                    continue
+                if orphan:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+        for name in KEPT_DIRS:
+            for entry in os.scandir(self.root / name):
+                partial = entry.name.endswith(PARTIAL_SUFFIXES) or (
+                    entry.name.startswith("tmp") and entry.name.endswith(".mp4")
+                )
+                try:
+                    if partial and entry.is_file() and now - entry.stat().st_mtime > self.orphan_age:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            Logger.info(f"已回收 {removed} 个遗留临时目录/文件")
+        return removed
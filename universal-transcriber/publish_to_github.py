@@ -1,161 +1,245 @@
 #!/usr/bin/env python3
+import contextlib
 import os
-import sys
-import datetime
 import subprocess
-import time
+import threading
 import uuid
+from concurrent.futures import Future
 from pathlib import Path
 
+from pipeline import governor
+from pipeline.logger import Logger
+from pipeline.note_renderer import render_note, write_note
+from pipeline.notes_index import NotesIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 
 def generate_note_html(transcript_id, title, url, task_id, summary, original_content):
-    date_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    return f"""<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 2rem;
-            color: #333;
-            line-height: 1.7;
-        }}
-        h1 {{
-            font-size: 1.8rem;
-            border-bottom: 2px solid #eee;
-            padding-bottom: 0.5rem;
-        }}
-        .meta {{
-            color: #888;
-            font-size: 0.9rem;
-            margin-bottom: 1.5rem;
-        }}
-        .meta a {{
-            color: #888;
-        }}
-        .summary {{
-            background: #f8f9fa;
-            border-left: 4px solid #4a90e2;
-            padding: 1rem 1.5rem;
-            margin: 1.5rem 0;
-            border-radius: 0 8px 8px 0;
-        }}
-        .summary-title {{
-            font-weight: bold;
-            color: #4a90e2;
-            margin-bottom: 0.5rem;
-        }}
-        .content {{
-            white-space: pre-wrap;
-            background: #fafafa;
-            padding: 1.5rem;
-            border-radius: 8px;
-            font-size: 0.95rem;
-        }}
-        .back-link {{
-            margin-top: 2rem;
-        }}
-        .back-link a {{
-            color: #4a90e2;
-            text-decoration: none;
-        }}
-    </style>
-</head>
-<body>
-    <h1>{title}</h1>
-    <div class="meta">
-        <p><strong>原始链接：</strong><a href="{url}" target="_blank">{url}</a></p>
-        <p><strong>日期：</strong>{date_str}</p>
-    </div>
-    <div class="summary">
-        <div class="summary-title">AI 总结</div>
-        <div>{summary}</div>
-    </div>
-    <div class="content">{original_content}</div>
-    <div class="back-link"><a href="../index.html">← 返回首页</a></div>
-</body>
-</html>"""
+    return render_note(title, url, summary, original_content)
+
+
+def update_index_entries(entries, github_repo_dir):
+    """一次性把多条 (transcript_id, title, summary) 追加到笔记索引并重绘首页"""
+    if not entries:
+        return []
+    notes = [{"id": tid, "title": title, "summary": summary} for tid, title, summary in entries]
+    return NotesIndex(github_repo_dir).append(notes)
 
 
 def update_index_html(transcript_id, title, summary, github_repo_dir):
-    index_path = os.path.join(github_repo_dir, "index.html")
-    with open(index_path, "r", encoding="utf-8") as f:
-        index_content = f.read()
-    date_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    new_item = f"""        <li class="note-item" data-date="{date_str}">
-            <a href="notes/{transcript_id}.html">{title}</a>
-            <div class="note-date">{date_str}</div>
-            <div class="note-summary">{summary}</div>
-        </li>
-"""
-    marker = '<ul class="note-list" id="noteList">'
-    if marker in index_content:
-        start = index_content.find(marker)
-        end = index_content.find("</ul>", start)
-        if end != -1:
-            index_content = index_content[:end] + new_item + "    " + index_content[end:]
-    with open(index_path, "w", encoding="utf-8") as f:
-        f.write(index_content)
+    update_index_entries([(transcript_id, title, summary)], github_repo_dir)
 
 
-def git_stable_push(commit_message, github_token, github_user, github_repo, github_repo_dir, max_retries=3):
-    original_dir = os.getcwd()
-    try:
-        os.chdir(github_repo_dir)
-        subprocess.run(["git", "config", "http.version", "HTTP/1.1"], check=True, capture_output=True)
-        subprocess.run(["git", "config", "http.postBuffer", "524288000"], check=True, capture_output=True)
-        subprocess.run([
-            "git", "remote", "set-url", "origin",
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+_prepared_repos = set()
+
+
+@contextlib.contextmanager
+def repo_lock(github_repo_dir):
+    """串行化对同一工作区的写入：进程内线程锁 + 跨进程文件锁"""
+    key = os.path.abspath(github_repo_dir)
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(key, threading.Lock())
+    with lock:
+        lock_path = Path(key) / ".git" / "publish.lock"
+        if not lock_path.parent.is_dir():
+            lock_path = Path(key) / ".publish.lock"
+        with open(lock_path, "a+") as fh:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _git(args, cwd, check=False):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=check)
+
+
+def _prepare_repo(github_token, github_user, github_repo, github_repo_dir):
+    """git config 与 remote 只需每个进程设置一次"""
+    key = (os.path.abspath(github_repo_dir), github_user, github_repo)
+    if key in _prepared_repos:
+        return
+    _git(["config", "http.version", "HTTP/1.1"], github_repo_dir, check=True)
+    _git(["config", "http.postBuffer", "524288000"], github_repo_dir, check=True)
+    if github_token:
+        _git([
+            "remote", "set-url", "origin",
             f"https://{github_token}@github.com/{github_user}/{github_repo}.git"
-        ], check=True, capture_output=True)
-        stash = subprocess.run(["git", "stash"], capture_output=True, text=True)
-        stashed = "No local changes" not in stash.stdout
-        pull = subprocess.run(["git", "pull", "origin", "main", "--rebase"], capture_output=True, text=True)
-        if pull.returncode != 0:
-            print(f"[WARN] pull 失败，继续推送: {pull.stderr[:100]}")
-        if stashed:
-            subprocess.run(["git", "stash", "pop"], capture_output=True)
-        subprocess.run(["git", "add", "--all"], check=True, capture_output=True)
-        commit = subprocess.run(["git", "commit", "-m", commit_message], capture_output=True, text=True)
-        if commit.returncode != 0:
-            print("[INFO] No changes to commit")
+        ], github_repo_dir, check=True)
+    else:
+        Logger.info("未配置 github_token，沿用工作区已有的 origin")
+    _prepared_repos.add(key)
+
+
+def _remote_moved(github_repo_dir, branch="main"):
+    """对比远端 head 与本地跟踪分支，未变化时无需 pull"""
+    remote = _git(["ls-remote", "origin", f"refs/heads/{branch}"], github_repo_dir)
+    if remote.returncode != 0 or not remote.stdout.strip():
+        return True
+    remote_head = remote.stdout.split()[0]
+    local = _git(["rev-parse", "--verify", "--quiet", f"refs/remotes/origin/{branch}"], github_repo_dir)
+    return local.stdout.strip() != remote_head
+
+
+def _sync_with_remote(github_repo_dir, branch="main"):
+    if not _remote_moved(github_repo_dir, branch):
+        Logger.info("远端无新提交，跳过 pull")
+        return
+    pull = _git(["pull", "origin", branch, "--rebase", "--autostash"], github_repo_dir)
+    if pull.returncode != 0:
+        _git(["rebase", "--abort"], github_repo_dir)
+        Logger.warning(f"pull 失败，继续推送: {pull.stderr[:100]}")
+
+
+def git_stable_push(commit_message, github_token, github_user, github_repo, github_repo_dir, max_retries=3):
+    """提交工作区全部改动并推送；调用方需持有 repo_lock"""
+    _prepare_repo(github_token, github_user, github_repo, github_repo_dir)
+    _git(["add", "--all"], github_repo_dir, check=True)
+    commit = _git(["commit", "-m", commit_message], github_repo_dir)
+    if commit.returncode != 0:
+        # 上次推送失败留下的本地提交仍需推送
+        ahead = _git(["rev-list", "--count", "origin/main..HEAD"], github_repo_dir)
+        if ahead.returncode != 0 or not ahead.stdout.strip().isdigit() or int(ahead.stdout) == 0:
+            Logger.info("No changes to commit")
             return True
-        for attempt in range(1, max_retries + 1):
-            print(f"[INFO] 推送到 GitHub（第 {attempt}/{max_retries} 次）...")
-            push = subprocess.run(["git", "push", "-u", "origin", "main"], capture_output=True, text=True)
-            if push.returncode == 0:
-                print("[OK] GitHub Pages 推送成功")
-                return True
-            print(f"[WARN] 推送失败: {push.stderr[-200:]}")
-            if attempt < max_retries:
-                time.sleep(5)
-        raise RuntimeError(f"GitHub 推送失败，已重试 {max_retries} 次")
-    finally:
-        os.chdir(original_dir)
+        Logger.info(f"没有新改动，推送此前未推送的 {int(ahead.stdout)} 个提交")
+    _sync_with_remote(github_repo_dir)
+    gov = governor.get("github")
+    for attempt in range(1, max_retries + 1):
+        Logger.info(f"推送到 GitHub（第 {attempt}/{max_retries} 次）...")
+        with gov.slot():
+            push = _git(["push", "-u", "origin", "main"], github_repo_dir)
+        if push.returncode == 0:
+            gov.success()
+            Logger.success("GitHub Pages 推送成功")
+            return True
+        Logger.warning(f"推送失败: {push.stderr[-200:]}")
+        if attempt < max_retries:
+            gov.backoff(attempt)
+            _sync_with_remote(github_repo_dir)
+    gov.failure()
+    raise RuntimeError(f"GitHub 推送失败，已重试 {max_retries} 次")
+
+
+class PublishQueue:
+    """组提交发布队列：逐条写入笔记 HTML，待发布条目由一个线程一次更新首页、提交并推送。
+    推送进行中到达的笔记攒成下一批：单条发布（单次 CLI 运行）立即推送，并发任务自然合并成批。
+    每条笔记等到包含它的那次推送结束才返回，推送失败抛给调用方"""
+
+    def __init__(self, config, max_items=20):
+        self.config = config
+        self.max_items = max_items
+        self._pending = []
+        self._cond = threading.Condition()
+        self._pushing = False
+
+    def add(self, transcript_id, title, url, task_id, summary, original_content):
+        """写入笔记并排入下一批，返回 Future：推送成功后得到页面链接，失败时带异常"""
+        github_repo_dir = self.config.github_repo_dir
+        note_path = Path(github_repo_dir) / "notes" / f"{transcript_id}.html"
+        future = Future()
+        with repo_lock(github_repo_dir):
+            is_new = not note_path.exists()
+            changed = write_note(github_repo_dir, transcript_id, title, url, summary, original_content)
+        if not changed:
+            Logger.info(f"HTML 未变化，跳过写入: {note_path}")
+            future.set_result(self._note_url(transcript_id))
+            return future
+        Logger.success(f"HTML 已生成: {note_path}")
+        with self._cond:
+            # 已发布过的笔记只重写页面，不重复进首页
+            self._pending.append(((transcript_id, title, summary) if is_new else None, future, transcript_id))
+        return future
+
+    def wait(self, future):
+        """等待 add 返回的 Future；没有线程在推送时由当前线程推送下一批"""
+        while not future.done():
+            with self._cond:
+                while self._pushing and not future.done():
+                    self._cond.wait()
+                if future.done():
+                    break
+                self._pushing = True
+                batch, self._pending = self._pending[:self.max_items], self._pending[self.max_items:]
+            try:
+                self._push(batch)
+            finally:
+                with self._cond:
+                    self._pushing = False
+                    self._cond.notify_all()
+        return future.result()
+
+    def publish(self, transcript_id, title, url, task_id, summary, original_content):
+        """写入笔记并等到它被推送，返回页面链接"""
+        return self.wait(self.add(transcript_id, title, url, task_id, summary, original_content))
+
+    def _note_url(self, transcript_id):
+        return f"https://{self.config.github_user}.github.io/notes/{transcript_id}.html"
+
+    def _push(self, batch):
+        """把一批条目写入首页，一次提交、一次推送；结果写进各条目的 Future"""
+        github_repo_dir = self.config.github_repo_dir
+        new_entries = [entry for entry, _, _ in batch if entry is not None]
+        try:
+            with repo_lock(github_repo_dir):
+                if new_entries:
+                    update_index_entries(new_entries, github_repo_dir)
+                    Logger.success(f"首页已更新（{len(new_entries)} 条）")
+                if len(new_entries) == 1 and len(batch) == 1:
+                    message = f"Add transcript: {new_entries[0][1][:50]}"
+                elif new_entries:
+                    message = f"Add {len(new_entries)} transcripts"
+                else:
+                    message = f"Update {len(batch)} transcript(s)"
+                git_stable_push(
+                    message,
+                    self.config.github_token,
+                    self.config.github_user,
+                    self.config.github_repo,
+                    github_repo_dir,
+                )
+        except Exception as e:
+            # 笔记与首页改动留在工作区，下一次成功推送会一并提交
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for _, future, transcript_id in batch:
+            future.set_result(self._note_url(transcript_id))
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def shared_queue(config):
+    """进程内按工作区共用一个发布队列，并发任务的笔记合并提交推送（每批最多 github_batch_items 条）"""
+    key = os.path.abspath(config.github_repo_dir)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = PublishQueue(config, max_items=config.github_batch_items)
+            _queues[key] = queue
+        return queue
 
 
 def publish_to_github(transcript_id, title, url, task_id, summary, original_content, config):
-    github_repo_dir = config.github_repo_dir
-    notes_dir = Path(github_repo_dir) / "notes"
-    notes_dir.mkdir(parents=True, exist_ok=True)
-    note_html = generate_note_html(transcript_id, title, url, task_id, summary, original_content)
-    note_path = notes_dir / f"{transcript_id}.html"
-    note_path.write_text(note_html, encoding="utf-8")
-    print(f"[OK] HTML 已生成: {note_path}")
-    update_index_html(transcript_id, title, summary, github_repo_dir)
-    print("[OK] 首页已更新")
-    git_stable_push(
-        f"Add transcript: {title[:50]}",
-        config.github_token,
-        config.github_user,
-        config.github_repo,
-        github_repo_dir
-    )
-    github_url = f"https://{config.github_user}.github.io/notes/{transcript_id}.html"
-    print(f"[OK] GitHub Pages 发布完成: {github_url}")
+    """写入笔记并经共享发布队列推送（与同时发布的其他笔记合并为一次提交），推送失败时抛出"""
+    github_url = shared_queue(config).publish(transcript_id, title, url, task_id, summary, original_content)
+    Logger.success(f"GitHub Pages 发布完成: {github_url}")
     return github_url
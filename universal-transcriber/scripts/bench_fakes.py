@@ -0,0 +1,377 @@
+"""Local stand-ins for every external service the pipeline talks to.
+
+One threaded HTTP server plays the media host, the OSS download endpoint,
+the Paraformer result host, the chat-completions LLM and the Notion REST API.
+In-process fakes cover the OSS bucket and the DashScope Transcription SDK,
+and a bare git repository stands in for the GitHub Pages remote.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+_SENTENCES = [
+    "今天我们聊一聊创业公司如何在融资寒冬里活下来。",
+    "第一件事是把现金流放在所有指标的前面。",
+    "很多团队在增长和利润之间反复摇摆，最后两头落空。",
+    "技术本身不是护城河，组织学习的速度才是。",
+    "The key idea is to measure before you optimize.",
+    "我们用一个简单的模型来解释这个现象。",
+]
+
+
+class FakeState:
+    """Shared counters and payload stores behind the fake HTTP server."""
+
+    def __init__(self, media_dir: Path, asr_latency: float, asr_rtf: float, llm_latency: float,
+                 notion_latency: float, notion_429_rate: float):
+        self.media_dir = media_dir
+        self.objects: dict[str, bytes] = {}
+        self.object_times: dict[str, float] = {}
+        self.asr_results: dict[str, dict] = {}
+        self.asr_latency = asr_latency
+        self.asr_rtf = asr_rtf
+        self.llm_latency = llm_latency
+        self.notion_latency = notion_latency
+        self.notion_429_rate = notion_429_rate
+        self.counters: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+
+def _make_handler(state: FakeState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str = "application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, obj, headers=None):
+            self._send(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"), headers=headers)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            path = unquote(self.path.split("?", 1)[0])
+            if path.startswith("/media/"):
+                file = state.media_dir / path[len("/media/"):]
+                if not file.is_file():
+                    return self._json(404, {"error": "no media"})
+                state.count("media_bytes", file.stat().st_size)
+                return self._send(200, file.read_bytes(), "video/mp4")
+            if path.startswith("/oss/"):
+                data = state.objects.get(path[len("/oss/"):])
+                if data is None:
+                    return self._json(404, {"error": "NoSuchKey"})
+                return self._send(200, data, "application/octet-stream")
+            if path.startswith("/asr/"):
+                result = state.asr_results.get(path[len("/asr/"):])
+                if result is None:
+                    return self._json(404, {"error": "no result"})
+                return self._json(200, result)
+            self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.endswith("/chat/completions"):
+                payload = self._body()
+                time.sleep(state.llm_latency)
+                state.count("llm_calls")
+                system = payload["messages"][0]["content"]
+                content = "离线基准测试标题" if "标题" in system else "这是一段离线基准测试生成的总结。"
+                return self._json(200, {"choices": [{"message": {"content": content}}]})
+            if self.path == "/v1/pages":
+                return self._notion(self._body(), create=True)
+            self._json(404, {"error": "not found"})
+
+        def do_PATCH(self):
+            if self.path.startswith("/v1/blocks/") and self.path.endswith("/children"):
+                return self._notion(self._body(), create=False)
+            self._json(404, {"error": "not found"})
+
+        def _notion(self, payload, create: bool):
+            time.sleep(state.notion_latency)
+            if random.random() < state.notion_429_rate:
+                state.count("notion_429")
+                return self._json(429, {"message": "rate limited"}, headers={"Retry-After": "0.2"})
+            children = payload.get("children", [])
+            if len(children) > 100:
+                state.count("notion_rejected")
+                return self._json(400, {"message": "body.children.length should be ≤ 100"})
+            state.count("notion_requests")
+            state.count("notion_blocks", len(children))
+            page_id = str(uuid.uuid4())
+            return self._json(200, {"id": page_id, "url": f"https://notion.fake/{page_id.replace('-', '')}"})
+
+    return Handler
+
+
+class FakeServer:
+    def __init__(self, state: FakeState):
+        self.state = state
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(state))
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class NoSuchKey(KeyError):
+    """Mirrors oss2.exceptions.NoSuchKey, which carries status 404."""
+
+    status = 404
+
+
+class FakeBucket:
+    """In-memory stand-in for oss2.Bucket, served back through the fake HTTP server."""
+
+    def __init__(self, state: FakeState, base_url: str):
+        self.state = state
+        self.base_url = base_url
+
+    def put_object_from_file(self, key, filename, headers=None, progress_callback=None):
+        data = Path(filename).read_bytes()
+        with self.state.lock:
+            self.state.objects[key] = data
+            self.state.object_times[key] = time.time()
+        self.state.count("oss_put_bytes", len(data))
+        return SimpleNamespace(status=200, etag=str(hash(data)))
+
+    def sign_url(self, method, key, expires, *args, **kwargs):
+        return f"{self.base_url}/oss/{key}"
+
+    def object_exists(self, key):
+        return key in self.state.objects
+
+    def head_object(self, key):
+        with self.state.lock:
+            if key not in self.state.objects:
+                raise NoSuchKey(key)
+            return SimpleNamespace(content_length=len(self.state.objects[key]),
+                                   last_modified=int(self.state.object_times[key]))
+
+    def list_objects(self, prefix="", marker="", max_keys=100):
+        with self.state.lock:
+            keys = sorted(k for k in self.state.objects if k.startswith(prefix) and k > marker)
+            page = keys[:max_keys]
+            infos = [SimpleNamespace(key=k, last_modified=int(self.state.object_times[k])) for k in page]
+        truncated = len(keys) > max_keys
+        return SimpleNamespace(object_list=infos, is_truncated=truncated, next_marker=page[-1] if truncated else "")
+
+    def delete_object(self, key):
+        with self.state.lock:
+            self.state.objects.pop(key, None)
+            self.state.object_times.pop(key, None)
+        self.state.count("oss_deletes")
+
+    def batch_delete_objects(self, keys):
+        self.state.count("oss_batch_deletes")
+        for key in keys:
+            self.delete_object(key)
+        return SimpleNamespace(deleted_keys=list(keys))
+
+
+class _Output(dict):
+    __getattr__ = dict.get
+
+
+class FakeTranscription:
+    """Stand-in for dashscope.audio.asr.Transcription with duration-scaled latency."""
+
+    def __init__(self, state: FakeState, base_url: str):
+        self.state = state
+        self.base_url = base_url
+        self.tasks: dict[str, float] = {}
+
+    def async_call(self, model, file_urls, language_hints=None, **kwargs):
+        import urllib.request
+
+        data = urllib.request.urlopen(file_urls[0]).read()
+        # 16 kbit/s Opus ≈ 2000 bytes per second of audio
+        seconds = max(1.0, len(data) / 2000)
+        task_id = uuid.uuid4().hex
+        self.tasks[task_id] = seconds
+        text = synthetic_transcript(seconds)
+        sentences = [s + "。" for s in text.split("。") if s]
+        step = int(seconds * 1000 / max(1, len(sentences)))
+        self.state.asr_results[f"{task_id}.json"] = {"transcripts": [{
+            "text": text,
+            "sentences": [{"begin_time": i * step, "end_time": (i + 1) * step, "text": s}
+                          for i, s in enumerate(sentences)],
+        }]}
+        self.state.count("asr_audio_seconds", int(seconds))
+        return SimpleNamespace(output=SimpleNamespace(task_id=task_id))
+
+    def wait(self, task):
+        seconds = self.tasks.pop(task)
+        time.sleep(self.state.asr_latency + seconds * self.state.asr_rtf)
+        return SimpleNamespace(
+            status_code=200,
+            output=_Output(
+                results=[{"subtask_status": "SUCCEEDED", "transcription_url": f"{self.base_url}/asr/{task}.json"}],
+                message="",
+            ),
+        )
+
+
+def synthetic_transcript(seconds: float) -> str:
+    chars = int(seconds * 4)
+    out, i = [], 0
+    while sum(len(s) for s in out) < chars:
+        out.append(_SENTENCES[i % len(_SENTENCES)])
+        i += 1
+    return "".join(out)
+
+
+class LocalMediaDownloader:
+    """Downloader plugin that streams a synthetic video from the fake media host."""
+
+    def __init__(self):
+        self._titles = {}
+
+    def download(self, url, output_dir, task_id, cookies_path=None, audio_only=True):
+        import requests
+
+        out = Path(output_dir) / f"bench_{task_id}.mp4"
+        with requests.get(url, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            with open(out, "wb") as f:
+                for chunk in r.iter_content(chunk_size=65536):
+                    f.write(chunk)
+        self._titles[url] = Path(url).stem
+        return str(out)
+
+    def get_title(self, url, cookies_path=None):
+        return self._titles.pop(url, None)
+
+
+def make_media(media_dir: Path, durations: list[int], ffmpeg: str | None) -> list[Path]:
+    """Synthesize one test video per duration (ffmpeg lavfi, or a WAV if ffmpeg is a stub)."""
+    media_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    for seconds in durations:
+        if ffmpeg:
+            out = media_dir / f"clip_{seconds}s.mp4"
+            if not out.exists():
+                subprocess.run(
+                    [ffmpeg, "-y", "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=10:duration={seconds}",
+                     "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                     "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", str(out)],
+                    check=True, capture_output=True,
+                )
+        else:
+            out = media_dir / f"clip_{seconds}s.wav"
+            if not out.exists():
+                _write_sine_wav(out, seconds)
+        files.append(out)
+    return files
+
+
+def _write_sine_wav(path: Path, seconds: int, rate: int = 8000):
+    frames = bytearray()
+    for n in range(seconds * rate):
+        frames += struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * n / rate)))
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(frames))
+
+
+def stub_ffmpeg(directory: Path) -> str:
+    """A pass-through 'ffmpeg' for machines without one: copies input to output.
+
+    Decoding to pipe:1 writes the input's bytes past the WAV header, so the
+    synthetic 8 kHz clips fingerprint as real PCM. Segmenting cuts the bytes at
+    the requested times using the fake ASR's 2000 bytes per audio second.
+
+    Extract-stage timings are meaningless with the stub; every other stage is real.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    script = directory / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import shutil, sys\n"
+        "args = sys.argv[1:]\n"
+        "if '-version' in args:\n"
+        "    print('ffmpeg version bench-stub'); sys.exit(0)\n"
+        "src = args[args.index('-i') + 1]\n"
+        "dst = args[-1]\n"
+        "data = open(src, 'rb').read()\n"
+        "if dst == 'pipe:1':\n"
+        "    sys.stdout.buffer.write(data[44:]); sys.exit(0)\n"
+        "if 'segment' in args:\n"
+        "    cuts = [int(float(t) * 2000) for t in args[args.index('-segment_times') + 1].split(',')]\n"
+        "    cuts = [0] + [c for c in cuts if c < len(data)] + [len(data)]\n"
+        "    for i in range(len(cuts) - 1):\n"
+        "        open(dst % i, 'wb').write(data[cuts[i]:cuts[i + 1]])\n"
+        "    sys.exit(0)\n"
+        "open(dst, 'wb').write(data[: max(2000, len(data) // 16)])\n",
+        encoding="utf-8",
+    )
+    script.chmod(0o755)
+    return str(script)
+
+
+def make_git_remote(root: Path) -> Path:
+    """Bare remote plus a working clone seeded with a notes index page."""
+    remote = root / "pages-remote.git"
+    work = root / "pages-work"
+    env = {**os.environ, "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@localhost",
+           "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@localhost"}
+    subprocess.run(["git", "init", "-q", "--bare", "-b", "main", str(remote)], check=True)
+    subprocess.run(["git", "clone", "-q", str(remote), str(work)], check=True, capture_output=True)
+    subprocess.run(["git", "checkout", "-q", "-B", "main"], cwd=work, check=True)
+    (work / "index.html").write_text(
+        '<!DOCTYPE html>\n<html>\n<body>\n    <ul class="note-list" id="noteList">\n    </ul>\n</body>\n</html>\n',
+        encoding="utf-8",
+    )
+    for key, value in (("user.name", "bench"), ("user.email", "bench@localhost")):
+        subprocess.run(["git", "config", key, value], cwd=work, check=True)
+    subprocess.run(["git", "add", "."], cwd=work, check=True)
+    subprocess.run(["git", "commit", "-q", "-m", "init"], cwd=work, check=True, env=env)
+    subprocess.run(["git", "push", "-q", "origin", "main"], cwd=work, check=True, capture_output=True)
+    return work
+
+
+def scratch_dir() -> Path:
+    return Path(tempfile.mkdtemp(prefix="ut-bench-"))
+
+
+def remove_dir(path: Path):
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""Offline end-to-end benchmark for the transcription pipeline.
+
+Every external service is replaced by a local stand-in (see bench_fakes.py):
+media host, OSS bucket, Paraformer, the title/summary LLM, the Notion API and
+a bare git remote for GitHub Pages. Synthetic clips of varying length are
+pushed through main.run_task, the cross-task stream runner (main.run_batch)
+and TranscriptionPipeline.process, and the per-stage latency, queue depths,
+throughput and peak memory are reported from the metrics recorder.
+
+    python scripts/bench_pipeline.py --durations 10,60,300 --repeat 2 --workers 4
+    python scripts/bench_pipeline.py --driver all --repeat 4 --pools transcribe=8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import bench_fakes  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the pipeline end to end against local fakes.")
+    parser.add_argument("--durations", default="10,60,300", help="Comma-separated clip lengths in seconds.")
+    parser.add_argument("--repeat", type=int, default=1, help="Tasks per clip length.")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent run_task calls.")
+    parser.add_argument("--send", default="notion,github", help="Dispatch targets for run_task ('' for none).")
+    parser.add_argument("--driver", choices=["run_task", "stream", "pipeline", "both", "all"], default="both",
+                        help="'both' = run_task + pipeline; 'all' adds the cross-task stream runner.")
+    parser.add_argument("--pools", default="", help="Stream pool sizes, e.g. download=3,transcribe=8.")
+    parser.add_argument("--queue-size", type=int, default=4, help="Bound of each stream queue.")
+    parser.add_argument("--asr-latency", type=float, default=0.3, help="Fixed Paraformer latency (s).")
+    parser.add_argument("--asr-rtf", type=float, default=0.002, help="Paraformer seconds per audio second.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Title/summary LLM latency (s).")
+    parser.add_argument("--notion-latency", type=float, default=0.02, help="Notion request latency (s).")
+    parser.add_argument("--notion-429-rate", type=float, default=0.0, help="Fraction of Notion calls answered 429.")
+    parser.add_argument("--oss-ttl-days", type=int, default=1,
+                        help="OSS object TTL; 0 deletes each object after transcription (batched async deletes).")
+    parser.add_argument("--dedupe-threshold", type=float, default=0.0,
+                        help="Near-duplicate threshold; 0 (default) keeps repeated clips from being linked.")
+    parser.add_argument("--fingerprint-threshold", type=float, default=0.0,
+                        help="Audio fingerprint match threshold; 0 (default) transcribes repeated clips again.")
+    parser.add_argument("--partials", action="store_true",
+                        help="run_task streams chunked partial transcripts; reports time to first text.")
+    parser.add_argument("--events", help="Also write raw span events to this JSONL file.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory.")
+    return parser.parse_args()
+
+
+def build_config(root: Path, fake_url: str, repo_dir: Path, ffmpeg: str, dedupe_threshold: float = 0.0,
+                 fingerprint_threshold: float = 0.0):
+    from pipeline.config import Config
+
+    return Config(
+        oss_access_key_id="bench",
+        oss_access_key_secret="bench",
+        oss_bucket_name="bench",
+        oss_endpoint=fake_url,
+        dashscope_api_key="bench",
+        notion_token="bench",
+        notion_database_id="bench-db",
+        ffmpeg_path=ffmpeg,
+        output_dir=str(root / "output"),
+        zhipu_api_key="bench",
+        zhipu_api_url=f"{fake_url}/chat/completions",
+        title_api_base=fake_url,
+        github_token="",
+        github_user="bench",
+        github_repo="bench.github.io",
+        github_repo_dir=str(repo_dir),
+        dedupe_threshold=dedupe_threshold,
+        fingerprint_threshold=fingerprint_threshold,
+    )
+
+
+def build_components(config, state, fake_url: str, ttl_days: int = 1):
+    """Real pipeline classes wired to the fakes without touching their SDK imports."""
+    from pipeline import notion_writer
+    from pipeline.audio_extractor import AudioExtractor
+    from pipeline.oss_uploader import OSSUploader
+    from pipeline.transcriber import CloudTranscriber
+
+    uploader = OSSUploader(
+        config.oss_access_key_id,
+        config.oss_access_key_secret,
+        config.oss_bucket_name,
+        config.oss_endpoint,
+        multipart_threshold=config.oss_multipart_threshold_mb * 1048576,
+        part_size=config.oss_part_size_mb * 1048576,
+        num_threads=config.oss_upload_threads,
+        checkpoint_dir=config.output_dir,
+        ttl_days=ttl_days,
+        bucket=bench_fakes.FakeBucket(state, fake_url),
+    )
+
+    transcriber = CloudTranscriber.__new__(CloudTranscriber)
+    transcriber.model = "paraformer-v2"
+    transcriber.Transcription = bench_fakes.FakeTranscription(state, fake_url)
+
+    extractor = AudioExtractor(str(Path(config.output_dir) / "audio"), config.ffmpeg_path)
+
+    with notion_writer._shared_lock:
+        notion_writer._shared_writers[config.notion_token] = notion_writer.NotionWriter(
+            config.notion_token, base_url=f"{fake_url}/v1"
+        )
+    return uploader, transcriber, extractor
+
+
+def run_task_driver(config, components, urls, send, workers, partials=False, latency=None):
+    """latency, if given, collects (first partial s, done s) per task when streaming partials."""
+    import main
+    from pipeline.registry import downloaders
+    from pipeline.services import Services
+
+    main.OUTPUT_DIR = Path(config.output_dir)
+    downloaders.register("douyin", bench_fakes.LocalMediaDownloader())
+
+    services = Services(config, config.output_dir)
+    services._uploader, services._transcriber, services._extractor = components
+    targets = [t for t in send.split(",") if t]
+
+    def one(item):
+        i, url = item
+        publisher = None
+        if partials:
+            from pipeline.partials import PartialPublisher
+
+            seen = {}
+            publisher = PartialPublisher(callback=lambda e: seen.setdefault(e["event"], e["elapsed_s"]))
+        result = main.run_task("douyin", url, services, send_targets=targets, task_id=f"rt{i:03d}",
+                               partials=publisher)
+        if publisher is not None and latency is not None:
+            latency.append((seen.get("partial"), seen.get("done")))
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(one, enumerate(urls)))
+
+
+def stream_driver(config, components, urls, send, pools, queue_size):
+    import main
+    from pipeline.registry import downloaders
+    from pipeline.services import Services
+
+    main.OUTPUT_DIR = Path(config.output_dir)
+    downloaders.register("douyin", bench_fakes.LocalMediaDownloader())
+
+    services = Services(config, config.output_dir)
+    services._uploader, services._transcriber, services._extractor = components
+    targets = [t for t in send.split(",") if t]
+    return main.run_batch("douyin", urls, services, send_targets=targets,
+                          pools=main.parse_pools(pools), queue_size=queue_size)
+
+
+def pipeline_driver(config, components, urls):
+    from pipeline.notion_sync import NotionSync
+    from pipeline.pipeline import TranscriptionPipeline
+    from pipeline.services import Services
+
+    pipe = TranscriptionPipeline.__new__(TranscriptionPipeline)
+    pipe.config = config
+    pipe.output_dir = Path(config.output_dir)
+    pipe.download_dir = pipe.output_dir / "downloads"
+    pipe.audio_dir = pipe.output_dir / "audio"
+    pipe.transcripts_dir = pipe.output_dir / "transcripts"
+    for d in (pipe.download_dir, pipe.audio_dir, pipe.transcripts_dir):
+        d.mkdir(parents=True, exist_ok=True)
+    pipe.services = Services(config, config.output_dir)
+    pipe.services._uploader, pipe.services._transcriber, pipe.services._extractor = components
+    pipe.downloader = bench_fakes.LocalMediaDownloader()
+    pipe.notion = NotionSync(config.notion_token, config.notion_database_id)
+    return [pipe.process(url) for url in urls]
+
+
+def report(label, results, elapsed, audio_seconds, ok, latency=None):
+    from pipeline import metrics
+
+    recorder = metrics.recorder()
+    stages = recorder.summary()
+    rep = {
+        "driver": label,
+        "tasks": len(results),
+        "succeeded": sum(1 for r in results if ok(r)),
+        "elapsed_s": round(elapsed, 3),
+        "tasks_per_s": round(len(results) / elapsed, 3) if elapsed else None,
+        "audio_s_per_s": round(audio_seconds / elapsed, 1) if elapsed else None,
+        "stages": {
+            name: {
+                "count": s["count"],
+                "mean_s": round(s["wall_s"] / s["count"], 4) if s["count"] else 0.0,
+                "max_s": round(s["max_wall_s"], 4),
+                "errors": s["errors"],
+                "retries": s["retries"],
+                "mb_in": round(s["bytes_in"] / 1048576, 2),
+                "mb_out": round(s["bytes_out"] / 1048576, 2),
+            }
+            for name, s in stages.items()
+        },
+        "queues": {
+            name: {
+                "mean_depth": round(q["depth_sum"] / q["samples"], 2) if q["samples"] else 0.0,
+                "max_depth": q["max_depth"],
+                "blocked_s": round(q["blocked_s"], 3),
+                "waited_s": round(q["waited_s"], 3),
+            }
+            for name, q in recorder.queues().items()
+        },
+        "peak_rss_mb": metrics._peak_rss_mb(),
+    }
+    if latency:
+        first = [f for f, _ in latency if f is not None]
+        done = [d for _, d in latency if d is not None]
+        rep["first_text_s"] = {"mean": round(sum(first) / len(first), 3) if first else None,
+                               "max": max(first) if first else None}
+        rep["done_s"] = {"mean": round(sum(done) / len(done), 3) if done else None,
+                         "max": max(done) if done else None}
+    return rep
+
+
+def print_report(rep):
+    print(f"\n== {rep['driver']}: {rep['succeeded']}/{rep['tasks']} ok in {rep['elapsed_s']:.2f}s "
+          f"({rep['tasks_per_s']} tasks/s, {rep['audio_s_per_s']} audio-s/s)")
+    print(f"   {'stage':<12}{'count':>6}{'mean s':>10}{'max s':>10}{'retries':>9}{'MB in':>9}{'MB out':>9}")
+    for name, s in rep["stages"].items():
+        print(f"   {name:<12}{s['count']:>6}{s['mean_s']:>10.3f}{s['max_s']:>10.3f}"
+              f"{s['retries']:>9}{s['mb_in']:>9.2f}{s['mb_out']:>9.2f}")
+    if rep["queues"]:
+        print(f"   {'queue':<12}{'mean':>6}{'max':>6}{'blocked s':>11}{'waited s':>10}")
+        for name, q in rep["queues"].items():
+            print(f"   {name:<12}{q['mean_depth']:>6.1f}{q['max_depth']:>6}{q['blocked_s']:>11.3f}{q['waited_s']:>10.3f}")
+    if "first_text_s" in rep:
+        print(f"   first text mean {rep['first_text_s']['mean']}s max {rep['first_text_s']['max']}s | "
+              f"done mean {rep['done_s']['mean']}s max {rep['done_s']['max']}s")
+    if rep["peak_rss_mb"] is not None:
+        print(f"   peak RSS {rep['peak_rss_mb']:.1f} MB")
+
+
+def main() -> int:
+    args = parse_args()
+    durations = [int(d) for d in args.durations.split(",") if d]
+    root = bench_fakes.scratch_dir()
+    try:
+        from pipeline import metrics
+        from pipeline.logger import Logger
+
+        Logger.configure(console=False, task_log_dir=str(root / "logs"))
+
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            print("[WARN] ffmpeg not found: using a pass-through stub, extract timings are not meaningful")
+        media = bench_fakes.make_media(root / "media", durations, ffmpeg)
+        if not ffmpeg:
+            ffmpeg = bench_fakes.stub_ffmpeg(root / "bin")
+
+        state = bench_fakes.FakeState(
+            root / "media", args.asr_latency, args.asr_rtf, args.llm_latency,
+            args.notion_latency, args.notion_429_rate,
+        )
+        with bench_fakes.FakeServer(state) as server:
+            repo_dir = bench_fakes.make_git_remote(root)
+            config = build_config(root, server.url, repo_dir, ffmpeg, args.dedupe_threshold,
+                                  args.fingerprint_threshold)
+            components = build_components(config, state, server.url, args.oss_ttl_days)
+            urls = [f"{server.url}/media/{m.name}" for m in media for _ in range(args.repeat)]
+            audio_seconds = sum(durations) * args.repeat
+
+            reports = []
+            metrics.configure(args.events)
+            if args.driver in ("run_task", "both", "all"):
+                metrics.recorder()._stages.clear()
+                start = time.perf_counter()
+                latency = []
+                results = run_task_driver(config, components, urls, args.send, args.workers, args.partials, latency)
+                reports.append(report("run_task", results, time.perf_counter() - start, audio_seconds,
+                                      lambda r: r.get("task_status") != "failed", latency))
+            if args.driver in ("stream", "all"):
+                metrics.recorder()._stages.clear()
+                start = time.perf_counter()
+                results = stream_driver(config, components, urls, args.send, args.pools, args.queue_size)
+                reports.append(report("stream", results, time.perf_counter() - start, audio_seconds,
+                                      lambda r: r.get("task_status") != "failed"))
+                metrics.recorder()._queues.clear()
+            if args.driver in ("pipeline", "both", "all"):
+                metrics.recorder()._stages.clear()
+                start = time.perf_counter()
+                results = pipeline_driver(config, components, urls)
+                reports.append(report("pipeline", results, time.perf_counter() - start, audio_seconds,
+                                      lambda r: r.get("success")))
+            Logger.flush()
+
+        fakes = dict(sorted(state.counters.items()))
+        if args.json:
+            print(json.dumps({"reports": reports, "fakes": fakes}, ensure_ascii=False, indent=2))
+        else:
+            for rep in reports:
+                print_report(rep)
+            print(f"\nfake service counters: {fakes}")
+        if args.keep:
+            print(f"scratch kept at {root}")
+        return 0 if all(r["succeeded"] == r["tasks"] for r in reports) else 1
+    finally:
+        if not args.keep:
+            bench_fakes.remove_dir(root)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Startup benchmark for main.py.
+
+Runs the CLI's cheap paths (usage error, unsupported platform) under
+`python -X importtime`, checks that no heavy SDK is imported before its stage
+runs, and measures wall time to first output against a budget.
+Exit code 1 means a regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MAIN = BASE_DIR / "main.py"
+HEAVY_MODULES = ("dashscope", "oss2", "notion_client", "playwright", "yaml", "requests")
+SCENARIOS = {
+    "usage": [],
+    "bad-platform": ["--platform", "nope", "--url", "x"],
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark main.py startup and guard lazy imports.")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per scenario.")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Median wall-time budget per scenario.")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports per scenario.")
+    return parser.parse_args()
+
+
+def import_profile(argv: list[str]) -> list[tuple[int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(MAIN), *argv],
+        capture_output=True,
+        text=True,
+        cwd=BASE_DIR,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    return rows
+
+
+def time_to_first_output(argv: list[str]) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(MAIN), *argv],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=BASE_DIR,
+    )
+    proc.stdout.read(1)
+    elapsed = (time.perf_counter() - start) * 1000
+    proc.communicate()
+    return elapsed
+
+
+def main() -> int:
+    args = parse_args()
+    failed = False
+    baseline = statistics.median(
+        _timed([sys.executable, "-c", "pass"]) for _ in range(args.runs)
+    )
+    print(f"[INFO] Interpreter baseline: {baseline:.1f} ms")
+
+    for name, argv in SCENARIOS.items():
+        rows = import_profile(argv)
+        heavy = sorted({mod for _, mod in rows if mod.split(".")[0] in HEAVY_MODULES})
+        samples = [time_to_first_output(argv) for _ in range(args.runs)]
+        median = statistics.median(samples)
+        status = "OK" if median <= args.budget_ms and not heavy else "FAIL"
+        print(f"[{status}] {name}: median {median:.1f} ms to first output (budget {args.budget_ms:.0f} ms)")
+        if heavy:
+            print(f"     heavy modules imported too early: {', '.join(heavy)}")
+        for cumulative, module in sorted(rows, reverse=True)[: args.top]:
+            print(f"     {cumulative / 1000:8.1f} ms  {module}")
+        failed = failed or status == "FAIL"
+    return 1 if failed else 0
+
+
+def _timed(cmd: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -145,7 +145,6 @@ def main() -> int:
         "yaml": "Read `config/send_rules.yaml`.",
     }
     optional_modules = {
-        "notion_client": "Only required when sending to Notion through the official client; requests fallback may still work.",
         "playwright": "Only required for download paths that use browser automation.",
     }
     missing_modules = [f"- `{name}`: {desc}" for name, desc in required_modules.items() if not importable(name)]
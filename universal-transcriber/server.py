@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""常驻转录服务：本地 HTTP 接收任务，线程池执行，客户端跨任务保持常驻。
+
+    python3 main.py serve [--host 127.0.0.1] [--port 8765] [--workers 2] [--warm-browser]
+                          [--metrics <events.jsonl>]
+
+POST /jobs   {"platform": "...", "url": "...", "send": ["notion"], "dry_run": false,
+              "save_video": false, "cookies": null,
+              "priority": "interactive|normal|batch", "deadline": <秒>, "duration": <秒>,
+              "stream": false, "webhook": null}
+                                                           -> 202 {"job_id": "..."}
+GET  /jobs/<job_id>                                        -> 任务状态与结果（流式任务含已完成的 partials）
+DELETE /jobs/<job_id>                                      -> 取消排队中的任务
+GET  /health                                               -> 服务状态（含各外部服务的熔断与并发）
+GET  /metrics                                              -> Prometheus 文本格式的阶段指标
+GET  /search?q=<关键词>&platform=<平台>&limit=20            -> 转录全文检索（按相关度排序）
+
+流式：stream 为 true 或给了 webhook 时分段转录，每段转完即追加到任务的 partials，
+并把 partial / done 事件（格式见 pipeline.partials）逐个 POST 到 webhook。
+
+调度：临近截止的任务最早截止优先；其余按 priority 分档、档内按媒体时长最短优先
+（未给 duration 时后台用 yt-dlp 探测，探测不到按平台默认值），等待越久越靠前。
+"""
+
+import json
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from pipeline import governor, metrics
+from pipeline.logger import Logger
+from pipeline.registry import get_downloader, probe_duration
+from pipeline.scheduler import PRIORITIES, JobQueue
+
+PLATFORMS = ["douyin", "bilibili", "youtube", "xiaohongshu"]
+
+
+def _arg(args, name, default):
+    return args[args.index(name) + 1] if name in args else default
+
+
+def _seconds(payload, name):
+    """读取可选的秒数字段；不是非负数字时抛 ValueError（返回 400），任务不会登记"""
+    value = payload.get(name)
+    if value is None:
+        return None
+    try:
+        seconds = float(value) if not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        seconds = None
+    if seconds is None or not math.isfinite(seconds) or seconds < 0:
+        raise ValueError(f"{name} 须为非负秒数")
+    return seconds
+
+
+class JobRunner:
+    """任务表 + 优先级/截止时间调度队列 + 工作线程"""
+
+    def __init__(self, run_task, services, workers=2, keep=500, probe_workers=2):
+        self.run_task = run_task
+        self.services = services
+        self.workers = workers
+        self.keep = keep
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self.queue = JobQueue(on_expired=self._expired)
+        self.prober = ThreadPoolExecutor(max_workers=probe_workers, thread_name_prefix="probe")
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"transcribe-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, payload):
+        platform = payload.get("platform")
+        url = payload.get("url")
+        if platform not in PLATFORMS or not url:
+            raise ValueError(f"需要 platform（{PLATFORMS}）和 url")
+        priority = payload.get("priority", "normal")
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority 可选: {list(PRIORITIES)}")
+        deadline = _seconds(payload, "deadline")
+        duration = _seconds(payload, "duration")
+        send = payload.get("send")
+        if send is not None and not (isinstance(send, list) and all(isinstance(t, str) for t in send)):
+            raise ValueError("send 须为分发目标名称的数组，如 [\"notion\"]")
+        job_id = str(uuid.uuid4())[:8]
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "platform": platform,
+            "url": url,
+            "priority": priority,
+            "submitted_at": now,
+            "deadline": now + deadline if deadline is not None else None,
+            "payload": payload,
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            self._trim()
+        self.queue.put(
+            job_id, job, platform=platform, priority=priority,
+            deadline=job["deadline"], duration=duration,
+        )
+        if duration is None:
+            self.prober.submit(self._probe, job)
+        return job_id
+
+    def _probe(self, job):
+        """后台探测时长，更新排队中任务的预估代价"""
+        downloader = get_downloader(job["platform"])
+        duration = probe_duration(downloader, job["url"], job["payload"].get("cookies"))
+        if duration is not None and self.queue.update_duration(job["job_id"], duration):
+            job["duration"] = duration
+
+    def _expired(self, job):
+        job["status"] = "expired"
+        job["finished_at"] = time.time()
+        Logger.warning(f"任务超过截止时间仍未开始，已放弃: {job['url']}", job["job_id"])
+
+    def cancel(self, job_id):
+        """取消排队中的任务；已开始的任务返回 False"""
+        if not self.queue.cancel(job_id):
+            return False
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            job["status"] = "cancelled"
+            job["finished_at"] = time.time()
+        return True
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        payload = job["payload"]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        partials = self._partials(job)
+        try:
+            result = self.run_task(
+                job["platform"],
+                job["url"],
+                self.services,
+                cookies_path=payload.get("cookies"),
+                send_targets=payload.get("send") or [],
+                dry_run=bool(payload.get("dry_run")),
+                save_video=bool(payload.get("save_video")),
+                task_id=job["job_id"],
+                partials=partials,
+            )
+            job["status"] = "failed" if result.get("task_status") == "failed" else "done"
+            job["result"] = result
+        except Exception as e:
+            job["status"] = "failed"
+            job["result"] = {"error": str(e)}
+        finally:
+            job["finished_at"] = time.time()
+            if job["deadline"] is not None:
+                job["deadline_met"] = job["finished_at"] <= job["deadline"]
+            if partials is not None:
+                partials.close()
+
+    def _partials(self, job):
+        """流式任务：分段结果追加到 job["partials"]，有 webhook 时同时推送"""
+        payload = job["payload"]
+        webhook = payload.get("webhook") or ""
+        if not payload.get("stream") and not webhook:
+            return None
+        from pipeline.partials import PartialPublisher
+
+        job["partials"] = []
+
+        def collect(event):
+            if event["event"] == "partial":
+                job["partials"].append({k: event[k] for k in ("chunk", "chunks", "begin_time", "end_time", "text")})
+
+        return PartialPublisher(webhook=webhook, callback=collect)
+
+    def _trim(self):
+        finished = [j for j in self.jobs.values() if "finished_at" in j]
+        for job in sorted(finished, key=lambda j: j["finished_at"])[: max(0, len(self.jobs) - self.keep)]:
+            self.jobs.pop(job["job_id"], None)
+
+    def get(self, job_id):
+        with self._lock:
+            if job_id not in self.jobs:
+                return None
+            job = dict(self.jobs[job_id])
+            if "partials" in job:
+                job["partials"] = list(job["partials"])
+        job.pop("payload", None)
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"workers": self.workers, "jobs": counts, "queued": self.queue.depth()}
+
+    def close(self):
+        """不再接新任务；等待排队与进行中的任务完成"""
+        self.queue.close()
+        for thread in self.threads:
+            thread.join()
+        self.prober.shutdown(wait=False)
+
+
+def _make_handler(runner):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _reply_text(self, status, text):
+            data = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                return self._reply_text(200, metrics.recorder().prometheus_text())
+            if self.path == "/health":
+                return self._reply(200, {"status": "ok", **runner.stats(), "governors": governor.stats()})
+            if self.path.startswith("/jobs/"):
+                job = runner.get(self.path[len("/jobs/"):])
+                if job is None:
+                    return self._reply(404, {"error": "job not found"})
+                return self._reply(200, job)
+            if self.path.startswith("/search"):
+                return self._search()
+            self._reply(404, {"error": "not found"})
+
+        def _search(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            query = params.get("q", "").strip()
+            if not query:
+                return self._reply(400, {"error": "missing q"})
+            try:
+                limit = min(int(params.get("limit", 20)), 200)
+            except ValueError:
+                return self._reply(400, {"error": "limit must be an integer"})
+            results = runner.services.transcript_store().search(query, limit=limit, platform=params.get("platform"))
+            self._reply(200, {"query": query, "count": len(results), "results": results})
+
+        def do_DELETE(self):
+            if not self.path.startswith("/jobs/"):
+                return self._reply(404, {"error": "not found"})
+            job_id = self.path[len("/jobs/"):]
+            if runner.get(job_id) is None:
+                return self._reply(404, {"error": "job not found"})
+            if not runner.cancel(job_id):
+                return self._reply(409, {"error": "job already started"})
+            self._reply(200, {"job_id": job_id, "status": "cancelled"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                return self._reply(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("请求体须为 JSON 对象")
+                job_id = runner.submit(payload)
+            except (ValueError, TypeError, json.JSONDecodeError) as e:
+                return self._reply(400, {"error": str(e)})
+            self._reply(202, {"job_id": job_id, "status_url": f"/jobs/{job_id}"})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(run_task, services, args):
+    host = _arg(args, "--host", "127.0.0.1")
+    port = int(_arg(args, "--port", "8765"))
+    workers = int(_arg(args, "--workers", "2"))
+    metrics.configure(_arg(args, "--metrics", None))
+
+    if "--warm-browser" in args:
+        from pipeline.downloader import DouyinDownloader
+
+        DouyinDownloader.warm_browser = True
+
+    # 预热：导入 SDK 并建立客户端，避免首个任务付冷启动代价
+    for name, factory in (("OSS", services.uploader), ("DashScope", services.transcriber)):
+        try:
+            factory()
+        except Exception as e:
+            Logger.warning(f"{name} 预热失败（任务执行时重试）: {e}")
+    import dispatcher
+
+    try:
+        dispatcher.load_rules()
+    except Exception as e:
+        Logger.warning(f"send_rules.yaml 预加载失败: {e}")
+
+    runner = JobRunner(run_task, services, workers=workers)
+    httpd = ThreadingHTTPServer((host, port), _make_handler(runner))
+    Logger.success(f"转录服务已启动: http://{host}:{port}（workers={workers}）")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        Logger.info("收到中断信号，等待进行中的任务结束...")
+    finally:
+        httpd.server_close()
+        runner.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""任务存储 worker：多个进程（或多台机器）从同一个任务存储认领任务。
+
+    python3 main.py enqueue --store sqlite:///output/jobs.db --platform <平台> --url <链接>
+                            [--send notion] [--cookies <路径>] [--dry-run] [--save-video]
+                            [--priority interactive|normal|batch]
+    python3 main.py worker  --store sqlite:///output/jobs.db [--workers 1] [--lease 60]
+                            [--poll 2] [--worker-id <名称>]
+
+认领时加租约，运行中每 lease/3 秒续约；进程崩溃后租约过期，任务由其他 worker 重新认领，
+并从写回的检查点（转录文本、标题）继续，不再重复下载与云端转录。
+多台机器共享时用 redis://，或把 SQLite 放在共享盘上。
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+
+from pipeline.jobstore import open_store
+from pipeline.logger import Logger
+from pipeline.scheduler import PRIORITIES
+
+PLATFORMS = ["douyin", "bilibili", "youtube", "xiaohongshu"]
+
+
+def _arg(args, name, default):
+    return args[args.index(name) + 1] if name in args else default
+
+
+def enqueue(args) -> int:
+    store_url = _arg(args, "--store", None)
+    platform = _arg(args, "--platform", None)
+    url = _arg(args, "--url", None)
+    priority = _arg(args, "--priority", "normal")
+    if not store_url or not url or platform not in PLATFORMS or priority not in PRIORITIES:
+        print(json.dumps({
+            "error": "参数错误",
+            "usage": "python3 main.py enqueue --store <URL> --platform <平台> --url <链接> [--priority normal]",
+            "platforms": PLATFORMS,
+            "priorities": list(PRIORITIES),
+        }, ensure_ascii=False, indent=2))
+        return 1
+    payload = {
+        "platform": platform,
+        "url": url,
+        "send": [args[i + 1] for i, a in enumerate(args) if a == "--send" and i + 1 < len(args)],
+        "cookies": _arg(args, "--cookies", None),
+        "dry_run": "--dry-run" in args,
+        "save_video": "--save-video" in args,
+    }
+    job_id = open_store(store_url).enqueue(payload, priority)
+    print(json.dumps({"job_id": job_id, "status": "queued"}, ensure_ascii=False))
+    return 0
+
+
+class Worker:
+    """认领 → 续约 → 执行 → 写回结果 的循环"""
+
+    def __init__(self, run_task, services, store, worker_id: str, lease: float = 60.0, poll: float = 2.0):
+        self.run_task = run_task
+        self.services = services
+        self.store = store
+        self.worker_id = worker_id
+        self.lease = lease
+        self.poll = poll
+        self.stop = threading.Event()
+
+    def loop(self):
+        while not self.stop.is_set():
+            try:
+                requeued = self.store.requeue_expired()
+                if requeued:
+                    Logger.warning(f"{requeued} 个任务租约过期，已重新排队")
+                job = self.store.claim(self.worker_id, self.lease)
+            except Exception as e:
+                Logger.error(f"任务存储不可用: {e}")
+                job = None
+            if job is None:
+                self.stop.wait(self.poll)
+                continue
+            self._run(job)
+
+    def _heartbeat(self, job_id: str, done: threading.Event, lost: threading.Event):
+        while not done.wait(self.lease / 3):
+            try:
+                if not self.store.heartbeat(job_id, self.worker_id, self.lease):
+                    # 任务已由其他 worker 接管：停止本次执行，避免两边都分发
+                    Logger.warning("租约已被收回，停止执行，结果将不会写回", job_id)
+                    lost.set()
+                    return
+            except Exception as e:
+                Logger.warning(f"续约失败: {e}", job_id)
+
+    def _run(self, job):
+        job_id, payload = job["job_id"], job["payload"]
+        Logger.info(f"认领任务（第 {job['attempts']} 次）: {payload['url']}", job_id)
+        done, lost = threading.Event(), threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job_id, done, lost), daemon=True)
+        beat.start()
+        try:
+            result = self.run_task(
+                payload["platform"],
+                payload["url"],
+                self.services,
+                cookies_path=payload.get("cookies"),
+                send_targets=payload.get("send") or [],
+                dry_run=payload.get("dry_run", False),
+                save_video=payload.get("save_video", False),
+                task_id=job_id,
+                checkpoint=job["checkpoint"],
+                on_checkpoint=lambda values: self.store.checkpoint(job_id, self.worker_id, values),
+                cancel=lost,
+            )
+            failed = result.get("task_status") == "failed"
+        except Exception as e:
+            Logger.error(f"任务异常: {e}", job_id)
+            result, failed = {"task_id": job_id, "task_status": "failed", "error": str(e)}, True
+        finally:
+            done.set()
+            beat.join()
+        if not self.store.complete(job_id, self.worker_id, result, failed=failed):
+            Logger.warning("任务已被其他 worker 接管，丢弃本次结果", job_id)
+
+
+def work(run_task, services, args):
+    store_url = _arg(args, "--store", None)
+    if not store_url:
+        print(json.dumps({"error": "缺少 --store", "example": "sqlite:///output/jobs.db"}, ensure_ascii=False))
+        sys.exit(1)
+    store = open_store(store_url)
+    threads = int(_arg(args, "--workers", "1"))
+    worker_id = _arg(args, "--worker-id", f"{socket.gethostname()}-{os.getpid()}")
+    worker = Worker(
+        run_task, services, store, worker_id,
+        lease=float(_arg(args, "--lease", "60")), poll=float(_arg(args, "--poll", "2")),
+    )
+
+    pool = [threading.Thread(target=worker.loop, name=f"worker-{i}", daemon=True) for i in range(threads)]
+    for t in pool:
+        t.start()
+    Logger.success(f"worker 已启动: {worker_id}（threads={threads}，store={store_url}）")
+    try:
+        while any(t.is_alive() for t in pool):
+            for t in pool:
+                t.join(1.0)
+    except KeyboardInterrupt:
+        Logger.info("收到中断信号，等待进行中的任务结束...")
+        worker.stop.set()
+        for t in pool:
+            t.join()
+    finally:
+        Logger.flush()